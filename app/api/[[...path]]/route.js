@@ -1,15 +1,58 @@
 import { NextResponse } from 'next/server'
 import { createSupabaseServer, createSupabaseAdmin } from '../../../lib/supabase/server.js'
 import { evolutionAPI } from '../../../lib/evolution.js'
-import { renderTemplate, getEventVariables } from '../../../lib/utils/templates.js'
+import { getCompiledTemplate, getEventLevelVariables } from '../../../lib/utils/templates.js'
+import { sendGuestMessage } from '../../../lib/messages.js'
+import { messageLog } from '../../../lib/messageLog.js'
+import { enqueueSendJob, getSendJob } from '../../../lib/sendQueue.js'
+import { cachedConfirmedStatus, resolveConfirmedStatus } from '../../../lib/rsvpStatus.js'
+import { collectMetrics, metricsAuthorized, registerMetricsSource } from '../../../lib/metrics.js'
+import { Router, serverTimingHeader } from '../../../lib/router.js'
+import { currentRequestId, runWithTrace, withSpan } from '../../../lib/tracing.js'
+import { acceptWebhook } from '../../../lib/webhookInbox.js'
+import { openRsvpStream, publishRsvpChanges } from '../../../lib/rsvpStream.js'
+import { captureRequestBody, recordTraffic } from '../../../lib/trafficRecorder.js'
+import { detectImportFormat, parseGuestRows } from '../../../lib/utils/guestImport.js'
+import { guestNameKey, uniqueGuestNames } from '../../../lib/utils/guestKey.js'
+import {
+  userOrgCache,
+  orgInstanceCache,
+  invalidateUserOrg,
+  invalidateOrg,
+  publicEventCache,
+  eventGuestCountCache,
+  adjustEventGuestCount
+} from '../../../lib/cache.js'
+import { parseLimit, decodeCursor, parseFields, wantsCounts, pageResult, InvalidCursorError, isUuid } from '../../../lib/utils/pagination.js'
 import { v4 as uuidv4 } from 'uuid'
 import { getPlanForGuests } from '@/lib/billing/pricing.js'
+
+const GUEST_IMPORT_CHUNK_SIZE = Number(process.env.GUEST_IMPORT_CHUNK_SIZE) || 500
+const GUEST_SEARCH_LIMIT = 20
+const CONFIRM_CONFLICT_RETRIES = 3
+const UNIQUE_VIOLATION = '23505'
+
+// Columns/relations that ?fields= may project on the list endpoints
+const EVENT_LIST_FIELDS = [
+  'id', 'title', 'description', 'location', 'starts_at', 'status', 'template_kind', 'rsvp_token',
+  'guests_planned', 'billing_status', 'billing_tier', 'allow_companion', 'created_at',
+  'guests', 'rsvps', 'gifts', 'wedding_roles'
+]
+const EVENT_LIST_REQUIRED = ['id', 'created_at', 'template_kind', 'rsvp_token']
+const EVENT_LIST_RELATIONS = {
+  guests: 'guests (id)',
+  rsvps: 'rsvps (id, status)',
+  gifts: 'gifts (*)',
+  wedding_roles: 'wedding_roles (*)'
+}
+const GUEST_LIST_FIELDS = ['id', 'name', 'email', 'phone_e164', 'tag', 'companion_of', 'created_at']
 // Helper function to handle CORS
 function handleCORS(response) {
   response.headers.set('Access-Control-Allow-Origin', process.env.CORS_ORIGINS || '*')
   response.headers.set('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
   response.headers.set('Access-Control-Allow-Headers', 'Content-Type, Authorization')
   response.headers.set('Access-Control-Allow-Credentials', 'true')
+  response.headers.set('Access-Control-Expose-Headers', 'X-Next-Cursor, X-Cache, Server-Timing, X-Request-Id')
   return response
 }
 
@@ -42,8 +85,7 @@ export async function OPTIONS() {
 }
 
 // Authentication helper
-async function getAuthenticatedUser(request) {
-  const supabase = createSupabaseServer()
+async function getAuthenticatedUser(supabase) {
   const { data: { user }, error: authError } = await supabase.auth.getUser()
   
   return user
@@ -63,8 +105,16 @@ function shortPrefixForTemplateKind(kind) {
 }
 
 
-// Get user's organization
+// Get user's organization (cached per process, see lib/cache.js)
 async function getUserOrg(userId) {
+  return withSpan('getUserOrg', {}, async span => {
+    const { value, source } = await userOrgCache.lookup(userId, () => fetchUserOrg(userId))
+    if (span) span.attributes.cache = source
+    return value
+  })
+}
+
+async function fetchUserOrg(userId) {
   const supabase = createSupabaseAdmin()
   
   const { data: orgMember, error } = await supabase
@@ -94,245 +144,282 @@ async function getUserOrg(userId) {
   return orgMember.organizations
 }
 
-// Route handler function
-async function handleRoute(request, { params }) {
-  const { path = [] } = params
-  const route = `/${path.join('/')}`
-  const method = request.method
-
-  try {
-    // Public routes (no auth required)
-    if (route === '/' && method === 'GET') {
-      return handleCORS(NextResponse.json({ message: "Event Management API" }))
-    }
+// Get the org's Evolution instance row (cached per process; null when not configured)
+async function getOrgInstance(orgId) {
+  if (!orgId) return null
 
-    // Auth routes
-    if (route === '/auth/register' && method === 'POST') {
-      const body = await request.json()
-      const { fullName, email, password, orgName } = body
+  return withSpan('getOrgInstance', {}, async span => {
+    const { value, source } = await orgInstanceCache.lookup(orgId, async () => {
+      const { data: instance, error } = await createSupabaseAdmin()
+        .from('evolution_instances')
+        .select('*')
+        .eq('org_id', orgId)
+        .maybeSingle()
 
-      if (!fullName || !email || !password || !orgName) {
-        return handleCORS(NextResponse.json(
-          { error: "All fields are required" },
-          { status: 400 }
-        ))
+      if (error) {
+        console.error('Instance fetch error:', error)
       }
+      return instance || null
+    })
+    if (span) span.attributes.cache = source
+    return value
+  })
+}
 
-      const supabaseAdmin = createSupabaseAdmin()
+async function getApiRoot() {
+  return handleCORS(NextResponse.json({ message: "Event Management API" }))
+}
 
-      // Create user
-      const { data: authData, error: authError } = await supabaseAdmin.auth.admin.createUser({
-        email,
-        password,
-        email_confirm: true
-      })
+// Process metrics (connection reuse, caches, ...); hidden unless METRICS_TOKEN is set
+async function getMetrics({ request, route }) {
+  if (!metricsAuthorized(request)) {
+    return handleCORS(NextResponse.json(
+      { error: `Route ${route} not found` },
+      { status: 404 }
+    ))
+  }
+  return handleCORS(NextResponse.json(collectMetrics()))
+}
 
-      if (authError) {
-        return handleCORS(NextResponse.json(
-          { error: authError.message },
-          { status: 400 }
-        ))
-      }
+// Auth routes
+async function register({ request }) {
+  const body = await request.json()
+  const { fullName, email, password, orgName } = body
 
-      const userId = authData.user.id
+  if (!fullName || !email || !password || !orgName) {
+    return handleCORS(NextResponse.json(
+      { error: "All fields are required" },
+      { status: 400 }
+    ))
+  }
 
-      // Create organization
-      const { data: org, error: orgError } = await supabaseAdmin
-        .from('organizations')
-        .insert([{
-          name: orgName,
-          owner_id: userId
-        }])
-        .select()
-        .single()
+  const supabaseAdmin = createSupabaseAdmin()
 
-      if (orgError) {
-        throw new Error(`Failed to create organization: ${orgError.message}`)
-      }
+  // Create user
+  const { data: authData, error: authError } = await supabaseAdmin.auth.admin.createUser({
+    email,
+    password,
+    email_confirm: true
+  })
 
-      // Create org membership
-      const { error: memberError } = await supabaseAdmin
-        .from('org_members')
-        .insert([{
-          org_id: org.id,
-          user_id: userId,
-          role: 'owner'
-        }])
-
-      if (memberError) {
-        throw new Error(`Failed to create membership: ${memberError.message}`)
-      }
+  if (authError) {
+    return handleCORS(NextResponse.json(
+      { error: authError.message },
+      { status: 400 }
+    ))
+  }
 
-      // Create user profile
-      const { error: profileError } = await supabaseAdmin
-        .from('users_profile')
-        .insert([{
-          id: userId,
-          full_name: fullName,
-          org_id: org.id
-        }])
-
-      if (profileError) {
-        throw new Error(`Failed to create profile: ${profileError.message}`)
-      }
+  const userId = authData.user.id
 
-      // Create Evolution instance
-      try {
-        const instanceData = await evolutionAPI.createInstance({ orgId: org.id })
-        
-        const webhookUrl = `${process.env.EVOLUTION_WEBHOOK_BASE}?secret=${process.env.EVOLUTION_WEBHOOK_SECRET}&org=${org.id}`
-        
-        const { error: instanceError } = await supabaseAdmin
-          .from('evolution_instances')
-          .insert([{
-            org_id: org.id,
-            instance_id: instanceData.instanceId,
-            status: instanceData.status,
-            qr_code: instanceData.qrCode,
-            webhook_url: webhookUrl
-          }])
-
-        if (instanceError) {
-          console.error('Failed to save instance:', instanceError)
-        }
-      } catch (evolutionError) {
-        console.error('Evolution instance creation failed:', evolutionError)
-        // Continue without failing registration
-      }
+  // Create organization
+  const { data: org, error: orgError } = await supabaseAdmin
+    .from('organizations')
+    .insert([{
+      name: orgName,
+      owner_id: userId
+    }])
+    .select()
+    .single()
 
-      return handleCORS(NextResponse.json({
-        message: "Registration successful",
-        user: {
-          id: userId,
-          email,
-          fullName
-        },
-        organization: org
-      }))
-    }
+  if (orgError) {
+    throw new Error(`Failed to create organization: ${orgError.message}`)
+  }
+
+  // Create org membership
+  const { error: memberError } = await supabaseAdmin
+    .from('org_members')
+    .insert([{
+      org_id: org.id,
+      user_id: userId,
+      role: 'owner'
+    }])
 
-    if (route === '/auth/login' && method === 'POST') {
-      const body = await request.json()
-      const { email, password } = body
+  if (memberError) {
+    throw new Error(`Failed to create membership: ${memberError.message}`)
+  }
 
-      const supabase = createSupabaseServer()
-      const { data, error } = await supabase.auth.signInWithPassword({
-        email,
-        password
-      })
+  // Create user profile
+  const { error: profileError } = await supabaseAdmin
+    .from('users_profile')
+    .insert([{
+      id: userId,
+      full_name: fullName,
+      org_id: org.id
+    }])
 
-      if (error) {
-        return handleCORS(NextResponse.json(
-          { error: error.message },
-          { status: 400 }
-        ))
-      }
+  if (profileError) {
+    throw new Error(`Failed to create profile: ${profileError.message}`)
+  }
 
-      return handleCORS(NextResponse.json({
-        message: "Login successful",
-        user: data.user
-      }))
+  // Create Evolution instance
+  try {
+    const instanceData = await evolutionAPI.createInstance({ orgId: org.id })
+    
+    const webhookUrl = `${process.env.EVOLUTION_WEBHOOK_BASE}?secret=${process.env.EVOLUTION_WEBHOOK_SECRET}&org=${org.id}`
+    
+    const { error: instanceError } = await supabaseAdmin
+      .from('evolution_instances')
+      .insert([{
+        org_id: org.id,
+        instance_id: instanceData.instanceId,
+        status: instanceData.status,
+        qr_code: instanceData.qrCode,
+        webhook_url: webhookUrl
+      }])
+
+    if (instanceError) {
+      console.error('Failed to save instance:', instanceError)
     }
+  } catch (evolutionError) {
+    console.error('Evolution instance creation failed:', evolutionError)
+    // Continue without failing registration
+  }
 
-    if (route === '/auth/logout' && method === 'POST') {
-      const supabase = createSupabaseServer()
-      const { error } = await supabase.auth.signOut()
+  invalidateUserOrg(userId)
+  invalidateOrg(org.id)
 
-      if (error) {
-        return handleCORS(NextResponse.json(
-          { error: error.message },
-          { status: 400 }
-        ))
-      }
+  return handleCORS(NextResponse.json({
+    message: "Registration successful",
+    user: {
+      id: userId,
+      email,
+      fullName
+    },
+    organization: org
+  }))
+}
 
-      return handleCORS(NextResponse.json({ message: "Logout successful" }))
-    }
+async function login({ request }) {
+  const body = await request.json()
+  const { email, password } = body
 
-    // Protected routes - require authentication
-    const user = await getAuthenticatedUser(request)
-    const supabase = createSupabaseServer()
+  const supabase = createSupabaseServer()
+  const { data, error } = await supabase.auth.signInWithPassword({
+    email,
+    password
+  })
 
-    if (route === '/me' && method === 'GET') {
-      const supabaseAdmin = createSupabaseAdmin()
-      
-      const { data: profile, error: profileError } = await supabaseAdmin
-        .from('users_profile')
-        .select('*')
-        .eq('id', user.id)
-        .single()
+  if (error) {
+    return handleCORS(NextResponse.json(
+      { error: error.message },
+      { status: 400 }
+    ))
+  }
 
-      if (profileError) {
-        console.error('Profile fetch error:', profileError)
-      }
+  return handleCORS(NextResponse.json({
+    message: "Login successful",
+    user: data.user
+  }))
+}
 
-      // Get organization separately if profile has org_id
-      let organization = null
-      if (profile?.org_id) {
-        const { data: org, error: orgError } = await supabaseAdmin
-          .from('organizations')
-          .select('*')
-          .eq('id', profile.org_id)
-          .single()
-          
-        if (!orgError) {
-          organization = org
-        }
-      }
+async function logout() {
+  const supabase = createSupabaseServer()
+  const { error } = await supabase.auth.signOut()
 
-      const { data: instance, error: instanceError } = await supabaseAdmin
-        .from('evolution_instances')
-        .select('*')
-        .eq('org_id', profile?.org_id)
-        .single()
+  if (error) {
+    return handleCORS(NextResponse.json(
+      { error: error.message },
+      { status: 400 }
+    ))
+  }
 
-      if (instanceError) {
-        console.error('Instance fetch error:', instanceError)
-      }
+  return handleCORS(NextResponse.json({ message: "Logout successful" }))
+}
 
-      return handleCORS(NextResponse.json({
-        user: {
-          id: user.id,
-          email: user.email,
-          fullName: profile?.full_name || user.user_metadata?.full_name || 'Unknown'
-        },
-        organization: organization,
-        evolutionInstance: instance || null
-      }))
-    }
+async function getMe({ user }) {
+  const supabaseAdmin = createSupabaseAdmin()
+  
+  const [{ data: profile, error: profileError }, organization] = await Promise.all([
+    supabaseAdmin
+      .from('users_profile')
+      .select('*')
+      .eq('id', user.id)
+      .single(),
+    getUserOrg(user.id).catch(() => null)
+  ])
+
+  if (profileError) {
+    console.error('Profile fetch error:', profileError)
+  }
 
-    // Events endpoints
-    if (route === '/events' && method === 'GET') {
-      const org = await getUserOrg(user.id)
-      
-      
-    const { data: events, error } = await supabase
-      .from('events')
-      .select(`
-        *,
-        guests (id),
-        rsvps (id, status),
-        gifts (*),              
-        wedding_roles (*)      
-      `)
-      .eq('org_id', org.id)
-      .order('created_at', { ascending: false });
+  const instance = await getOrgInstance(organization?.id || profile?.org_id)
 
+  return handleCORS(NextResponse.json({
+    user: {
+      id: user.id,
+      email: user.email,
+      fullName: profile?.full_name || user.user_metadata?.full_name || 'Unknown'
+    },
+    organization: organization,
+    evolutionInstance: instance || null
+  }))
+}
 
-      if (error) {
-        throw new Error(`Failed to fetch events: ${error.message}`)
-      }
+// Events endpoints
+// GET /events?limit=&cursor=&fields=&counts=true
+// Without limit/cursor the full list is returned as before; with them the next page's
+// cursor comes back in the X-Next-Cursor header so the body stays a plain array.
+async function listEvents({ request, user, supabase }) {
+  const org = await getUserOrg(user.id)
+  const params = request.nextUrl.searchParams
+  const limit = parseLimit(params)
+  const counts = wantsCounts(params)
+  const fields = parseFields(params, EVENT_LIST_FIELDS, EVENT_LIST_REQUIRED)
+
+  const columns = fields
+    ? fields.filter(f => !EVENT_LIST_RELATIONS[f])
+    : ['*']
+  const relations = Object.keys(EVENT_LIST_RELATIONS)
+    .filter(rel => !fields || fields.includes(rel))
+    .map(rel => (counts && (rel === 'guests' || rel === 'rsvps'))
+      ? `${rel} (count)`
+      : EVENT_LIST_RELATIONS[rel])
+
+  let query = supabase
+    .from('events')
+    .select([...columns, ...relations].join(', '))
+    .eq('org_id', org.id)
+    .order('created_at', { ascending: false })
+    .order('id', { ascending: false })
+
+  const after = decodeCursor(params.get('cursor'), ['timestamp', 'uuid'])
+  if (after) {
+    const [createdAt, id] = after
+    query = query.or(`created_at.lt."${createdAt}",and(created_at.eq."${createdAt}",id.lt.${id})`)
+  }
+  if (limit !== null) {
+    query = query.limit(limit + 1)
+  }
 
-      const withPaths = (events || []).map(ev => {
-  const prefix = shortPrefixForTemplateKind(ev.template_kind);
-  return { ...ev, public_rsvp_path: `/${prefix}/${ev.rsvp_token}` };
-});
+  const { data: events, error } = await query
 
-return handleCORS(NextResponse.json(withPaths));
+  if (error) {
+    throw new Error(`Failed to fetch events: ${error.message}`)
+  }
 
+  const { items, nextCursor } = pageResult(events || [], limit, ev => [ev.created_at, ev.id])
+
+  const withPaths = items.map(ev => {
+    const prefix = shortPrefixForTemplateKind(ev.template_kind)
+    const row = { ...ev, public_rsvp_path: `/${prefix}/${ev.rsvp_token}` }
+    if (counts) {
+      for (const rel of ['guests', 'rsvps']) {
+        if (Array.isArray(row[rel])) {
+          row[`${rel}_count`] = row[rel][0]?.count ?? 0
+          delete row[rel]
+        }
+      }
     }
+    return row
+  })
+
+  const response = NextResponse.json(withPaths)
+  if (nextCursor) response.headers.set('X-Next-Cursor', nextCursor)
+  return handleCORS(response)
+}
 
 // POST /events
-if (route === '/events' && method === 'POST') {
+async function createEvent({ request, user, supabase }) {
   const org = await getUserOrg(user.id)
   const body = await request.json()
 const {
@@ -362,10 +449,29 @@ const {
   const shortPrefix = shortPrefixForTemplateKind(templateKind);
   const publicRsvpPath = `/${shortPrefix}/${rsvpToken}`;
 
-  // cria evento (deixa 'rascunho' se precisar pagar; 'ativo' se for grátis)
-  const { data: event, error: insertErr } = await supabase
-    .from('events')
-    .insert([{
+  // Normaliza presentes (gifts) — só entram os que têm título
+  const giftRows = (Array.isArray(initialGifts) ? initialGifts : [])
+    .map((g) => ({
+      title: String(g?.title || '').trim(),
+      link: g?.link ? String(g.link).trim() : null,
+      price_cents: Number.isFinite(Number(g?.priceCents ?? g?.price_cents))
+        ? Number(g.priceCents ?? g.price_cents)
+        : null
+    }))
+    .filter(r => r.title);
+
+  // Normaliza padrinhos/madrinhas (wedding_roles) — só entram os que têm nome
+  const roleRows = (Array.isArray(initialRoles) ? initialRoles : [])
+    .map((r) => ({
+      role: (r?.role || '').toLowerCase() === 'madrinha' ? 'madrinha' : 'padrinho',
+      name: String(r?.name || '').trim()
+    }))
+    .filter(r => r.name);
+
+  // cria evento + presentes + padrinhos numa única transação (create_event_with_children);
+  // deixa 'rascunho' se precisar pagar; 'ativo' se for grátis
+  const { data: created, error: insertErr } = await supabase.rpc('create_event_with_children', {
+    p_event: {
       org_id: org.id,
       title,
       description,
@@ -378,11 +484,11 @@ const {
       guests_planned: safeGuests,
       billing_status: requiresPayment ? 'pending_payment' : 'free',
       billing_tier: tier,
-      allow_companion: !!allowCompanion    // <- nova coluna
-
-    }])
-    .select()
-    .single()
+      allow_companion: !!allowCompanion
+    },
+    p_gifts: giftRows,
+    p_roles: roleRows
+  })
 
   if (insertErr) {
     return handleCORS(NextResponse.json(
@@ -390,53 +496,7 @@ const {
       { status: 500 }
     ))
   }
-  // Normaliza e insere presentes (gifts)
-let giftsInserted = [];
-if (Array.isArray(initialGifts) && initialGifts.length > 0) {
-  const rows = initialGifts
-    .map((g) => ({
-      org_id: org.id,
-      event_id: event.id,
-      title: String(g.title || '').trim(),
-      link: g.link ? String(g.link).trim() : null,
-      price_cents: Number.isFinite(Number(g.priceCents ?? g.price_cents))
-        ? Number(g.priceCents ?? g.price_cents)
-        : null
-    }))
-    .filter(r => r.title); // só insere se tiver título
-
-  if (rows.length) {
-    const { data: giftsData, error: giftsErr } = await supabase
-      .from('gifts')
-      .insert(rows)
-      .select('*');
-    if (giftsErr) console.error('Insert gifts error:', giftsErr);
-    else giftsInserted = giftsData || [];
-  }
-}
-
-// Normaliza e insere padrinhos/madrinhas (wedding_roles)
-let rolesInserted = [];
-if (Array.isArray(initialRoles) && initialRoles.length > 0) {
-  const rows = initialRoles
-    .map((r) => ({
-      org_id: org.id,
-      event_id: event.id,
-      role: (r.role || '').toLowerCase() === 'madrinha' ? 'madrinha' : 'padrinho',
-      name: String(r.name || '').trim()
-    }))
-    .filter(r => r.name); // só insere se tiver nome
-
-  if (rows.length) {
-    const { data: rolesData, error: rolesErr } = await supabase
-      .from('wedding_roles')
-      .insert(rows)
-      .select('*');
-    if (rolesErr) console.error('Insert wedding_roles error:', rolesErr);
-    else rolesInserted = rolesData || [];
-  }
-}
-
+  const { event, gifts: giftsInserted, wedding_roles: rolesInserted } = created
 
   // Plano gratuito → retorna direto
 if (!requiresPayment) {
@@ -466,8 +526,9 @@ if (!requiresPayment) {
         event_id: event.id,
         org_id: org.id,
         guests: String(safeGuests),
-        gifts: giftsInserted,
-        wedding_roles: rolesInserted,
+        // metadata do Stripe só aceita strings curtas; as listas completas ficam no banco
+        gifts: String(giftsInserted.length),
+        wedding_roles: String(rolesInserted.length),
         tier,
       },
     })
@@ -500,372 +561,511 @@ if (!requiresPayment) {
   }
 }
 
+// Single event endpoint
+async function getEvent({ params, user, supabase }) {
+  const eventId = params.id
+  const org = await getUserOrg(user.id)
+  
+  const { data: event, error } = await supabase
+    .from('events')
+    .select(`
+      *,
+      guests (*),
+      rsvps (*),
+      messages (*),
+      gifts (*),             
+      wedding_roles (*)    
+    `)
+    .eq('id', eventId)
+    .eq('org_id', org.id)
+    .single();
 
 
-    // Single event endpoint
-    if (route.startsWith('/events/') && route.split('/').length === 3 && method === 'GET') {
-      const eventId = route.split('/')[2]
-      const org = await getUserOrg(user.id)
-      
-      const { data: event, error } = await supabase
-        .from('events')
-        .select(`
-          *,
-          guests (*),
-          rsvps (*),
-          messages (*),
-          gifts (*),             
-          wedding_roles (*)    
-        `)
-        .eq('id', eventId)
-        .eq('org_id', org.id)
-        .single();
+  if (error) {
+    return handleCORS(NextResponse.json(
+      { error: "Event not found" },
+      { status: 404 }
+    ))
+  }
 
+  return handleCORS(NextResponse.json(event))
+}
 
-      if (error) {
-        return handleCORS(NextResponse.json(
-          { error: "Event not found" },
-          { status: 404 }
-        ))
-      }
+// Server-sent events: running RSVP counts, then one frame per batch of new/changed RSVPs
+async function streamEventRsvps({ request, params: { id: eventId }, user, supabase }) {
+  const org = await getUserOrg(user.id)
 
-      return handleCORS(NextResponse.json(event))
-    }
+  const { data: event } = await supabase
+    .from('events')
+    .select('id')
+    .eq('id', eventId)
+    .eq('org_id', org.id)
+    .maybeSingle()
 
-    // Guests endpoints
-    if (route === '/guests' && method === 'POST') {
-      const org = await getUserOrg(user.id)
-      const body = await request.json()
-      const { eventId, name } = body
-
-      if (!eventId || !name ) {
-        return handleCORS(NextResponse.json(
-          { error: "Event ID, name" },
-          { status: 400 }
-        ))
-      }
+  if (!event) {
+    return handleCORS(NextResponse.json(
+      { error: "Event not found" },
+      { status: 404 }
+    ))
+  }
 
-      // Verify event belongs to org
-      const { data: event } = await supabase
-        .from('events')
-        .select('id')
-        .eq('id', eventId)
-        .eq('org_id', org.id)
-        .single()
-
-      if (!event) {
-        return handleCORS(NextResponse.json(
-          { error: "Event not found" },
-          { status: 404 }
-        ))
-      }
+  return handleCORS(new NextResponse(openRsvpStream(event.id, request.signal), {
+    headers: {
+      'Content-Type': 'text/event-stream; charset=utf-8',
+      'Cache-Control': 'no-cache, no-transform',
+      'Connection': 'keep-alive',
+      'X-Accel-Buffering': 'no'
+    }
+  }))
+}
 
-      const { data: guest, error } = await supabase
-        .from('guests')
-        .insert([{
-          org_id: org.id,
-          event_id: eventId,
-          name,
-          email,
-          tag
-        }])
-        .select()
-        .single()
+// Guests endpoints
+async function createGuest({ request, user, supabase }) {
+  const org = await getUserOrg(user.id)
+  const body = await request.json()
+  const { eventId, name, phoneE164, email, tag } = body
 
-      if (error) {
-        throw new Error(`Failed to create guest: ${error.message}`)
-      }
+  if (!eventId || !name ) {
+    return handleCORS(NextResponse.json(
+      { error: "Event ID, name" },
+      { status: 400 }
+    ))
+  }
 
-      // Create default RSVP
-      await supabase
-        .from('rsvps')
-        .insert([{
-          event_id: eventId,
-          guest_id: guest.id,
-          status: 'pending'
-        }])
+  // Verify event belongs to org
+  const { data: event } = await supabase
+    .from('events')
+    .select('id')
+    .eq('id', eventId)
+    .eq('org_id', org.id)
+    .single()
 
-      return handleCORS(NextResponse.json(guest))
-    }
+  if (!event) {
+    return handleCORS(NextResponse.json(
+      { error: "Event not found" },
+      { status: 404 }
+    ))
+  }
 
-    // Templates endpoints
-    if (route === '/templates' && method === 'GET') {
-      const org = await getUserOrg(user.id)
-      
-      const { data: templates, error } = await supabase
-        .from('message_templates')
-        .select('*')
-        .eq('org_id', org.id)
-        .order('created_at', { ascending: false })
+  const { data: guest, error } = await supabase
+    .from('guests')
+    .insert([{
+      org_id: org.id,
+      event_id: eventId,
+      name,
+      phone_e164: phoneE164 || null,
+      email: email || null,
+      tag: tag || null
+    }])
+    .select()
+    .single()
 
-      if (error) {
-        throw new Error(`Failed to fetch templates: ${error.message}`)
-      }
+  if (error) {
+    throw new Error(`Failed to create guest: ${error.message}`)
+  }
 
-      return handleCORS(NextResponse.json(templates || []))
-    }
+  // Create default RSVP
+  await supabase
+    .from('rsvps')
+    .insert([{
+      event_id: eventId,
+      guest_id: guest.id,
+      status: 'pending'
+    }])
 
-    if (route === '/templates' && method === 'POST') {
-      const org = await getUserOrg(user.id)
-      const body = await request.json()
-      const { name, bodyText, channel = 'whatsapp' } = body
+  adjustEventGuestCount(eventId, 1)
 
-      if (!name || !bodyText) {
-        return handleCORS(NextResponse.json(
-          { error: "Name and body text are required" },
-          { status: 400 }
-        ))
-      }
+  return handleCORS(NextResponse.json(guest))
+}
 
-      const { data: template, error } = await supabase
-        .from('message_templates')
-        .insert([{
-          org_id: org.id,
-          name,
-          body_text: bodyText,
-          channel
-        }])
-        .select()
-        .single()
+// Bulk guest import: streamed CSV or JSONL body, inserted in chunks
+async function importGuests({ request, user, supabase }) {
+  const org = await getUserOrg(user.id)
+  const eventId = request.nextUrl.searchParams.get('eventId')
+  const format = detectImportFormat(
+    request.headers.get('content-type'),
+    request.nextUrl.searchParams.get('format')
+  )
 
-      if (error) {
-        throw new Error(`Failed to create template: ${error.message}`)
-      }
+  if (!eventId || !format || !request.body) {
+    return handleCORS(NextResponse.json(
+      { error: "eventId and a CSV or JSONL body are required" },
+      { status: 400 }
+    ))
+  }
 
-      return handleCORS(NextResponse.json(template))
-    }
+  const { data: event } = await supabase
+    .from('events')
+    .select('id')
+    .eq('id', eventId)
+    .eq('org_id', org.id)
+    .single()
 
-    // Send messages endpoint
-    if (route === '/messages/send' && method === 'POST') {
-      const org = await getUserOrg(user.id)
-      const body = await request.json()
-      const { eventId, templateId, guestIds } = body
-
-      if (!eventId || !templateId || !guestIds?.length) {
-        return handleCORS(NextResponse.json(
-          { error: "Event ID, template ID, and guest IDs are required" },
-          { status: 400 }
-        ))
-      }
+  if (!event) {
+    return handleCORS(NextResponse.json(
+      { error: "Event not found" },
+      { status: 404 }
+    ))
+  }
 
-      // Get event, template, and guests
-      const { data: event } = await supabase
-        .from('events')
-        .select('*')
-        .eq('id', eventId)
-        .eq('org_id', org.id)
-        .single()
+  const results = []
+  let chunk = []
 
-      const { data: template } = await supabase
-        .from('message_templates')
-        .select('*')
-        .eq('id', templateId)
-        .eq('org_id', org.id)
-        .single()
+  // Inserts a chunk with one guests insert + one rsvps insert; falls back to
+  // row-by-row inserts only when the chunk is rejected, to pin down the bad rows
+  const flush = async () => {
+    if (!chunk.length) return
+    const rows = chunk.map(({ guest }) => ({ org_id: org.id, event_id: eventId, ...guest }))
 
-      const { data: guests } = await supabase
-        .from('guests')
-        .select('*')
-        .in('id', guestIds)
-        .eq('org_id', org.id)
-
-      if (!event || !template || !guests?.length) {
-        return handleCORS(NextResponse.json(
-          { error: "Event, template, or guests not found" },
-          { status: 404 }
-        ))
+    let created = []
+    const { data, error } = await supabase.from('guests').insert(rows).select('id')
+    if (!error) {
+      created = chunk.map(({ row }, i) => ({ row, id: data[i].id }))
+    } else {
+      for (let i = 0; i < rows.length; i++) {
+        const { data: single, error: rowError } = await supabase
+          .from('guests')
+          .insert([rows[i]])
+          .select('id')
+          .single()
+        if (rowError) results.push({ row: chunk[i].row, status: 'error', error: rowError.message })
+        else created.push({ row: chunk[i].row, id: single.id })
       }
+    }
 
-      // Get Evolution instance
-      const { data: instance } = await supabase
-        .from('evolution_instances')
-        .select('*')
-        .eq('org_id', org.id)
-        .single()
-
-      if (!instance) {
-        return handleCORS(NextResponse.json(
-          { error: "WhatsApp instance not configured" },
-          { status: 400 }
-        ))
+    // A guest without its RSVP row is not created: remove the chunk's guests and report them
+    if (created.length) {
+      const { error: rsvpError } = await supabase
+        .from('rsvps')
+        .insert(created.map(({ id }) => ({ event_id: eventId, guest_id: id, status: 'pending' })))
+      if (rsvpError) {
+        console.error('Guest import RSVP insert error:', rsvpError)
+        const { error: cleanupError } = await supabase
+          .from('guests')
+          .delete()
+          .in('id', created.map(({ id }) => id))
+        if (cleanupError) console.error('Guest import cleanup error:', cleanupError)
+        created.forEach(({ row }) => results.push({ row, status: 'error', error: `RSVP insert failed: ${rsvpError.message}` }))
+        created = []
       }
+    }
 
-      const results = []
-
-      // Send messages to each guest
-      for (const guest of guests) {
-        try {
-          const variables = getEventVariables(event, guest)
-          const message = renderTemplate(template.body_text, variables)
-
-          const sendResult = await evolutionAPI.sendMessage({
-            instanceId: instance.instance_id,
-            to: guest.phone_e164,
-            message
-          })
-
-          // Log message
-          await supabase
-            .from('messages')
-            .insert([{
-              org_id: org.id,
-              event_id: eventId,
-              guest_id: guest.id,
-              status: 'sent',
-              payload: {
-                templateId,
-                message,
-                evolutionResponse: sendResult
-              }
-            }])
-
-          results.push({
-            guestId: guest.id,
-            guestName: guest.name,
-            status: 'sent',
-            messageId: sendResult.messageId
-          })
-        } catch (error) {
-          console.error(`Failed to send message to ${guest.name}:`, error)
-          
-          await supabase
-            .from('messages')
-            .insert([{
-              org_id: org.id,
-              event_id: eventId,
-              guest_id: guest.id,
-              status: 'failed',
-              payload: {
-                templateId,
-                error: error.message
-              }
-            }])
-
-          results.push({
-            guestId: guest.id,
-            guestName: guest.name,
-            status: 'failed',
-            error: error.message
-          })
-        }
+    created.forEach(({ row, id }) => results.push({ row, status: 'created', id }))
+    adjustEventGuestCount(eventId, created.length)
+    chunk = []
+  }
+
+  try {
+    for await (const parsed of parseGuestRows(request.body, format)) {
+      if (parsed.error) {
+        results.push({ row: parsed.row, status: 'error', error: parsed.error })
+        continue
       }
+      chunk.push(parsed)
+      if (chunk.length >= GUEST_IMPORT_CHUNK_SIZE) await flush()
+    }
+    await flush()
+  } catch (error) {
+    return handleCORS(NextResponse.json(
+      { error: error.message, results },
+      { status: 400 }
+    ))
+  }
+
+  results.sort((a, b) => a.row - b.row)
+  const createdCount = results.filter(r => r.status === 'created').length
+
+  return handleCORS(NextResponse.json({
+    eventId,
+    total: results.length,
+    created: createdCount,
+    failed: results.length - createdCount,
+    results
+  }))
+}
+
+// Templates endpoints
+async function listTemplates({ user, supabase }) {
+  const org = await getUserOrg(user.id)
+  
+  const { data: templates, error } = await supabase
+    .from('message_templates')
+    .select('*')
+    .eq('org_id', org.id)
+    .order('created_at', { ascending: false })
+
+  if (error) {
+    throw new Error(`Failed to fetch templates: ${error.message}`)
+  }
+
+  return handleCORS(NextResponse.json(templates || []))
+}
+
+async function createTemplate({ request, user, supabase }) {
+  const org = await getUserOrg(user.id)
+  const body = await request.json()
+  const { name, bodyText, channel = 'whatsapp' } = body
+
+  if (!name || !bodyText) {
+    return handleCORS(NextResponse.json(
+      { error: "Name and body text are required" },
+      { status: 400 }
+    ))
+  }
+
+  const { data: template, error } = await supabase
+    .from('message_templates')
+    .insert([{
+      org_id: org.id,
+      name,
+      body_text: bodyText,
+      channel
+    }])
+    .select()
+    .single()
+
+  if (error) {
+    throw new Error(`Failed to create template: ${error.message}`)
+  }
+
+  return handleCORS(NextResponse.json(template))
+}
+
+// Send messages endpoint
+// { async: true } (or ?mode=async) queues a background job and answers 202 right away; its
+// sends are paced at SEND_RATE_PER_INSTANCE. Otherwise the request stays open until every guest
+// has been messaged, unpaced, so large sends should use the async mode.
+async function sendMessages({ request, user, supabase }) {
+  const org = await getUserOrg(user.id)
+  const body = await request.json()
+  const { eventId, templateId, guestIds } = body
+  const runAsync = body.async === true || request.nextUrl.searchParams.get('mode') === 'async'
+
+  if (!eventId || !templateId || !guestIds?.length) {
+    return handleCORS(NextResponse.json(
+      { error: "Event ID, template ID, and guest IDs are required" },
+      { status: 400 }
+    ))
+  }
+
+  // Get event, template, and guests
+  const { data: event } = await supabase
+    .from('events')
+    .select('*')
+    .eq('id', eventId)
+    .eq('org_id', org.id)
+    .single()
+
+  const { data: template } = await supabase
+    .from('message_templates')
+    .select('*')
+    .eq('id', templateId)
+    .eq('org_id', org.id)
+    .single()
+
+  const { data: guests } = await supabase
+    .from('guests')
+    .select('*')
+    .in('id', guestIds)
+    .eq('org_id', org.id)
+
+  if (!event || !template || !guests?.length) {
+    return handleCORS(NextResponse.json(
+      { error: "Event, template, or guests not found" },
+      { status: 404 }
+    ))
+  }
+
+  // Get Evolution instance
+  const instance = await getOrgInstance(org.id)
+
+  if (!instance) {
+    return handleCORS(NextResponse.json(
+      { error: "WhatsApp instance not configured" },
+      { status: 400 }
+    ))
+  }
+
+  // Parse the template and format event-level variables once for the whole send
+  const compiledTemplate = getCompiledTemplate(template)
+  const eventVariables = getEventLevelVariables(event)
+
+  if (runAsync) {
+    const job = await enqueueSendJob({
+      orgId: org.id,
+      event,
+      template,
+      compiledTemplate,
+      eventVariables,
+      guests,
+      instance
+    })
 
-      return handleCORS(NextResponse.json({
-        message: "Messages processed",
-        results
+    return handleCORS(NextResponse.json({
+      message: "Messages queued",
+      job,
+      statusUrl: `/api/messages/jobs/${job.id}`
+    }, { status: 202 }))
+  }
+
+  const results = []
+
+  // Send messages to each guest; the log rows are written before the route returns, whatever happens
+  try {
+    for (const guest of guests) {
+      results.push(await sendGuestMessage({
+        orgId: org.id,
+        eventId,
+        template,
+        compiledTemplate,
+        eventVariables,
+        guest,
+        instance
       }))
     }
+  } finally {
+    await messageLog.flush()
+  }
 
-    // Dashboard endpoint
-    if (route === '/dashboard' && method === 'GET') {
-      const org = await getUserOrg(user.id)
-      
-      // Get dashboard stats
-      const [eventsResult, messagesResult, rsvpsResult] = await Promise.all([
-        supabase
-          .from('events')
-          .select('id, status, created_at')
-          .eq('org_id', org.id),
-        supabase
-          .from('messages')
-          .select('status')
-          .eq('org_id', org.id),
-        supabase
-          .from('rsvps')
-          .select('status')
-          .eq('event_id', supabase.from('events').select('id').eq('org_id', org.id))
-      ])
-
-      const events = eventsResult.data || []
-      const messages = messagesResult.data || []
-
-      const stats = {
-        totalEvents: events.length,
-        activeEvents: events.filter(e => e.status === 'active').length,
-        totalGuests: 0, // Will be calculated separately
-        messagesSent: messages.filter(m => m.status === 'sent').length,
-        responseRate: 0, // Will be calculated
-        recentEvents: events.slice(0, 5)
-      }
+  return handleCORS(NextResponse.json({
+    message: "Messages processed",
+    results
+  }))
+}
 
-      return handleCORS(NextResponse.json(stats))
-    }
+// Send job status: GET /messages/jobs/:id?results=true
+async function getSendJobStatus({ request, params, user }) {
+  const org = await getUserOrg(user.id)
+  const jobId = params.id
+  const job = await getSendJob(jobId, org.id, {
+    includeResults: request.nextUrl.searchParams.get('results') === 'true'
+  })
 
-    // Webhook endpoint for Evolution API
-    if (route === '/webhooks/evolution' && method === 'POST') {
-      const secret = request.nextUrl.searchParams.get('secret')
-      const orgId = request.nextUrl.searchParams.get('org')
+  if (!job) {
+    return handleCORS(NextResponse.json(
+      { error: "Job not found" },
+      { status: 404 }
+    ))
+  }
 
-      if (!evolutionAPI.validateWebhookSecret(secret)) {
-        return handleCORS(NextResponse.json(
-          { error: "Invalid webhook secret" },
-          { status: 401 }
-        ))
-      }
+  return handleCORS(NextResponse.json(job))
+}
 
-      const body = await request.json()
-      console.log('Evolution webhook received:', { orgId, event: body.event, data: body.data })
-
-      // Handle different webhook events
-      if (body.event === 'connection.update') {
-        // Update instance status
-        const supabaseAdmin = createSupabaseAdmin()
-        await supabaseAdmin
-          .from('evolution_instances')
-          .update({
-            status: body.data.state,
-            qr_code: body.data.qrcode?.base64,
-            updated_at: new Date().toISOString()
-          })
-          .eq('org_id', orgId)
-      }
+// Dashboard endpoint
+async function getDashboard({ user, supabase }) {
+  const org = await getUserOrg(user.id)
+  
+  // Counters are aggregated in the database (see get_dashboard_stats migration)
+  const [statsResult, recentResult] = await Promise.all([
+    supabase.rpc('get_dashboard_stats', { p_org_id: org.id }),
+    supabase
+      .from('events')
+      .select('id, title, status, created_at')
+      .eq('org_id', org.id)
+      .order('created_at', { ascending: false })
+      .limit(5)
+  ])
 
-      if (body.event === 'messages.upsert') {
-        // Handle incoming messages (for RSVP processing)
-        console.log('Incoming message:', body.data)
-        // TODO: Process RSVP responses from guests
-      }
+  if (statsResult.error) {
+    throw new Error(`Failed to fetch dashboard stats: ${statsResult.error.message}`)
+  }
 
-      return handleCORS(NextResponse.json({ received: true }))
-    }
+  const counts = statsResult.data || {}
+  const totalRsvps = Number(counts.total_rsvps) || 0
+
+  const stats = {
+    totalEvents: Number(counts.total_events) || 0,
+    activeEvents: Number(counts.active_events) || 0,
+    totalGuests: Number(counts.total_guests) || 0,
+    messagesSent: Number(counts.messages_sent) || 0,
+    responseRate: totalRsvps
+      ? Math.round((Number(counts.responded_rsvps) / totalRsvps) * 100)
+      : 0,
+    recentEvents: recentResult.data || []
+  }
 
-if (route.startsWith('/public/rsvp/') && method === 'GET') {
-  const raw = route.split('/')[3] || '';
-  const token = decodeURIComponent(raw).trim();
+  return handleCORS(NextResponse.json(stats))
+}
+
+// Webhook endpoint for Evolution API
+async function evolutionWebhook({ request }) {
+  const secret = request.nextUrl.searchParams.get('secret')
+  const orgId = request.nextUrl.searchParams.get('org')
+
+  if (!evolutionAPI.validateWebhookSecret(secret)) {
+    return handleCORS(NextResponse.json(
+      { error: "Invalid webhook secret" },
+      { status: 401 }
+    ))
+  }
+
+  // webhook_inbox.org_id is a uuid: a bad org would fail the insert with a 500, which
+  // Evolution keeps retrying, so it is refused with a 400 instead
+  if (!isUuid(orgId)) {
+    return handleCORS(NextResponse.json(
+      { error: "Missing or invalid org" },
+      { status: 400 }
+    ))
+  }
+
+  const body = await request.json()
+
+  // Deliveries are stored in the inbox before the 200 (a failed write answers 500 so Evolution
+  // retries), then deduped, coalesced and applied in batches (lib/webhookInbox.js); guest
+  // replies go through the inbound RSVP queue (lib/inboundRsvp.js)
+  const { accepted, duplicates } = await acceptWebhook(orgId, body)
+  return handleCORS(NextResponse.json({ received: true, accepted, duplicates }))
+}
 
-  console.log('[public/rsvp] token:', token);
+// GET /public/rsvp/:token — read-through cache por token (ver lib/cache.js).
+// Rajadas no mesmo token compartilham uma única consulta; X-Cache informa HIT/MISS/COALESCED.
+async function getPublicRsvp({ params }) {
+  const raw = params.token || '';
+  const token = decodeURIComponent(raw).trim();
 
   const supabaseAdmin = createSupabaseAdmin();
 
   // 1) Buscar evento + limite guests_planned
-  const { data: event, error } = await supabaseAdmin
-    .from('events')
-    .select(`
-      id, title, description, location, starts_at, rsvp_token,
-      allow_companion, template_kind, confirm_page,
-      location, maps_url,
-      gifts (*),
-      wedding_roles (*),
-      guests_planned
-    `)
-    .eq('rsvp_token', token)
-    .maybeSingle();
-
-  if (error) {
+  let eventLookup;
+  try {
+    eventLookup = await publicEventCache.lookup(token, async () => {
+      const { data, error } = await supabaseAdmin
+        .from('events')
+        .select(`
+          id, title, description, location, starts_at, rsvp_token,
+          allow_companion, template_kind, confirm_page,
+          location, maps_url,
+          gifts (*),
+          wedding_roles (*),
+          guests_planned
+        `)
+        .eq('rsvp_token', token)
+        .maybeSingle();
+      if (error) throw error;
+      return data;
+    });
+  } catch (error) {
     console.error('[public/rsvp] query error:', error);
     return handleCORS(NextResponse.json({ error: 'DB error' }, { status: 500 }));
   }
+
+  const event = eventLookup.value;
   if (!event) {
     return handleCORS(NextResponse.json({ error: 'Event not found' }, { status: 404 }));
   }
 
-  // 2) Contar quantos guests já existem para esse evento
-  const { count: guestsCount, error: guestsErr } = await supabaseAdmin
-    .from('guests')
-    .select('id', { count: 'exact', head: true })
-    .eq('event_id', event.id);
-
-  if (guestsErr) {
+  // 2) Contar quantos guests já existem para esse evento (contador mantido em memória)
+  let guestsCount;
+  try {
+    guestsCount = await eventGuestCountCache.getOrLoad(event.id, async () => {
+      const { count, error } = await supabaseAdmin
+        .from('guests')
+        .select('id', { count: 'exact', head: true })
+        .eq('event_id', event.id);
+      if (error) throw error;
+      return count ?? 0;
+    });
+  } catch (guestsErr) {
     console.error('[public/rsvp] guests count error:', guestsErr);
     return handleCORS(NextResponse.json({ error: 'DB error (guests)' }, { status: 500 }));
   }
@@ -875,28 +1075,26 @@ if (route.startsWith('/public/rsvp/') && method === 'GET') {
   const current = guestsCount ?? 0;
   const limite = current < planned;
 
-  return handleCORS(
-    NextResponse.json({
-      ...event,
-      limite,
-      guests_planned: planned,
-      guests_count: current,
-    })
-  );
+  const response = NextResponse.json({
+    ...event,
+    limite,
+    guests_planned: planned,
+    guests_count: current,
+  });
+  response.headers.set('X-Cache', eventLookup.source === 'hit' ? 'HIT' : eventLookup.source === 'coalesced' ? 'COALESCED' : 'MISS');
+  return handleCORS(response);
 }
 
-
-
-    // GET /events/:id/guests?status=confirmed|all
-if (route.startsWith('/events/') && route.endsWith('/guests') && method === 'GET') {
-  const parts = route.split('/'); // ["", "events", ":id", "guests"]
-  const eventId = parts[2];
+// GET /events/:id/guests?status=confirmed|all&limit=&cursor=&fields=&counts=true
+async function listEventGuests({ request, params: { id: eventId }, user }) {
   if (!eventId) {
     return handleCORS(NextResponse.json({ error: 'eventId inválido' }, { status: 400 }));
   }
 
-  const url = new URL(request.url);
-  const statusParam = url.searchParams.get('status') || 'all';
+  const params = request.nextUrl.searchParams;
+  const statusParam = params.get('status') || 'all';
+  const limit = parseLimit(params);
+  const fields = parseFields(params, GUEST_LIST_FIELDS, ['id']) || ['id', 'name', 'email', 'companion_of', 'created_at'];
 
   // status “confirmado”: aceita variações comuns
   const CONFIRMED_STATUSES = [
@@ -905,98 +1103,187 @@ if (route.startsWith('/events/') && route.endsWith('/guests') && method === 'GET
 
   // Garante que o evento é da organização do usuário logado
   const org = await getUserOrg(user.id);
-  const { data: evOk } = await createSupabaseAdmin()
+  const supabase = createSupabaseAdmin();
+  const { data: event } = await supabase
     .from('events')
-    .select('id')
+    .select('id, title, template_kind, rsvp_token')
     .eq('id', eventId)
     .eq('org_id', org.id)
     .maybeSingle();
 
-  if (!evOk) {
+  if (!event) {
     return handleCORS(NextResponse.json({ error: 'Evento não encontrado' }, { status: 404 }));
   }
 
-  // Busca via relação do PostgREST: rsvps -> guests
-  const supabase = createSupabaseAdmin();
+  const prefix = shortPrefixForTemplateKind(event.template_kind);
+  const eventWithPath = { ...event, public_rsvp_path: `/${prefix}/${event.rsvp_token}` };
+
+  // counts=true → só o total, sem o array de convidados
+  if (wantsCounts(params)) {
+    let countQuery = supabase
+      .from('rsvps')
+      .select('id', { count: 'exact', head: true })
+      .eq('event_id', eventId);
+    if (statusParam === 'confirmed') {
+      countQuery = countQuery.in('status', CONFIRMED_STATUSES);
+    }
+    const { count, error } = await countQuery;
+    if (error) {
+      return handleCORS(NextResponse.json({ error: error.message }, { status: 500 }));
+    }
+    return handleCORS(NextResponse.json({ ...eventWithPath, guests_count: count ?? 0 }));
+  }
+
+  // Busca via relação do PostgREST: rsvps -> guests (keyset por rsvps.id)
   let query = supabase
     .from('rsvps')
-    .select(`
-      status,
-      guest:guests (
-        id, name, email, companion_of, created_at
-      )
-    `)
-    .eq('event_id', eventId);
+    .select(`id, status, guest:guests (${fields.join(', ')})`)
+    .eq('event_id', eventId)
+    .order('id', { ascending: true });
 
   if (statusParam === 'confirmed') {
     query = query.in('status', CONFIRMED_STATUSES);
   }
 
+  const after = decodeCursor(params.get('cursor'), ['uuid']);
+  if (after) {
+    query = query.gt('id', after[0]);
+  }
+  if (limit !== null) {
+    query = query.limit(limit + 1);
+  }
+
   const { data, error } = await query;
   if (error) {
     return handleCORS(NextResponse.json({ error: error.message }, { status: 500 }));
   }
 
-  // Normaliza para um array só de convidados
-  const guests = (data || [])
-    .map(r => ({ ...r.guest, rsvp_status: r.status }))
-    .filter(Boolean);
+  const { items, nextCursor } = pageResult(data || [], limit, r => [r.id]);
 
-  const prefix = shortPrefixForTemplateKind(event.template_kind);
-const eventWithPath = { ...event, public_rsvp_path: `/${prefix}/${event.rsvp_token}` };
-return handleCORS(NextResponse.json(eventWithPath));
+  // Normaliza para um array só de convidados
+  const guests = items
+    .filter(r => r.guest)
+    .map(r => ({ ...r.guest, rsvp_status: r.status }));
 
+  const response = NextResponse.json({ ...eventWithPath, guests, next_cursor: nextCursor });
+  if (nextCursor) response.headers.set('X-Next-Cursor', nextCursor);
+  return handleCORS(response);
 }
 
-    // Public RSVP page data
-    if (route.startsWith('/public/event/') && method === 'GET') {
-      const eventId = route.split('/')[3]
-      
-      const { data: event, error } = await supabase
-        .from('events')
-        .select('id, title, description, location, starts_at')
-        .eq('id', eventId)
-        .single()
+// Public RSVP page data
+async function getPublicEvent({ params }) {
+  const eventId = params.id
+  const supabase = createSupabaseServer()
 
-      if (error) {
-        return handleCORS(NextResponse.json(
-          { error: "Event not found" },
-          { status: 404 }
-        ))
-      }
+  const { data: event, error } = await supabase
+    .from('events')
+    .select('id, title, description, location, starts_at')
+    .eq('id', eventId)
+    .single()
 
-      return handleCORS(NextResponse.json(event))
-    }
+  if (error) {
+    return handleCORS(NextResponse.json(
+      { error: "Event not found" },
+      { status: 404 }
+    ))
+  }
 
-    // Confirma RSVP por token (rota pública)
-// helper opcional: tenta atualizar o status para algo "confirmado"
-async function tryUpgradeRsvpStatus(supabase, { eventId, guestId }) {
-  // tente os que você deseja/imagina que existam no CHECK
-  const CANDIDATES = ['confirmed', 'yes', 'accepted', 'attending', 'going', 'present', 'confirmado'];
+  return handleCORS(NextResponse.json(event))
+}
 
-  for (const status of CANDIDATES) {
-    const { error } = await supabase
-      .from('rsvps')
-      .update({ status })
-      .eq('event_id', eventId)
-      .eq('guest_id', guestId);
+// Colunas que a rota pública lê e devolve: nada de telefone, e-mail, tag ou org
+const PUBLIC_GUEST_COLUMNS = 'id, name, companion_of, name_key';
 
-    // se não houver erro, ótimo — status atualizado
-    if (!error) return { ok: true, status };
-    // se der erro por constraint, tenta o próximo
-    const msg = (error?.message || '').toLowerCase();
-    if (msg.includes('check constraint') || msg.includes('invalid') || msg.includes('violates')) continue;
+// Convidado principal do evento com esse nome normalizado (ou null), já com o status do RSVP.
+// O anfitrião pode ter nomes repetidos; vale o mais antigo.
+async function findMainGuest(supabase, eventId, nameKey) {
+  const { data, error } = await supabase
+    .from('guests')
+    .select(`${PUBLIC_GUEST_COLUMNS}, rsvps (status)`)
+    .eq('event_id', eventId)
+    .eq('name_key', nameKey)
+    .is('companion_of', null)
+    .order('created_at', { ascending: true })
+    .limit(1)
+    .maybeSingle();
+  if (error) throw new Error(`Failed to look up guest: ${error.message}`);
+  return data;
+}
 
-    // erro inesperado — retorna
-    return { ok: false, error };
-  }
+async function listCompanions(supabase, guestId) {
+  const { data, error } = await supabase
+    .from('guests')
+    .select(`${PUBLIC_GUEST_COLUMNS}, rsvps (status)`)
+    .eq('companion_of', guestId)
+    .order('created_at', { ascending: true });
+  if (error) throw new Error(`Failed to look up companions: ${error.message}`);
+  return data || [];
+}
+
+// Grava o convidado e os acompanhantes que ainda não existem (por name_key). As linhas criadas
+// aqui levam created_via = 'public_confirm', únicas por evento/convidado (ver migração
+// 20261018170000_guest_name_key.sql): se outra confirmação do mesmo nome ganhar a corrida,
+// o insert é recusado e a busca é refeita.
+async function saveConfirmedGuests(supabase, event, main, companions) {
+  for (let attempt = 1; ; attempt++) {
+    const existingMain = await findMainGuest(supabase, event.id, main.key);
+    const existingCompanions = existingMain ? await listCompanions(supabase, existingMain.id) : [];
+    const known = new Map();
+    for (const companion of existingCompanions) {
+      if (!known.has(companion.name_key)) known.set(companion.name_key, companion);
+    }
+    const mainGuestId = existingMain?.id || uuidv4();
+
+    const newGuest = (name, companionOf) => ({
+      id: uuidv4(),
+      org_id: event.org_id,
+      event_id: event.id,
+      name,
+      email: null,
+      companion_of: companionOf,
+      created_via: 'public_confirm'
+    });
+    const guestRows = [
+      ...(existingMain ? [] : [{ ...newGuest(main.name, null), id: mainGuestId }]),
+      ...companions.filter(c => !known.has(c.key)).map(c => newGuest(c.name, mainGuestId))
+    ];
+
+    let inserted = [];
+    if (guestRows.length) {
+      const { data, error } = await supabase
+        .from('guests')
+        .insert(guestRows)
+        .select(PUBLIC_GUEST_COLUMNS);
+      if (error?.code === UNIQUE_VIOLATION && attempt < CONFIRM_CONFLICT_RETRIES) continue;
+      if (error) return { error };
+      inserted = data;
+    }
 
-  // nenhum dos candidatos foi aceito — seguimos com 'pending'
-  return { ok: false, error: { message: 'Nenhum status alternativo foi aceito; RSVP permanece como pending.' } };
+    // previousStatus: null para linhas novas, undefined se o RSVP antigo não foi encontrado
+    const entry = (guest, isNew) => ({
+      guest: { id: guest.id, name: guest.name, companion_of: guest.companion_of },
+      isNew,
+      previousStatus: isNew ? null : guest.rsvps?.[0]?.status
+    });
+    const insertedById = new Map(inserted.map(g => [g.id, g]));
+    const mainEntry = existingMain ? entry(existingMain, false) : entry(insertedById.get(mainGuestId), true);
+    const companionEntries = companions.map(c => known.has(c.key)
+      ? entry(known.get(c.key), false)
+      : entry(inserted.find(g => g.companion_of === mainGuestId && g.name === c.name), true));
+
+    return { main: mainEntry, companions: companionEntries, inserted };
+  }
 }
 
+// Confirma RSVP por token (rota pública)
 // POST /api/public/rsvp/confirm
-if (route === '/public/rsvp/confirm' && method === 'POST') {
+// Idempotente: o convidado é identificado pelo nome normalizado (guests.name_key), então
+// recarregar a página ou tocar duas vezes não duplica convidados nem RSVPs, e um convidado já
+// importado pelo anfitrião é confirmado em vez de recriado. A resposta só traz id, nome e
+// companion_of de cada convidado. Só os convidados
+// novos são inseridos (um insert) e recebem RSVP (outro insert); os demais têm o RSVP atualizado
+// para o status "confirmado" resolvido (ver lib/rsvpStatus.js).
+async function confirmPublicRsvp({ request }) {
   const { token, name, companions } = await request.json();
 
   // validações básicas
@@ -1006,7 +1293,9 @@ if (route === '/public/rsvp/confirm' && method === 'POST') {
       { status: 400 }
     ));
   }
-  if (!name || String(name).trim() === '') {
+  const mainName = String(name ?? '').trim();
+  const mainKey = guestNameKey(mainName);
+  if (!mainKey) {
     return handleCORS(NextResponse.json(
       { error: "Nome é obrigatório" },
       { status: 400 }
@@ -1029,127 +1318,244 @@ if (route === '/public/rsvp/confirm' && method === 'POST') {
     ));
   }
 
-  // cria o convidado principal
-  const { data: mainGuest, error: mainGuestError } = await supabase
-    .from('guests')
-    .insert([{
-      org_id: event.org_id,
-      event_id: event.id,
-      name: String(name).trim(),
-      email: null,     
-      companion_of: null
-    }])
-    .select()
-    .single();
-
-  if (mainGuestError) {
-    return handleCORS(NextResponse.json(
-      { error: mainGuestError.message },
-      { status: 400 }
-    ));
-  }
-
-  // cria RSVP primeiro como 'pending' (valor aceito)
-  const { error: rsvpInsertErr } = await supabase
-    .from('rsvps')
-    .insert([{
-      event_id: event.id,
-      guest_id: mainGuest.id,
-      status: 'pending'
-    }]);
+  // normaliza acompanhantes (sem vazios nem nomes repetidos)
+  const companionNames = uniqueGuestNames(Array.isArray(companions) ? companions : []);
 
-  if (rsvpInsertErr) {
+  const saved = await saveConfirmedGuests(supabase, event, { key: mainKey, name: mainName }, companionNames);
+  if (saved.error) {
     return handleCORS(NextResponse.json(
-      { error: rsvpInsertErr.message },
+      { error: saved.error.message },
       { status: 400 }
     ));
   }
 
-  // tenta atualizar para um status "confirmado"; se não der, mantém 'pending'
-  await tryUpgradeRsvpStatus(supabase, {
-    eventId: event.id,
-    guestId: mainGuest.id
-  });
-
-  // normaliza acompanhantes (array de strings, sem vazios)
-  const companionNames = Array.isArray(companions)
-    ? companions.map(c => String(c ?? '').trim()).filter(Boolean)
-    : [];
+  const { main, inserted } = saved;
+  const all = [main, ...saved.companions];
+  adjustEventGuestCount(event.id, inserted.length);
 
-  const createdCompanions = [];
-  for (const compName of companionNames) {
-    // cria o guest do acompanhante
-    const { data: compGuest, error: compGuestError } = await supabase
-      .from('guests')
-      .insert([{
-        org_id: event.org_id,
+  // RSVPs dos novos de uma vez; se o status confirmado ainda não é conhecido,
+  // entram como 'pending' e o principal serve de sonda (uma vez por processo)
+  const knownStatus = cachedConfirmedStatus();
+  if (inserted.length) {
+    const { error: rsvpInsertErr } = await supabase
+      .from('rsvps')
+      .insert(inserted.map(g => ({
         event_id: event.id,
-        name: compName,
-        email: null,
-        companion_of: mainGuest.id
-      }])
-      .select()
-      .single();
+        guest_id: g.id,
+        status: knownStatus || 'pending'
+      })));
 
-    if (compGuestError) {
-      console.error('Erro ao criar acompanhante:', compName, compGuestError);
-      continue;
+    if (rsvpInsertErr) {
+      return handleCORS(NextResponse.json(
+        { error: rsvpInsertErr.message },
+        { status: 400 }
+      ));
     }
+  }
 
-    createdCompanions.push(compGuest);
+  let status = knownStatus;
+  let probed = null;
+  if (knownStatus === undefined) {
+    status = await resolveConfirmedStatus(supabase, {
+      eventId: event.id,
+      guestId: main.guest.id
+    });
+    probed = main;
+  }
+  for (const entry of all) {
+    entry.status = entry.isNew ? knownStatus || 'pending' : entry.previousStatus;
+  }
+  if (probed && status) probed.status = status;
 
-    // insere RSVP do acompanhante como 'pending' e tenta subir o status
-    const { error: compRsvpInsertErr } = await supabase
+  // quem ainda não está confirmado (já existia ou entrou 'pending' à espera da sonda) é atualizado
+  const toConfirm = status ? all.filter(e => e !== probed && e.status !== status) : [];
+  if (toConfirm.length) {
+    const { error: updateErr } = await supabase
       .from('rsvps')
-      .insert([{
-        event_id: event.id,
-        guest_id: compGuest.id,
-        status: 'pending'
-      }]);
-
-    if (!compRsvpInsertErr) {
-      await tryUpgradeRsvpStatus(supabase, {
-        eventId: event.id,
-        guestId: compGuest.id
-      });
+      .update({ status })
+      .eq('event_id', event.id)
+      .in('guest_id', toConfirm.map(e => e.guest.id));
+    if (updateErr) {
+      console.error('Erro ao confirmar convidados:', updateErr);
     } else {
-      console.error('Erro ao criar RSVP do acompanhante:', compName, compRsvpInsertErr);
+      toConfirm.forEach(e => { e.status = status });
     }
   }
 
-  
+  // avisa quem acompanha o evento em tempo real (GET /events/:id/rsvps/stream)
+  publishRsvpChanges(event.id, all
+    .filter(e => e.status !== e.previousStatus)
+    .map(e => ({
+      guestId: e.guest.id,
+      name: e.guest.name,
+      companionOf: e.guest.companion_of,
+      status: e.status,
+      previousStatus: e.previousStatus
+    })));
 
   return handleCORS(NextResponse.json({
-    message: "Presença confirmada com sucesso",
-    guest: mainGuest,
-    companions: createdCompanions
+    message: inserted.length ? "Presença confirmada com sucesso" : "Presença já confirmada",
+    guest: main.guest,
+    companions: saved.companions.map(e => e.guest),
+    created: inserted.length
   }));
 }
 
+// GET /events/:id/guests/search?q=&limit= — check-in: prefixo do nome normalizado
+// (índice guests_event_id_name_key_idx); acentos e maiúsculas em `q` são ignorados
+async function searchEventGuests({ request, params: { id: eventId }, user, supabase }) {
+  const params = request.nextUrl.searchParams;
+  const prefix = guestNameKey(params.get('q'));
+  if (!eventId || !prefix) {
+    return handleCORS(NextResponse.json({ error: 'eventId e q são obrigatórios' }, { status: 400 }));
+  }
+  const limit = parseLimit(params) ?? GUEST_SEARCH_LIMIT;
+
+  // org_id no filtro basta para isolar organizações, sem consultar o evento antes
+  const org = await getUserOrg(user.id);
+  const { data, error } = await supabase
+    .from('guests')
+    .select('id, name, phone_e164, tag, companion_of, rsvps (status)')
+    .eq('event_id', eventId)
+    .eq('org_id', org.id)
+    .like('name_key', `${prefix}%`)
+    .order('name_key', { ascending: true })
+    .limit(limit);
 
+  if (error) {
+    return handleCORS(NextResponse.json({ error: error.message }, { status: 500 }));
+  }
 
+  const guests = (data || []).map(({ rsvps, ...guest }) => ({ ...guest, rsvp_status: rsvps?.[0]?.status ?? null }));
+  return handleCORS(NextResponse.json({ eventId, q: prefix, guests }));
+}
 
-    // Route not found
+// Route table: public routes skip the user/org lookup entirely
+const router = new Router()
+  .get('/', getApiRoot, { public: true })
+  .get('/metrics', getMetrics, { public: true })
+  .post('/auth/register', register, { public: true })
+  .post('/auth/login', login, { public: true })
+  .post('/auth/logout', logout, { public: true })
+  .post('/webhooks/evolution', evolutionWebhook, { public: true })
+  .get('/public/rsvp/:token', getPublicRsvp, { public: true })
+  .post('/public/rsvp/confirm', confirmPublicRsvp, { public: true })
+  .get('/public/event/:id', getPublicEvent, { public: true })
+  .get('/me', getMe)
+  .get('/events', listEvents)
+  .post('/events', createEvent)
+  .get('/events/:id', getEvent)
+  .get('/events/:id/guests', listEventGuests)
+  .get('/events/:id/guests/search', searchEventGuests)
+  .get('/events/:id/rsvps/stream', streamEventRsvps)
+  .post('/guests', createGuest)
+  .post('/guests/import', importGuests)
+  .get('/templates', listTemplates)
+  .post('/templates', createTemplate)
+  .post('/messages/send', sendMessages)
+  .get('/messages/jobs/:id', getSendJobStatus)
+  .get('/dashboard', getDashboard)
+
+registerMetricsSource('routes', () => router.timingSummary())
+
+function errorResponse(error) {
+  console.error(`API Error [${currentRequestId()}]:`, error)
+
+  if (error.message === 'Unauthorized - Please log in') {
     return handleCORS(NextResponse.json(
-      { error: `Route ${route} not found` },
-      { status: 404 }
+      { error: error.message },
+      { status: 401 }
     ))
+  }
 
-  } catch (error) {
-    console.error('API Error:', error)
-    
-    if (error.message === 'Unauthorized - Please log in') {
-      return handleCORS(NextResponse.json(
-        { error: error.message },
-        { status: 401 }
-      ))
-    }
-    
+  if (error instanceof InvalidCursorError) {
     return handleCORS(NextResponse.json(
-      { error: error.message || "Internal server error" },
-      { status: 500 }
+      { error: error.message },
+      { status: 400 }
     ))
   }
+
+  return handleCORS(NextResponse.json(
+    { error: error.message || "Internal server error" },
+    { status: 500 }
+  ))
+}
+
+// Route handler function: each request runs in its own trace, returned as X-Request-Id
+async function handleRoute(request, context) {
+  return runWithTrace('request', { method: request.method }, span => dispatchRoute(request, context, span), {
+    traceId: request.headers.get('x-request-id')
+  })
+}
+
+async function dispatchRoute(request, { params }, span) {
+  const { path = [] } = params
+  const route = `/${path.join('/')}`
+  const method = request.method
+
+  const receivedAt = Date.now()
+  const started = performance.now()
+  const match = router.match(method, route)
+  const dispatched = performance.now()
+  let authenticated = dispatched
+  let response
+  let userId = null
+  const recordedBody = captureRequestBody(request, match?.route.key)
+
+  try {
+    const allowed = match ? null : router.allowedMethods(route)
+    if (allowed?.length) {
+      response = handleCORS(NextResponse.json(
+        { error: `Method ${method} not allowed for ${route}` },
+        { status: 405, headers: { Allow: allowed.join(', ') } }
+      ))
+    } else if (!match) {
+      response = handleCORS(NextResponse.json(
+        { error: `Route ${route} not found` },
+        { status: 404 }
+      ))
+    } else {
+      const context = { request, route, params: match.params }
+
+      // Protected routes - require authentication
+      if (!match.route.public) {
+        context.supabase = createSupabaseServer()
+        context.user = await getAuthenticatedUser(context.supabase)
+        if (!context.user) throw new Error('Unauthorized - Please log in')
+        userId = context.user.id
+      }
+      authenticated = performance.now()
+
+      response = await match.route.handler(context)
+    }
+  } catch (error) {
+    response = errorResponse(error)
+  }
+
+  const timings = {
+    dispatch: dispatched - started,
+    auth: authenticated - dispatched,
+    handler: performance.now() - authenticated
+  }
+  const routeKey = match ? match.route.key : 'unmatched'
+  router.record(routeKey, timings, response.status)
+  span.attributes.route = routeKey
+  span.attributes.status = response.status
+  response.headers.set('Server-Timing', serverTimingHeader(timings, routeKey))
+  response.headers.set('X-Request-Id', span.traceId)
+
+  // Replay trace for replay_benchmark.py (TRAFFIC_RECORD_FILE); written off the response path
+  recordTraffic({
+    request,
+    route,
+    routeKey,
+    receivedAt,
+    response,
+    body: recordedBody,
+    userId,
+    resolveOrgId: () => getUserOrg(userId).then(org => org.id)
+  })
+  return response
 }
 
 // Export all HTTP methods
@@ -1157,4 +1563,4 @@ export const GET = handleRoute
 export const POST = handleRoute
 export const PUT = handleRoute
 export const DELETE = handleRoute
-export const PATCH = handleRoute
\ No newline at end of file
+export const PATCH = handleRoute
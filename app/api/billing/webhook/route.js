@@ -1,6 +1,7 @@
 import { NextResponse } from 'next/server'
 import Stripe from 'stripe'
 import { createSupabaseAdmin } from '@/lib/supabase/server'
+import { invalidatePublicEvent } from '@/lib/cache'
 
 const stripe = new Stripe(process.env.STRIPE_SECRET_KEY, {
   apiVersion: '2024-06-20',
@@ -47,6 +48,8 @@ export async function POST(req) {
           status: 'ativo', // seu app usa "ativo"
         })
         .eq('id', eventId)
+
+      invalidatePublicEvent(eventId)
     }
   }
 
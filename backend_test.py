@@ -4,21 +4,247 @@ Comprehensive Backend API Testing for Event Management System
 Tests all critical endpoints with Supabase and Evolution API integration
 """
 
+import argparse
 import requests
 import json
+import os
+import random
+import re
+import threading
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+# Use localhost for testing since external URL has ingress issues
+DEFAULT_BASE_URL = "http://localhost:3000/api"
+DEFAULT_WEBHOOK_SECRET = "8cba9473-6b24-4e63-b4e9-39b43f9c9d27"  # From .env
+
+ID_SEGMENT_RE = re.compile(
+    r'^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}|\d+)$', re.IGNORECASE
+)
+TOKEN_PARENT_SEGMENTS = {'rsvp'}
+
+
+def route_template(url, base_url=DEFAULT_BASE_URL):
+    """Collapse a concrete request URL into its route template, e.g. /events/{id}/guests"""
+    path = urlsplit(url).path
+    base_path = urlsplit(base_url).path.rstrip('/')
+    if base_path and path.startswith(base_path):
+        path = path[len(base_path):]
+
+    segments = path.split('/')
+    for index, segment in enumerate(segments):
+        if segment and ID_SEGMENT_RE.match(segment):
+            parent = segments[index - 1] if index > 0 else ''
+            segments[index] = '{token}' if parent in TOKEN_PARENT_SEGMENTS else '{id}'
+    return '/'.join(segments) or '/'
+
+
+def iter_pages(session, url, params=None, page_size=100, items_key=None):
+    """Yield items from a cursor-paginated endpoint one page at a time (constant memory)
+
+    Follows the X-Next-Cursor response header; `items_key` selects the list inside an
+    object body (e.g. "guests" for /events/{id}/guests).
+    """
+    params = dict(params or {})
+    params["limit"] = page_size
+    while True:
+        response = session.get(url, params=params)
+        response.raise_for_status()
+        body = response.json()
+        yield from (body.get(items_key, []) if items_key else body)
+
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return
+        params["cursor"] = cursor
+
+
+class LatencyHistogram:
+    """Compact HDR-style log-linear histogram of latencies in microseconds
+
+    Values below 2**SUB_BUCKET_BITS are counted exactly; larger values keep their top
+    SUB_BUCKET_BITS bits, which bounds the relative error at under 1% while storing at
+    most a few hundred counters however many samples are recorded.
+    """
+
+    SUB_BUCKET_BITS = 8
 
-class EventManagementAPITester:
     def __init__(self):
-        # Use localhost for testing since external URL has ingress issues
-        self.base_url = "http://localhost:3000/api"
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.counts = {}
+        self.total = 0
+        self.max_value = 0
+        self.min_value = None
+
+    def _key(self, value):
+        shift = max(0, value.bit_length() - self.SUB_BUCKET_BITS)
+        return (shift << self.SUB_BUCKET_BITS) | (value >> shift)
+
+    def _highest_equivalent(self, key):
+        shift = key >> self.SUB_BUCKET_BITS
+        mantissa = key & ((1 << self.SUB_BUCKET_BITS) - 1)
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value_us):
+        value = max(0, int(value_us))
+        key = self._key(value)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.total += 1
+        self.max_value = max(self.max_value, value)
+        self.min_value = value if self.min_value is None else min(self.min_value, value)
+
+    def merge(self, other):
+        for key, count in other.counts.items():
+            self.counts[key] = self.counts.get(key, 0) + count
+        self.total += other.total
+        self.max_value = max(self.max_value, other.max_value)
+        if other.min_value is not None:
+            self.min_value = other.min_value if self.min_value is None else min(self.min_value, other.min_value)
+
+    def percentile(self, pct):
+        if not self.total:
+            return 0
+        target = max(1, int(round(self.total * pct / 100.0)))
+        seen = 0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= target:
+                return min(self._highest_equivalent(key), self.max_value)
+        return self.max_value
+
+
+class LatencyRecorder:
+    """Thread-safe per-route latency histograms plus wall-clock throughput
+
+    The slowest requests are kept with their server trace id (X-Request-Id) so they can be
+    looked up in the exported spans.
+    """
+
+    SLOWEST_KEPT = 5
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.errors = {}
+        self.slowest = []
+        self.first_start = None
+        self.last_end = None
+
+    def _keep_slowest(self, entries):
+        self.slowest = sorted(self.slowest + entries, reverse=True)[:self.SLOWEST_KEPT]
+
+    def record(self, route, started, finished, ok=True, trace_id=None):
+        with self.lock:
+            histogram = self.histograms.setdefault(route, LatencyHistogram())
+            histogram.record((finished - started) * 1_000_000)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+            if trace_id and (len(self.slowest) < self.SLOWEST_KEPT or finished - started > self.slowest[-1][0]):
+                self._keep_slowest([(finished - started, route, trace_id)])
+            self.first_start = started if self.first_start is None else min(self.first_start, started)
+            self.last_end = finished if self.last_end is None else max(self.last_end, finished)
+
+    def merge(self, other):
+        with self.lock:
+            for route, histogram in other.histograms.items():
+                self.histograms.setdefault(route, LatencyHistogram()).merge(histogram)
+            for route, count in other.errors.items():
+                self.errors[route] = self.errors.get(route, 0) + count
+            self._keep_slowest(other.slowest)
+            if other.first_start is not None:
+                self.first_start = other.first_start if self.first_start is None else min(self.first_start, other.first_start)
+                self.last_end = other.last_end if self.last_end is None else max(self.last_end, other.last_end)
+
+    def total_requests(self):
+        return sum(h.total for h in self.histograms.values())
+
+    def elapsed(self):
+        if self.first_start is None:
+            return 0.0
+        return self.last_end - self.first_start
+
+    def print_report(self):
+        """Print p50/p90/p99/max and throughput for every route seen so far"""
+        if not self.histograms:
+            return
+
+        elapsed = self.elapsed()
+        print("\n⏱️  Latency per endpoint (ms)")
+        print(f"   {'Route':<36} {'count':>6} {'err':>4} {'p50':>8} {'p90':>8} "
+              f"{'p99':>8} {'max':>8} {'req/s':>8}")
+        for route in sorted(self.histograms):
+            h = self.histograms[route]
+            rate = h.total / elapsed if elapsed > 0 else 0.0
+            print(f"   {route:<36} {h.total:>6} {self.errors.get(route, 0):>4} "
+                  f"{h.percentile(50) / 1000:>8.1f} {h.percentile(90) / 1000:>8.1f} "
+                  f"{h.percentile(99) / 1000:>8.1f} {h.max_value / 1000:>8.1f} {rate:>8.2f}")
+
+        total = self.total_requests()
+        if elapsed > 0:
+            print(f"   Throughput: {total} requests in {elapsed:.2f}s ({total / elapsed:.2f} req/s)")
+
+        if self.slowest:
+            print("\n🐢 Slowest requests (trace id = X-Request-Id)")
+            for duration, route, trace_id in self.slowest:
+                print(f"   {duration * 1000:>8.1f}ms  {route:<36} {trace_id}")
+
+
+class InstrumentedSession(requests.Session):
+    """requests.Session that records wall-clock latency per route template
+
+    `request_log` keeps (route, seconds, status, trace id) for every call when `keep_log` is set.
+    """
+
+    def __init__(self, recorder, base_url=DEFAULT_BASE_URL, keep_log=False):
+        super().__init__()
+        self.recorder = recorder
+        self.base_url = base_url
+        self.request_log = [] if keep_log else None
+        self.headers.update({
             'Content-Type': 'application/json',
             'Accept': 'application/json'
         })
+
+    def request(self, method, url, *args, **kwargs):
+        route = f"{method.upper()} {route_template(url, self.base_url)}"
+        started = time.perf_counter()
+        ok = False
+        response = None
+        try:
+            response = super().request(method, url, *args, **kwargs)
+            ok = response.status_code < 500
+            return response
+        finally:
+            finished = time.perf_counter()
+            trace_id = response.headers.get('X-Request-Id') if response is not None else None
+            self.recorder.record(route, started, finished, ok, trace_id)
+            if self.request_log is not None:
+                status = response.status_code if response is not None else None
+                self.request_log.append((route, finished - started, status, trace_id))
+
+
+class EventManagementAPITester:
+    # Max allowed growth of /dashboard latency across the seeded volume range
+    DASHBOARD_FLATNESS = 2.0
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, dashboard_seed_messages=0, send_mode='sync',
+                 webhook_replay=0, webhook_secret=DEFAULT_WEBHOOK_SECRET, concurrency=8, metrics_token=None,
+                 event_children=0, child_events=20):
+        self.base_url = base_url
+        self.dashboard_seed_messages = dashboard_seed_messages
+        self.send_mode = send_mode
+        self.webhook_replay = webhook_replay
+        self.webhook_secret = webhook_secret
+        self.concurrency = max(1, int(concurrency))
+        self.metrics_token = metrics_token
+        self.event_children = max(0, int(event_children))
+        self.child_events = max(1, int(child_events))
+        self.send_timings = {}
+        self.recorder = LatencyRecorder()
+        self.session = InstrumentedSession(self.recorder, base_url, keep_log=True)
+        self.test_traces = {}
         
         # Test data
         self.test_user_email = f"testuser_{uuid.uuid4().hex[:8]}@example.com"
@@ -176,7 +402,8 @@ class EventManagementAPITester:
             print(f"Status: {response.status_code}")
             
             if response.status_code == 200:
-                data = response.json()
+                # POST /events wraps the row as {"requiresPayment": ..., "event": {...}}
+                data = response.json().get('event', {})
                 print(f"✅ Event created successfully")
                 print(f"   Event ID: {data['id']}")
                 print(f"   Title: {data['title']}")
@@ -184,6 +411,8 @@ class EventManagementAPITester:
                 print(f"   Status: {data['status']}")
                 
                 self.event_id = data['id']
+                if self.event_children:
+                    return self._create_events_with_children()
                 return True
             else:
                 error_data = response.json() if response.content else {}
@@ -194,6 +423,65 @@ class EventManagementAPITester:
             print(f"❌ Event creation error: {str(e)}")
             return False
 
+    def _create_events_with_children(self):
+        """POST events with large initialGifts/initialRoles lists from many workers
+
+        Every event must come back (and be listed) with all of its gifts and roles; an event
+        listed with missing children, or left behind by a failed POST, is reported as orphaned.
+        """
+        size = self.event_children
+        batch = uuid.uuid4().hex[:8]
+        print(f"\n🔍 Creating {self.child_events} events with {size} gifts + {size} roles "
+              f"({self.concurrency} workers)...")
+        recorder = LatencyRecorder()
+        local = threading.local()
+
+        def create(index):
+            if not hasattr(local, 'session'):
+                local.session = InstrumentedSession(recorder, self.base_url)
+                local.session.cookies.update(self.session.cookies)
+            title = f"Children {batch} {index:03d}"
+            response = local.session.post(f"{self.base_url}/events", json={
+                "title": title,
+                "location": "Test Venue, Test City",
+                "startsAt": (datetime.now() + timedelta(days=7)).isoformat(),
+                "templateKind": "wedding",
+                "initialGifts": [{"title": f"Presente {i:04d}", "link": f"https://example.com/gift/{i}",
+                                  "priceCents": 1000 + i} for i in range(size)],
+                "initialRoles": [{"role": "madrinha" if i % 2 else "padrinho", "name": f"Padrinho {i:04d}"}
+                                 for i in range(size)]
+            }, timeout=120)
+            if response.status_code != 200:
+                return title, None
+            event = response.json().get('event', {})
+            return title, (len(event.get('gifts', [])), len(event.get('wedding_roles', [])))
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            outcomes = dict(pool.map(create, range(self.child_events)))
+
+        listed = {event['title']: event for event in iter_pages(
+            self.session, f"{self.base_url}/events",
+            params={"fields": "id,title,gifts,wedding_roles"}, page_size=100)
+            if event['title'] in outcomes}
+
+        created = [title for title, counts in outcomes.items() if counts]
+        incomplete = [title for title in created if outcomes[title] != (size, size)]
+        orphaned = [title for title, event in listed.items()
+                    if not outcomes[title]
+                    or (len(event.get('gifts') or []), len(event.get('wedding_roles') or [])) != (size, size)]
+
+        histogram = recorder.histograms.get("POST /events", LatencyHistogram())
+        print(f"   {len(created)}/{self.child_events} created, {len(incomplete)} returned incomplete, "
+              f"{len(orphaned)} orphaned/partial events left in the database")
+        print(f"   POST /events p50 {histogram.percentile(50) / 1000:.1f}ms, "
+              f"p95 {histogram.percentile(95) / 1000:.1f}ms, p99 {histogram.percentile(99) / 1000:.1f}ms")
+        for title in orphaned[:10]:
+            event = listed[title]
+            print(f"   - {title}: {len(event.get('gifts') or [])} gifts, "
+                  f"{len(event.get('wedding_roles') or [])} roles (POST {'ok' if outcomes[title] else 'failed'})")
+        self.recorder.merge(recorder)
+        return len(created) == self.child_events and not incomplete and not orphaned
+
     def test_list_events(self):
         """Test listing user's events"""
         print("\n🔍 Testing Event Listing...")
@@ -205,10 +493,18 @@ class EventManagementAPITester:
                 data = response.json()
                 print(f"✅ Events retrieved successfully")
                 print(f"   Total events: {len(data)}")
-                
-                for event in data:
+
+                # Same list again, paged with counts instead of nested arrays
+                paged = 0
+                for event in iter_pages(self.session, f"{self.base_url}/events",
+                                        params={"counts": "true"}, page_size=2):
+                    paged += 1
                     print(f"   - {event['title']} (ID: {event['id']}, Status: {event['status']})")
-                    print(f"     Guests: {len(event.get('guests', []))}, RSVPs: {len(event.get('rsvps', []))}")
+                    print(f"     Guests: {event.get('guests_count', 0)}, RSVPs: {event.get('rsvps_count', 0)}")
+
+                if paged != len(data):
+                    print(f"❌ Paged listing returned {paged} events, expected {len(data)}")
+                    return False
                 
                 return True
             else:
@@ -352,6 +648,9 @@ class EventManagementAPITester:
         if not all([self.event_id, self.template_id, self.guest_id]):
             print("\n⚠️  Skipping message sending test - missing required IDs")
             return False
+
+        if self.send_mode == 'async':
+            return self.test_send_messages_async()
             
         print(f"\n🔍 Testing Message Sending...")
         try:
@@ -387,6 +686,117 @@ class EventManagementAPITester:
             print(f"❌ Message sending error: {str(e)}")
             return False
 
+    def _dashboard_latency_ms(self, samples=5):
+        """Median wall-clock latency of GET /dashboard over a few calls"""
+        timings = []
+        for _ in range(samples):
+            started = time.perf_counter()
+            self.session.get(f"{self.base_url}/dashboard")
+            timings.append((time.perf_counter() - started) * 1000)
+        return sorted(timings)[len(timings) // 2]
+
+    def _seed_dashboard_messages(self, count):
+        """Log `count` more messages for the org by fanning sends out over imported guests"""
+        batch = min(count, 500)
+        lines = ["name,phone"] + [f"Dashboard Guest {i},+5511{800000000 + i}" for i in range(batch)]
+        response = self.session.post(
+            f"{self.base_url}/guests/import",
+            params={"eventId": self.event_id, "format": "csv"},
+            data="\n".join(lines).encode('utf-8'),
+            headers={'Content-Type': 'text/csv'},
+            timeout=600
+        )
+        if response.status_code != 200:
+            return 0
+        guest_ids = [r['id'] for r in response.json()['results'] if r['status'] == 'created']
+
+        logged = 0
+        while guest_ids and logged < count:
+            response = self.session.post(f"{self.base_url}/messages/send", json={
+                "eventId": self.event_id,
+                "templateId": self.template_id,
+                "guestIds": guest_ids[:count - logged]
+            }, timeout=3600)
+            if response.status_code != 200:
+                break
+            logged += len(response.json().get('results', []))
+        return logged
+
+    def test_dashboard_scaling(self):
+        """Seed growing message volumes and check /dashboard latency stays flat (only with --dashboard-seed)"""
+        if not all([self.event_id, self.template_id]):
+            print("\n⚠️  Skipping dashboard scaling test - missing required IDs")
+            return False
+
+        print(f"\n🔍 Testing Dashboard Scaling (up to {self.dashboard_seed_messages} messages)...")
+        steps = 4
+        baseline = self._dashboard_latency_ms()
+        print(f"   0 seeded messages: p50 {baseline:.1f}ms")
+
+        seeded = 0
+        latest = baseline
+        for step in range(1, steps + 1):
+            target = self.dashboard_seed_messages * step // steps
+            seeded += self._seed_dashboard_messages(target - seeded)
+            latest = self._dashboard_latency_ms()
+            print(f"   {seeded} seeded messages: p50 {latest:.1f}ms")
+
+        # Allow scheduling noise on small absolute numbers, but not growth with volume
+        limit = max(baseline * self.DASHBOARD_FLATNESS, baseline + 50)
+        if latest <= limit:
+            print(f"✅ Dashboard latency flat ({baseline:.1f}ms → {latest:.1f}ms)")
+            return True
+        print(f"❌ Dashboard latency grew with volume ({baseline:.1f}ms → {latest:.1f}ms, limit {limit:.1f}ms)")
+        return False
+
+    def test_send_messages_async(self, poll_interval=0.2, timeout=600):
+        """Submit a send job, poll its progress and record time-to-first-message and completion"""
+        print(f"\n🔍 Testing Message Sending (async job)...")
+        try:
+            submitted = time.perf_counter()
+            response = self.session.post(f"{self.base_url}/messages/send", json={
+                "eventId": self.event_id,
+                "templateId": self.template_id,
+                "guestIds": [self.guest_id],
+                "async": True
+            })
+            print(f"Status: {response.status_code}")
+
+            if response.status_code != 202:
+                error_data = response.json() if response.content else {}
+                print(f"❌ Job submission failed: {response.status_code}")
+                print(f"   Error: {error_data.get('error', 'Unknown error')}")
+                return False
+
+            job = response.json()['job']
+            print(f"✅ Job queued: {job['id']} ({job['total']} messages)")
+
+            first_message = None
+            while time.perf_counter() - submitted < timeout:
+                response = self.session.get(f"{self.base_url}/messages/jobs/{job['id']}")
+                if response.status_code != 200:
+                    print(f"❌ Job status failed: {response.status_code}")
+                    return False
+                job = response.json()
+                if first_message is None and job['processed'] > 0:
+                    first_message = time.perf_counter() - submitted
+                if job['status'] == 'completed':
+                    break
+                time.sleep(poll_interval)
+            else:
+                print(f"❌ Job did not complete within {timeout}s ({job['progress']}%)")
+                return False
+
+            completed = time.perf_counter() - submitted
+            self.send_timings = {"time_to_first_message": first_message, "completion": completed}
+            print(f"   Sent: {job['sent']}, Failed: {job['failed']}")
+            print(f"   Time to first message: {first_message:.2f}s (poll interval {poll_interval}s)")
+            print(f"   Completion time: {completed:.2f}s")
+            return job['failed'] == 0
+        except Exception as e:
+            print(f"❌ Async message sending error: {str(e)}")
+            return False
+
     def test_dashboard(self):
         """Test dashboard statistics"""
         print("\n🔍 Testing Dashboard...")
@@ -441,15 +851,27 @@ class EventManagementAPITester:
                 print(f"✅ Webhook properly rejects invalid secret")
                 
                 # Test with valid secret (from environment)
-                valid_secret = "8cba9473-6b24-4e63-b4e9-39b43f9c9d27"  # From .env
                 response = self.session.post(
-                    f"{self.base_url}/webhooks/evolution?secret={valid_secret}&org={self.org_id}",
+                    f"{self.base_url}/webhooks/evolution?secret={self.webhook_secret}&org={self.org_id}",
                     json=webhook_data
                 )
                 print(f"Status (valid secret): {response.status_code}")
                 
                 if response.status_code == 200:
                     print(f"✅ Webhook accepts valid secret")
+
+                    # A malformed org is refused instead of failing the inbox write with a 500
+                    response = self.session.post(
+                        f"{self.base_url}/webhooks/evolution?secret={self.webhook_secret}&org=not-a-uuid",
+                        json=webhook_data
+                    )
+                    print(f"Status (invalid org): {response.status_code}")
+                    if response.status_code != 400:
+                        print(f"❌ Webhook should reject an invalid org but returned: {response.status_code}")
+                        return False
+
+                    if self.webhook_replay:
+                        return self._replay_inbound_messages(self.webhook_replay)
                     return True
                 else:
                     print(f"❌ Webhook failed with valid secret: {response.status_code}")
@@ -461,6 +883,117 @@ class EventManagementAPITester:
             print(f"❌ Webhook validation error: {str(e)}")
             return False
 
+    # Guest replies cycled through by the replay; all of them classify as an RSVP
+    INBOUND_REPLIES = ("Sim", "Não vou poder 😢", "vou com 2", "+3", "Confirmado!", "não", "ok, estarei lá", "1")
+
+    def _seed_reply_guests(self, count):
+        """Create `count` guests with Brazilian mobile numbers; returns their E.164 phones"""
+        phones = [f"+55119{index:08d}" for index in range(count)]
+
+        def add(phone):
+            response = self.session.post(f"{self.base_url}/guests", json={
+                "eventId": self.event_id,
+                "name": f"Convidado WhatsApp {phone[-4:]}",
+                "phoneE164": phone
+            }, timeout=60)
+            return response.status_code == 200
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            created = sum(pool.map(add, phones))
+        return phones[:created]
+
+    def _inbound_payload(self, index, phone):
+        digits = phone.lstrip('+')
+        if index % 2:
+            digits = digits[:4] + digits[5:]  # WhatsApp JID without the mobile 9th digit
+        return {
+            "event": "messages.upsert",
+            "data": {
+                "key": {"remoteJid": f"{digits}@s.whatsapp.net", "fromMe": False, "id": uuid.uuid4().hex[:20].upper()},
+                "message": {"conversation": self.INBOUND_REPLIES[index % len(self.INBOUND_REPLIES)]},
+                "messageTimestamp": int(time.time())
+            }
+        }
+
+    def _replay_inbound_messages(self, count, reply_guests=50, drain_timeout=300):
+        """Fire `count` synthetic messages.upsert webhooks and measure ingest rate and processing lag"""
+        if not self.event_id:
+            print("⚠️  Skipping webhook replay - no event ID available")
+            return False
+
+        print(f"\n🔁 Replaying {count} inbound WhatsApp replies (concurrency {self.concurrency})...")
+        phones = self._seed_reply_guests(min(count, reply_guests))
+        if not phones:
+            print("❌ Could not seed guests for the replay")
+            return False
+
+        before = fetch_metrics(self.base_url, self.metrics_token)
+        url = f"{self.base_url}/webhooks/evolution?secret={self.webhook_secret}&org={self.org_id}"
+        recorder = LatencyRecorder()
+        local = threading.local()
+        acks = {"ok": 0, "failed": 0}
+        lock = threading.Lock()
+
+        def deliver(index):
+            if not hasattr(local, 'session'):
+                local.session = InstrumentedSession(recorder, self.base_url)
+            payload = self._inbound_payload(index, phones[index % len(phones)])
+            response = local.session.post(url, json=payload, timeout=60)
+            with lock:
+                acks["ok" if response.status_code == 200 else "failed"] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(deliver, range(count)))
+        ingest_elapsed = time.perf_counter() - started
+        ingest_rate = acks["ok"] / ingest_elapsed if ingest_elapsed > 0 else 0.0
+        histogram = recorder.histograms.get("POST /webhooks/evolution", LatencyHistogram())
+        self.recorder.merge(recorder)
+
+        print(f"   Ingest: {acks['ok']} acked, {acks['failed']} failed in {ingest_elapsed:.2f}s "
+              f"({ingest_rate:.1f} webhooks/s)")
+        print(f"   Ack latency p50 {histogram.percentile(50) / 1000:.1f}ms, p99 {histogram.percentile(99) / 1000:.1f}ms")
+
+        if not before:
+            print("   ⚠️  Pass --metrics-token to measure end-to-end processing lag")
+            return acks["failed"] == 0
+
+        # Poll the server's inbound counters until every acked reply has been applied
+        target = before['inboundRsvp']['processed'] + acks["ok"]
+        deadline = time.monotonic() + drain_timeout
+        after = before
+        while time.monotonic() < deadline:
+            after = fetch_metrics(self.base_url, self.metrics_token) or after
+            if after['inboundRsvp']['processed'] >= target:
+                break
+            time.sleep(0.1)
+        drained_elapsed = time.perf_counter() - started
+
+        inbound_before, inbound_after = before['inboundRsvp'], after['inboundRsvp']
+        processed = inbound_after['processed'] - inbound_before['processed']
+        matched = inbound_after['matched'] - inbound_before['matched']
+        updates = inbound_after['updates'] - inbound_before['updates']
+        errors = inbound_after['errors'] - inbound_before['errors']
+        queue_lag = (inbound_after['lagMsTotal'] - inbound_before['lagMsTotal']) / processed if processed else 0.0
+
+        print(f"   Processed: {processed}/{acks['ok']} in {drained_elapsed:.2f}s end-to-end "
+              f"({processed / drained_elapsed if drained_elapsed > 0 else 0:.1f} replies/s)")
+        print(f"   Matched {matched} replies with {updates} batched rsvps updates, {errors} batch errors")
+        print(f"   Queue lag: avg {queue_lag:.1f}ms, max {inbound_after['lagMsMax']:.1f}ms")
+
+        self.webhook_replay_results = {
+            "ingest_per_second": ingest_rate,
+            "end_to_end_seconds": drained_elapsed,
+            "queue_lag_avg_ms": queue_lag,
+            "processed": processed,
+            "matched": matched,
+        }
+        if processed < acks["ok"]:
+            print(f"❌ Only {processed} of {acks['ok']} replies processed within {drain_timeout}s")
+            return False
+        print("✅ Inbound replies processed")
+        return acks["failed"] == 0 and errors == 0
+
     def test_public_event_access(self):
         """Test public event access (no auth required)"""
         if not self.event_id:
@@ -470,11 +1003,7 @@ class EventManagementAPITester:
         print(f"\n🔍 Testing Public Event Access...")
         try:
             # Create a new session without authentication
-            public_session = requests.Session()
-            public_session.headers.update({
-                'Content-Type': 'application/json',
-                'Accept': 'application/json'
-            })
+            public_session = InstrumentedSession(self.recorder, self.base_url)
             
             response = public_session.get(f"{self.base_url}/public/event/{self.event_id}")
             print(f"Status: {response.status_code}")
@@ -501,11 +1030,7 @@ class EventManagementAPITester:
         print("\n🔍 Testing Authentication Protection...")
         try:
             # Create a new session without authentication
-            unauth_session = requests.Session()
-            unauth_session.headers.update({
-                'Content-Type': 'application/json',
-                'Accept': 'application/json'
-            })
+            unauth_session = InstrumentedSession(self.recorder, self.base_url)
             
             protected_endpoints = [
                 ('/me', 'GET'),
@@ -557,12 +1082,17 @@ class EventManagementAPITester:
             ("List Templates", self.test_list_templates),
             ("Send Messages", self.test_send_messages),
             ("Dashboard", self.test_dashboard),
+            ("Dashboard Scaling", self.test_dashboard_scaling),
             ("Webhook Validation", self.test_webhook_validation),
             ("Public Event Access", self.test_public_event_access),
             ("Authentication Protection", self.test_authentication_protection)
         ]
+        # Opt-in tests are left out of the run (and the pass count) unless configured
+        if not self.dashboard_seed_messages:
+            tests = [(name, func) for name, func in tests if func != self.test_dashboard_scaling]
         
         for test_name, test_func in tests:
+            first_request = len(self.session.request_log)
             try:
                 result = test_func()
                 test_results[test_name] = result
@@ -570,6 +1100,9 @@ class EventManagementAPITester:
             except Exception as e:
                 print(f"❌ {test_name} failed with exception: {str(e)}")
                 test_results[test_name] = False
+            # Requests made by this test, slowest first, to drill into the server's spans
+            self.test_traces[test_name] = sorted(self.session.request_log[first_request:],
+                                                 key=lambda entry: entry[1], reverse=True)
         
         # Summary
         print("\n" + "=" * 60)
@@ -581,7 +1114,12 @@ class EventManagementAPITester:
         
         for test_name, result in test_results.items():
             status = "✅ PASS" if result else "❌ FAIL"
-            print(f"{status} {test_name}")
+            traces = self.test_traces.get(test_name)
+            if traces and traces[0][3]:
+                route, seconds, _, trace_id = traces[0]
+                print(f"{status} {test_name}  (slowest: {route} {seconds * 1000:.1f}ms, trace {trace_id})")
+            else:
+                print(f"{status} {test_name}")
             if result:
                 passed += 1
             else:
@@ -593,9 +1131,1663 @@ class EventManagementAPITester:
             print("🎉 All backend API tests passed successfully!")
         else:
             print(f"⚠️  {failed} test(s) failed - check logs above for details")
+
+        self.recorder.print_report()
         
         return test_results
 
+class RequestPacer:
+    """Spaces requests from every virtual user to a shared target rate"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class LoadTestRunner:
+    """Runs the register → login → event → guest → send flow as N concurrent virtual users"""
+
+    FLOW_STEPS = [
+        "Register", "Login", "Create Event", "Add Guest", "Create Template", "Send Messages"
+    ]
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, users=10, ramp_up=5.0, rate=0.0):
+        self.base_url = base_url
+        self.users = max(1, int(users))
+        self.ramp_up = max(0.0, float(ramp_up))
+        self.pacer = RequestPacer(rate)
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.step_results = {step: {"ok": 0, "failed": 0} for step in self.FLOW_STEPS}
+        self.recorder = LatencyRecorder()
+
+    def _new_session(self):
+        return InstrumentedSession(self.recorder, self.base_url)
+
+    def _request(self, session, method, path, **kwargs):
+        self.pacer.wait()
+        return session.request(method, f"{self.base_url}{path}", timeout=120, **kwargs)
+
+    def _record(self, step, ok):
+        with self.lock:
+            self.step_results[step]["ok" if ok else "failed"] += 1
+        return ok
+
+    def run_user_flow(self, user_index):
+        """Run the full flow for one virtual user; stops at the first failed step"""
+        session = self._new_session()
+        suffix = uuid.uuid4().hex[:8]
+        email = f"loaduser_{user_index}_{suffix}@example.com"
+        password = "TestPassword123!"
+
+        try:
+            response = self._request(session, "POST", "/auth/register", json={
+                "fullName": f"Load User {user_index}",
+                "email": email,
+                "password": password,
+                "orgName": f"Load Org {suffix}"
+            })
+            if not self._record("Register", response.status_code == 200):
+                return False
+
+            response = self._request(session, "POST", "/auth/login", json={
+                "email": email,
+                "password": password
+            })
+            if not self._record("Login", response.status_code == 200):
+                return False
+
+            response = self._request(session, "POST", "/events", json={
+                "title": f"Load Event {suffix}",
+                "description": "Load test event",
+                "location": "Load Venue",
+                "startsAt": (datetime.now() + timedelta(days=7)).isoformat()
+            })
+            if not self._record("Create Event", response.status_code == 200):
+                return False
+            event_id = response.json().get('event', {}).get('id')
+
+            response = self._request(session, "POST", "/guests", json={
+                "eventId": event_id,
+                "name": f"Guest {suffix}",
+                "phoneE164": f"+5511{900000000 + user_index}",
+                "email": f"guest_{suffix}@example.com",
+                "tag": "load"
+            })
+            if not self._record("Add Guest", response.status_code == 200):
+                return False
+            guest_id = response.json()['id']
+
+            response = self._request(session, "POST", "/templates", json={
+                "name": f"Load Template {suffix}",
+                "bodyText": "Hello {{name}}! You're invited to {{event_title}}: {{rsvp_link}}",
+                "channel": "whatsapp"
+            })
+            if not self._record("Create Template", response.status_code == 200):
+                return False
+            template_id = response.json()['id']
+
+            response = self._request(session, "POST", "/messages/send", json={
+                "eventId": event_id,
+                "templateId": template_id,
+                "guestIds": [guest_id]
+            })
+            return self._record("Send Messages", response.status_code == 200)
+        except Exception as e:
+            print(f"❌ Virtual user {user_index} error: {str(e)}")
+            return False
+
+    def run(self):
+        """Start all virtual users, spreading their start times over the ramp-up window"""
+        print("🚀 Starting Load Test")
+        print(f"📍 Base URL: {self.base_url}")
+        print(f"👥 Virtual users: {self.users}, ramp-up: {self.ramp_up}s, "
+              f"target rate: {self.rate or 'unthrottled'} req/s")
+        print("=" * 60)
+
+        delay = self.ramp_up / self.users if self.users > 1 else 0.0
+        started = time.monotonic()
+        completed = 0
+
+        with ThreadPoolExecutor(max_workers=self.users) as pool:
+            futures = []
+            for index in range(self.users):
+                futures.append(pool.submit(self.run_user_flow, index))
+                if delay and index < self.users - 1:
+                    time.sleep(delay)
+            for future in as_completed(futures):
+                if future.result():
+                    completed += 1
+
+        elapsed = time.monotonic() - started
+
+        print("\n" + "=" * 60)
+        print("📊 LOAD TEST SUMMARY")
+        print("=" * 60)
+        for step in self.FLOW_STEPS:
+            counts = self.step_results[step]
+            status = "✅" if counts["failed"] == 0 else "❌"
+            print(f"{status} {step}: {counts['ok']} ok, {counts['failed']} failed")
+
+        print(f"\n📈 {completed}/{self.users} virtual users completed the flow in {elapsed:.2f}s")
+        self.recorder.print_report()
+
+        return self.step_results
+
+
+def register_and_login(session, base_url, label):
+    """Register a throwaway user + org and log the session in; returns the credentials or None"""
+    suffix = uuid.uuid4().hex[:8]
+    email = f"{label.lower().replace(' ', '_')}_{suffix}@example.com"
+    password = "TestPassword123!"
+
+    response = session.post(f"{base_url}/auth/register", json={
+        "fullName": label,
+        "email": email,
+        "password": password,
+        "orgName": f"{label} Org {suffix}"
+    })
+    if response.status_code != 200:
+        print(f"❌ Registration failed: {response.status_code}")
+        return None
+
+    response = session.post(f"{base_url}/auth/login", json={"email": email, "password": password})
+    if response.status_code != 200:
+        print(f"❌ Login failed: {response.status_code}")
+        return None
+    return {"email": email, "password": password}
+
+
+def post_benchmark_event(session, base_url, title, **extra):
+    """Create a free event and return its JSON (or None)"""
+    payload = {
+        "title": title,
+        "description": "Benchmark event",
+        "location": "Benchmark Hall",
+        "startsAt": (datetime.now() + timedelta(days=30)).isoformat()
+    }
+    payload.update(extra)
+    response = session.post(f"{base_url}/events", json=payload)
+    if response.status_code != 200:
+        print(f"❌ Event creation failed: {response.status_code}")
+        return None
+    return response.json().get('event') or None
+
+
+def create_benchmark_event(session, base_url, title, **extra):
+    """Create a free event and return its id (or None)"""
+    event = post_benchmark_event(session, base_url, title, **extra)
+    return event.get('id') if event else None
+
+
+def create_public_event(session, base_url, title, guests_planned=0):
+    """Create a free event that allows companions and return (event_id, rsvp_token), or (None, None)"""
+    event = post_benchmark_event(session, base_url, title, guests=guests_planned, allowCompanion=True)
+    return (event.get('id'), event.get('rsvp_token')) if event else (None, None)
+
+
+def setup_benchmark(session, base_url, label, event_title, public=False, guests_planned=0):
+    """Log a throwaway owner in on `session` and create the benchmark's event
+
+    Returns (event_id, rsvp_token); the token is None for non-public events and both are None
+    when a step failed.
+    """
+    if not register_and_login(session, base_url, label):
+        return None, None
+    if public:
+        return create_public_event(session, base_url, event_title, guests_planned)
+    return create_benchmark_event(session, base_url, event_title), None
+
+
+class BulkSendBenchmark:
+    """Seeds events with many guests through /api/guests and times a full fan-out send"""
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, sizes=(100, 1000, 10000), seed_workers=16,
+                 evolution_standin_url=None, gateway_rate=0.0):
+        self.base_url = base_url
+        self.sizes = list(sizes)
+        self.seed_workers = max(1, int(seed_workers))
+        self.evolution_standin_url = evolution_standin_url.rstrip('/') if evolution_standin_url else None
+        self.gateway_rate = float(gateway_rate or 0.0)
+        self.recorder = LatencyRecorder()
+        self.session = InstrumentedSession(self.recorder, base_url)
+        self.template_id = None
+        self.results = []
+
+    def _worker_session(self):
+        session = InstrumentedSession(self.recorder, self.base_url)
+        session.cookies.update(self.session.cookies)
+        return session
+
+    def setup(self):
+        """Register and log in a fresh user and create the invitation template"""
+        suffix = uuid.uuid4().hex[:8]
+        if not register_and_login(self.session, self.base_url, "Bulk Send Benchmark"):
+            return False
+
+        response = self.session.post(f"{self.base_url}/templates", json={
+            "name": f"Bulk Template {suffix}",
+            "bodyText": "Olá {{name}}! Você está convidado para {{event_title}} em {{location}} "
+                        "no dia {{starts_at}}. Confirme sua presença: {{rsvp_link}}",
+            "channel": "whatsapp"
+        })
+        if response.status_code != 200:
+            print(f"❌ Template creation failed: {response.status_code}")
+            return False
+        self.template_id = response.json()['id']
+
+        if self.gateway_rate:
+            # Make the stand-in enforce a per-instance send limit, like the real gateway
+            config = self._standin("POST", "config", {"rate_limit": {"per_second": self.gateway_rate}})
+            if not config:
+                print("❌ --gateway-rate needs a reachable --evolution-standin")
+                return False
+            print(f"   Gateway stand-in limited to {self.gateway_rate:g} sends/s per instance")
+        return True
+
+    def seed_guests(self, event_id, count):
+        """Create `count` guests concurrently; returns the created guest ids"""
+        local = threading.local()
+
+        def add_guest(index):
+            if not hasattr(local, 'session'):
+                local.session = self._worker_session()
+            response = local.session.post(f"{self.base_url}/guests", json={
+                "eventId": event_id,
+                "name": f"Guest {index:05d}",
+                "phoneE164": f"+5511{900000000 + index}",
+                "tag": "bulk"
+            }, timeout=120)
+            return response.json()['id'] if response.status_code == 200 else None
+
+        with ThreadPoolExecutor(max_workers=self.seed_workers) as pool:
+            return [guest_id for guest_id in pool.map(add_guest, range(count)) if guest_id]
+
+    def _standin(self, method, path, body=None):
+        if not self.evolution_standin_url:
+            return None
+        try:
+            response = requests.request(method, f"{self.evolution_standin_url}/__standin/{path}",
+                                        json=body, timeout=10)
+            return response.json()
+        except Exception as e:
+            print(f"⚠️  Evolution stand-in unreachable: {str(e)}")
+            return None
+
+    def run_size(self, size):
+        print(f"\n🔍 Bulk send with {size} guests...")
+        event_id = create_benchmark_event(self.session, self.base_url, f"Bulk Send {size} guests")
+        if not event_id:
+            return None
+
+        started = time.perf_counter()
+        guest_ids = self.seed_guests(event_id, size)
+        seed_elapsed = time.perf_counter() - started
+        print(f"   Seeded {len(guest_ids)}/{size} guests in {seed_elapsed:.2f}s "
+              f"({len(guest_ids) / seed_elapsed:.1f} guests/s)")
+        if not guest_ids:
+            return None
+
+        self._standin("POST", "reset")
+        started = time.perf_counter()
+        response = self.session.post(f"{self.base_url}/messages/send", json={
+            "eventId": event_id,
+            "templateId": self.template_id,
+            "guestIds": guest_ids
+        }, timeout=3600)
+        elapsed = time.perf_counter() - started
+
+        sent = failed = 0
+        if response.status_code == 200:
+            statuses = [r.get('status') for r in response.json().get('results', [])]
+            sent = statuses.count('sent')
+            failed = statuses.count('failed')
+            print(f"✅ Send finished: {sent} sent, {failed} failed")
+        else:
+            error_data = response.json() if response.content else {}
+            print(f"❌ Send failed: {response.status_code} {error_data.get('error', '')}")
+
+        result = {
+            "size": size,
+            "seeded": len(guest_ids),
+            "status": response.status_code,
+            "sent": sent,
+            "failed": failed,
+            "wall_time": elapsed,
+            "messages_per_second": sent / elapsed if elapsed > 0 else 0.0,
+        }
+        print(f"   Wall time: {elapsed:.2f}s, throughput: {result['messages_per_second']:.1f} messages/s")
+
+        stats = self._standin("GET", "stats")
+        if stats:
+            result["gateway_messages"] = stats.get('messages_sent', 0)
+            print(f"   Gateway saw {stats.get('messages_sent', 0)} messages "
+                  f"({stats.get('operations', {}).get('send_message', {})})")
+
+            limit = stats.get('rate_limit', {})
+            if self.gateway_rate and limit.get('instances'):
+                achieved = max(i['achieved_per_second'] for i in limit['instances'].values())
+                allowed = limit['allowed_per_second']
+                result["gateway_achieved_per_second"] = achieved
+                result["gateway_rejected"] = limit['rejected']
+                print(f"   Achieved {achieved:.2f}/s of {allowed:g}/s allowed ({achieved / allowed * 100:.0f}%), "
+                      f"{limit['rejected']} calls rejected with 429")
+
+        self.results.append(result)
+        return result
+
+    def run(self):
+        print("🚀 Starting Bulk Message-Send Benchmark")
+        print(f"📍 Base URL: {self.base_url}")
+        print(f"📦 Guest counts: {', '.join(str(size) for size in self.sizes)}")
+        print("=" * 60)
+
+        if not self.setup():
+            return self.results
+
+        for size in self.sizes:
+            self.run_size(size)
+
+        print("\n" + "=" * 60)
+        print("📊 BULK SEND SUMMARY")
+        print("=" * 60)
+        print(f"   {'guests':>8} {'sent':>8} {'failed':>8} {'wall s':>10} {'msg/s':>10}")
+        for r in self.results:
+            print(f"   {r['size']:>8} {r['sent']:>8} {r['failed']:>8} "
+                  f"{r['wall_time']:>10.2f} {r['messages_per_second']:>10.1f}")
+
+        self.recorder.print_report()
+        return self.results
+
+
+class MessageLogBenchmark(BulkSendBenchmark):
+    """Database calls and `messages` growth per sent message, from the /api/metrics counters
+
+    Run it against servers started with MESSAGE_LOG_PAYLOAD=full and =compact (and with
+    MESSAGE_LOG_BATCH_SIZE=1 for the old one-insert-per-message behaviour) to compare.
+    """
+
+    PROJECTED_SENDS = 10000
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, messages=1000, metrics_token=None, evolution_standin_url=None):
+        super().__init__(base_url, sizes=(messages,), evolution_standin_url=evolution_standin_url)
+        self.messages = int(messages)
+        self.metrics_token = metrics_token
+
+    def _import_guests(self, event_id):
+        client = GuestImportClient(self.base_url)
+        client.session.cookies.update(self.session.cookies)
+        path = f"/tmp/message_log_guests_{uuid.uuid4().hex[:8]}.csv"
+        client.write_synthetic_file(path, self.messages)
+        try:
+            client.upload(path, event_id, 'csv')
+        finally:
+            os.remove(path)
+        return [guest['id'] for guest in iter_pages(self.session, f"{self.base_url}/events/{event_id}/guests",
+                                                    page_size=500, items_key="guests")]
+
+    def run(self):
+        print("🚀 Starting Message Log Benchmark")
+        print(f"📍 Base URL: {self.base_url}")
+        print(f"📦 Messages: {self.messages}")
+        print("=" * 60)
+
+        if not fetch_metrics(self.base_url, self.metrics_token):
+            print("❌ --message-log needs --metrics-token (METRICS_TOKEN on the server)")
+            return None
+        if not self.setup():
+            return None
+        event_id = create_benchmark_event(self.session, self.base_url, "Message Log Benchmark")
+        if not event_id:
+            return None
+
+        guest_ids = self._import_guests(event_id)
+        print(f"   {len(guest_ids)} guests ready")
+        if not guest_ids:
+            return None
+
+        self._standin("POST", "reset")
+        before = fetch_metrics(self.base_url, self.metrics_token)
+        started = time.perf_counter()
+        response = self.session.post(f"{self.base_url}/messages/send", json={
+            "eventId": event_id,
+            "templateId": self.template_id,
+            "guestIds": guest_ids
+        }, timeout=3600)
+        elapsed = time.perf_counter() - started
+        after = fetch_metrics(self.base_url, self.metrics_token)
+
+        if response.status_code != 200:
+            error_data = response.json() if response.content else {}
+            print(f"❌ Send failed: {response.status_code} {error_data.get('error', '')}")
+            return None
+
+        statuses = [r.get('status') for r in response.json().get('results', [])]
+        processed = len(statuses)
+        db_calls = after['supabase']['supabaseOriginRequests'] - before['supabase']['supabaseOriginRequests']
+        log_before, log_after = before['messageLog'], after['messageLog']
+        rows = log_after['rows'] - log_before['rows']
+        inserts = (log_after['inserts'] + log_after['fallbackInserts']
+                   - log_before['inserts'] - log_before['fallbackInserts'])
+        payload_bytes = log_after['payloadBytes'] - log_before['payloadBytes']
+
+        result = {
+            "messages": processed,
+            "sent": statuses.count('sent'),
+            "failed": statuses.count('failed'),
+            "wall_time": elapsed,
+            "payload_mode": log_after['payloadMode'],
+            "db_calls": db_calls,
+            "db_calls_per_message": db_calls / processed if processed else 0.0,
+            "log_inserts": inserts,
+            "log_rows": rows,
+            "payload_bytes_per_row": payload_bytes / rows if rows else 0.0,
+        }
+        projected_mb = result["payload_bytes_per_row"] * self.PROJECTED_SENDS / (1024 * 1024)
+
+        print("\n" + "=" * 60)
+        print("📊 MESSAGE LOG SUMMARY")
+        print("=" * 60)
+        print(f"   Payload mode: {result['payload_mode']}")
+        print(f"   {result['sent']} sent, {result['failed']} failed in {elapsed:.2f}s")
+        print(f"   Supabase calls: {db_calls} ({result['db_calls_per_message']:.3f} per message)")
+        print(f"   Log writes: {inserts} inserts for {rows} rows "
+              f"({rows / inserts if inserts else 0:.1f} rows per insert)")
+        print(f"   Payload: {result['payload_bytes_per_row']:.0f} bytes per row, "
+              f"~{projected_mb:.2f} MB of payload per {self.PROJECTED_SENDS} sends")
+        self.recorder.print_report()
+        return result
+
+
+class GuestImportClient:
+    """Streams large CSV/JSONL guest files to /api/guests/import without loading them into memory"""
+
+    CHUNK_BYTES = 64 * 1024
+    CONTENT_TYPES = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+    def __init__(self, base_url=DEFAULT_BASE_URL):
+        self.base_url = base_url
+        self.recorder = LatencyRecorder()
+        self.session = InstrumentedSession(self.recorder, base_url)
+
+    @staticmethod
+    def write_synthetic_file(path, count, file_format='csv'):
+        """Write `count` fake guests to `path` one line at a time"""
+        with open(path, 'w', encoding='utf-8') as handle:
+            if file_format == 'csv':
+                handle.write("name,phone,email,tag\n")
+            for index in range(count):
+                name = f"Convidado {index:06d}"
+                phone = f"+5511{900000000 + index}"
+                email = f"convidado{index}@example.com"
+                if file_format == 'csv':
+                    handle.write(f'"{name}",{phone},{email},import\n')
+                else:
+                    handle.write(json.dumps({"name": name, "phone": phone, "email": email, "tag": "import"}) + "\n")
+
+    def _file_chunks(self, path):
+        with open(path, 'rb') as handle:
+            while True:
+                chunk = handle.read(self.CHUNK_BYTES)
+                if not chunk:
+                    break
+                yield chunk
+
+    def upload(self, path, event_id, file_format=None):
+        """Stream `path` as a chunked request body; returns the parsed response or None"""
+        file_format = file_format or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        print(f"\n🔍 Streaming guest import ({file_format}) from {path}...")
+
+        started = time.perf_counter()
+        response = self.session.post(
+            f"{self.base_url}/guests/import",
+            params={"eventId": event_id, "format": file_format},
+            data=self._file_chunks(path),
+            headers={'Content-Type': self.CONTENT_TYPES[file_format]},
+            timeout=3600
+        )
+        elapsed = time.perf_counter() - started
+        print(f"Status: {response.status_code}")
+
+        if response.status_code != 200:
+            error_data = response.json() if response.content else {}
+            print(f"❌ Guest import failed: {error_data.get('error', 'Unknown error')}")
+            return None
+
+        data = response.json()
+        rate = data['total'] / elapsed if elapsed > 0 else 0.0
+        print(f"✅ Imported {data['created']}/{data['total']} rows in {elapsed:.2f}s ({rate:.1f} rows/s)")
+        for failure in [r for r in data.get('results', []) if r['status'] == 'error'][:10]:
+            print(f"   - Row {failure['row']}: {failure['error']}")
+        return data
+
+    def run(self, path=None, synthetic_rows=0, file_format='csv'):
+        print("🚀 Starting Guest Import")
+        print(f"📍 Base URL: {self.base_url}")
+        print("=" * 60)
+
+        event_id, _ = setup_benchmark(self.session, self.base_url, "Guest Import", "Guest Import Benchmark")
+        if not event_id:
+            return None
+
+        if not path:
+            path = f"/tmp/guests_{uuid.uuid4().hex[:8]}.{file_format}"
+            self.write_synthetic_file(path, synthetic_rows, file_format)
+            print(f"📝 Wrote {synthetic_rows} synthetic guests to {path}")
+
+        data = self.upload(path, event_id)
+        self.recorder.print_report()
+        return data
+
+
+class SessionEndpointBenchmark:
+    """Hammers /api/me and /api/dashboard with one logged-in session
+
+    Run it once against a server started with ORG_CACHE_TTL_MS=0 (before) and once with the
+    default cache (after) to compare the cost of the user -> org / org -> instance lookups.
+    """
+
+    ENDPOINTS = ("/me", "/dashboard")
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, iterations=200, concurrency=8):
+        self.base_url = base_url
+        self.iterations = max(1, int(iterations))
+        self.concurrency = max(1, int(concurrency))
+        self.recorder = LatencyRecorder()
+        self.session = InstrumentedSession(self.recorder, base_url)
+
+    def run(self):
+        print("🚀 Starting Session Endpoint Benchmark")
+        print(f"📍 Base URL: {self.base_url}")
+        print(f"🔁 {self.iterations} iterations per endpoint, concurrency {self.concurrency}")
+        print("=" * 60)
+
+        if not register_and_login(self.session, self.base_url, "Session Benchmark"):
+            return None
+
+        # First hit per endpoint is cold; keep it out of the steady-state numbers
+        cold = {}
+        for endpoint in self.ENDPOINTS:
+            started = time.perf_counter()
+            response = self.session.get(f"{self.base_url}{endpoint}")
+            cold[endpoint] = (time.perf_counter() - started) * 1000
+            print(f"   Cold GET {endpoint}: {response.status_code} in {cold[endpoint]:.1f}ms")
+
+        self.recorder = LatencyRecorder()
+        local = threading.local()
+        failures = []
+
+        def hit(endpoint):
+            if not hasattr(local, 'session'):
+                local.session = InstrumentedSession(self.recorder, self.base_url)
+                local.session.cookies.update(self.session.cookies)
+            response = local.session.get(f"{self.base_url}{endpoint}", timeout=60)
+            if response.status_code != 200:
+                failures.append((endpoint, response.status_code))
+
+        calls = [endpoint for _ in range(self.iterations) for endpoint in self.ENDPOINTS]
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(hit, calls))
+
+        print("\n" + "=" * 60)
+        print("📊 SESSION ENDPOINT SUMMARY")
+        print("=" * 60)
+        if failures:
+            print(f"❌ {len(failures)} failed requests (first: {failures[0]})")
+        else:
+            print(f"✅ {len(calls)} requests succeeded")
+        self.recorder.print_report()
+        return {"cold_ms": cold, "failures": len(failures)}
+
+
+class TemplateRenderBenchmark:
+    """Compares send time for a short and a very long template over the same guests
+
+    The difference between the two runs is dominated by template rendering, which makes
+    regressions in the render path visible independently of gateway latency.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, guests=1000, placeholders=400):
+        self.base_url = base_url
+        self.guests = max(1, int(guests))
+        self.placeholders = max(1, int(placeholders))
+        self.recorder = LatencyRecorder()
+        self.session = InstrumentedSession(self.recorder, base_url)
+
+    def _long_template(self):
+        variables = ["name", "event_title", "location", "starts_at", "ends_at", "rsvp_link", "email", "tag"]
+        sentences = [
+            f"Linha {i}: {{{{{variables[i % len(variables)]}}}}} — detalhes do convite para você."
+            for i in range(self.placeholders)
+        ]
+        return "\n".join(sentences)
+
+    def _create_template(self, name, body):
+        response = self.session.post(f"{self.base_url}/templates", json={
+            "name": name, "bodyText": body, "channel": "whatsapp"
+        })
+        return response.json()['id'] if response.status_code == 200 else None
+
+    def _timed_send(self, event_id, template_id, guest_ids):
+        started = time.perf_counter()
+        response = self.session.post(f"{self.base_url}/messages/send", json={
+            "eventId": event_id, "templateId": template_id, "guestIds": guest_ids
+        }, timeout=3600)
+        elapsed = time.perf_counter() - started
+        results = response.json().get('results', []) if response.status_code == 200 else []
+        return elapsed, sum(1 for r in results if r.get('status') == 'sent')
+
+    def run(self):
+        print("🚀 Starting Template Render Benchmark")
+        print(f"📍 Base URL: {self.base_url}")
+        print(f"👥 {self.guests} guests, long template with {self.placeholders} placeholders")
+        print("=" * 60)
+
+        event_id, _ = setup_benchmark(self.session, self.base_url, "Template Benchmark",
+                                      "Template Render Benchmark")
+        if not event_id:
+            return None
+
+        lines = ["name,phone,email,tag"] + [
+            f"Convidado {i},+5511{700000000 + i},c{i}@example.com,vip" for i in range(self.guests)
+        ]
+        response = self.session.post(
+            f"{self.base_url}/guests/import",
+            params={"eventId": event_id, "format": "csv"},
+            data="\n".join(lines).encode('utf-8'),
+            headers={'Content-Type': 'text/csv'},
+            timeout=600
+        )
+        if response.status_code != 200:
+            print(f"❌ Guest seeding failed: {response.status_code}")
+            return None
+        guest_ids = [r['id'] for r in response.json()['results'] if r['status'] == 'created']
+
+        long_body = self._long_template()
+        short_id = self._create_template("Render Short", "Olá {{name}}! {{rsvp_link}}")
+        long_id = self._create_template("Render Long", long_body)
+        if not short_id or not long_id:
+            print("❌ Template creation failed")
+            return None
+
+        short_time, short_sent = self._timed_send(event_id, short_id, guest_ids)
+        long_time, long_sent = self._timed_send(event_id, long_id, guest_ids)
+        render_overhead = (long_time - short_time) / max(1, len(guest_ids)) * 1000
+
+        print("\n" + "=" * 60)
+        print("📊 TEMPLATE RENDER SUMMARY")
+        print("=" * 60)
+        print(f"   Long template: {len(long_body)} chars, {self.placeholders} placeholders")
+        print(f"   Short template send: {short_sent} messages in {short_time:.2f}s")
+        print(f"   Long template send:  {long_sent} messages in {long_time:.2f}s")
+        print(f"   Render-dominated overhead: {render_overhead:.3f}ms per message")
+        self.recorder.print_report()
+        return {"short": short_time, "long": long_time, "overhead_ms_per_message": render_overhead}
+
+
+class PublicRsvpStress:
+    """Many anonymous confirms (with companions) against a single rsvp_token"""
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, confirms=500, companions=4, concurrency=32):
+        self.base_url = base_url
+        self.confirms = max(1, int(confirms))
+        self.companions = max(0, int(companions))
+        self.concurrency = max(1, int(concurrency))
+        self.recorder = LatencyRecorder()
+
+    def run(self):
+        print("🚀 Starting Public RSVP Stress Test")
+        print(f"📍 Base URL: {self.base_url}")
+        print(f"✉️  {self.confirms} confirms × {self.companions} companions, concurrency {self.concurrency}")
+        print("=" * 60)
+
+        owner = InstrumentedSession(LatencyRecorder(), self.base_url)
+        _, token = setup_benchmark(owner, self.base_url, "RSVP Stress", "Public RSVP Stress", public=True)
+        if not token:
+            return None
+
+        local = threading.local()
+        outcomes = {"ok": 0, "failed": 0}
+        lock = threading.Lock()
+
+        def confirm(index):
+            if not hasattr(local, 'session'):
+                local.session = InstrumentedSession(self.recorder, self.base_url)
+            response = local.session.post(f"{self.base_url}/public/rsvp/confirm", json={
+                "token": token,
+                "name": f"Convidado Público {index:05d}",
+                "companions": [f"Acompanhante {index:05d}-{c}" for c in range(self.companions)]
+            }, timeout=120)
+            with lock:
+                outcomes["ok" if response.status_code == 200 else "failed"] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(confirm, range(self.confirms)))
+        elapsed = time.perf_counter() - started
+
+        histogram = self.recorder.histograms.get("POST /public/rsvp/confirm", LatencyHistogram())
+        rate = outcomes["ok"] / elapsed if elapsed > 0 else 0.0
+
+        print("\n" + "=" * 60)
+        print("📊 PUBLIC RSVP STRESS SUMMARY")
+        print("=" * 60)
+        status = "✅" if outcomes["failed"] == 0 else "❌"
+        print(f"{status} {outcomes['ok']} confirmed, {outcomes['failed']} failed in {elapsed:.2f}s")
+        print(f"   Throughput: {rate:.1f} confirms/s ({rate * (1 + self.companions):.1f} guests/s)")
+        print(f"   p50 {histogram.percentile(50) / 1000:.1f}ms, p99 {histogram.percentile(99) / 1000:.1f}ms")
+        self.recorder.print_report()
+        return {"confirms_per_second": rate, "p99_ms": histogram.percentile(99) / 1000, **outcomes}
+
+
+class RsvpStreamFanoutTest:
+    """Hundreds of GET /events/{id}/rsvps/stream subscribers while public confirms land
+
+    Fan-out latency runs from posting a confirm to each subscriber receiving the frame that
+    names that guest. With --metrics-token the server memory held per open stream is
+    taken from the /api/metrics heap/RSS before and after the streams are opened.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, subscribers=200, confirms=50, concurrency=8,
+                 metrics_token=None, settle_timeout=30.0):
+        self.base_url = base_url
+        self.subscribers = max(1, int(subscribers))
+        self.confirms = max(1, int(confirms))
+        self.concurrency = max(1, int(concurrency))
+        self.metrics_token = metrics_token
+        self.settle_timeout = float(settle_timeout)
+        self.recorder = LatencyRecorder()
+        self.lock = threading.Lock()
+        self.responses = []
+        self.ready = 0
+        self.failed = 0
+        self.frames = 0
+        self.arrivals = {}
+
+    def _subscribe(self, cookies, event_id):
+        session = requests.Session()
+        session.cookies.update(cookies)
+        try:
+            response = session.get(f"{self.base_url}/events/{event_id}/rsvps/stream", stream=True, timeout=(10, None))
+        except Exception:
+            with self.lock:
+                self.failed += 1
+            return
+        if response.status_code != 200:
+            with self.lock:
+                self.failed += 1
+            return
+
+        with self.lock:
+            self.responses.append(response)
+        event_type = None
+        try:
+            # chunk_size=None hands over each frame as it arrives instead of waiting for a full chunk
+            for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+                if line.startswith('event: '):
+                    event_type = line[len('event: '):]
+                elif line.startswith('data: '):
+                    received = time.perf_counter()
+                    data = json.loads(line[len('data: '):])
+                    with self.lock:
+                        if event_type == 'snapshot':
+                            self.ready += 1
+                        elif event_type == 'rsvp':
+                            self.frames += 1
+                            for change in data.get('changes', []):
+                                self.arrivals.setdefault(change.get('name'), []).append(received)
+        except Exception:
+            pass  # closed at the end of run()
+
+    def _memory(self, metrics):
+        return (metrics['memory']['heapUsed'], metrics['memory']['rss']) if metrics else (None, None)
+
+    def run(self):
+        print("🚀 Starting RSVP Stream Fan-out Test")
+        print(f"📍 Base URL: {self.base_url}")
+        print(f"📡 {self.subscribers} subscribers, {self.confirms} confirms (concurrency {self.concurrency})")
+        print("=" * 60)
+
+        owner = InstrumentedSession(LatencyRecorder(), self.base_url)
+        event_id, token = setup_benchmark(owner, self.base_url, "RSVP Stream", "RSVP Stream Fan-out", public=True)
+        if not event_id:
+            return None
+
+        heap_before, rss_before = self._memory(fetch_metrics(self.base_url, self.metrics_token))
+        threads = [threading.Thread(target=self._subscribe, args=(owner.cookies, event_id), daemon=True)
+                   for _ in range(self.subscribers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        while self.ready + self.failed < self.subscribers and time.perf_counter() - started < self.settle_timeout:
+            time.sleep(0.05)
+        print(f"\n🔍 {self.ready} streams open ({self.failed} failed) in {time.perf_counter() - started:.2f}s")
+        if not self.ready:
+            return None
+
+        opened = fetch_metrics(self.base_url, self.metrics_token)
+        heap_after, rss_after = self._memory(opened)
+
+        posted = {}
+        local = threading.local()
+
+        def confirm(index):
+            if not hasattr(local, 'session'):
+                local.session = InstrumentedSession(self.recorder, self.base_url)
+            name = f"Convidado Stream {index:05d}"
+            posted[name] = time.perf_counter()
+            response = local.session.post(f"{self.base_url}/public/rsvp/confirm",
+                                          json={"token": token, "name": name}, timeout=120)
+            if response.status_code != 200:
+                posted.pop(name, None)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(confirm, range(self.confirms)))
+
+        subscribers = self.ready
+        expected = len(posted) * subscribers
+        deadline = time.perf_counter() + self.settle_timeout
+        while time.perf_counter() < deadline:
+            with self.lock:
+                delivered = sum(len(self.arrivals.get(name, [])) for name in posted)
+            if delivered >= expected:
+                break
+            time.sleep(0.05)
+
+        histogram = LatencyHistogram()
+        with self.lock:
+            for name, sent_at in posted.items():
+                for received in self.arrivals.get(name, []):
+                    histogram.record((received - sent_at) * 1_000_000)
+            for response in self.responses:
+                response.close()
+        after = fetch_metrics(self.base_url, self.metrics_token)
+
+        print("\n" + "=" * 60)
+        print("📊 RSVP STREAM FAN-OUT SUMMARY")
+        print("=" * 60)
+        status = "✅" if histogram.total == expected else "❌"
+        print(f"{status} {histogram.total}/{expected} deliveries of {len(posted)} confirms "
+              f"to {subscribers} subscribers ({self.frames} frames)")
+        print(f"   Fan-out latency: p50 {histogram.percentile(50) / 1000:.1f}ms, "
+              f"p95 {histogram.percentile(95) / 1000:.1f}ms, p99 {histogram.percentile(99) / 1000:.1f}ms, "
+              f"max {histogram.max_value / 1000:.1f}ms")
+
+        result = {
+            "subscribers": subscribers,
+            "deliveries": histogram.total,
+            "expected": expected,
+            "p50_ms": histogram.percentile(50) / 1000,
+            "p99_ms": histogram.percentile(99) / 1000,
+        }
+        if heap_before is not None and heap_after is not None:
+            result["heap_bytes_per_subscriber"] = (heap_after - heap_before) / subscribers
+            result["rss_bytes_per_subscriber"] = (rss_after - rss_before) / subscribers
+            print(f"   Server memory per subscriber: {result['heap_bytes_per_subscriber'] / 1024:.1f} KiB heap, "
+                  f"{result['rss_bytes_per_subscriber'] / 1024:.1f} KiB RSS")
+        if after and 'rsvpStream' in after:
+            stream = after['rsvpStream']
+            print(f"   Hub: {stream['frames']} frames, {stream['deliveries']} deliveries, "
+                  f"{stream['bytesSent'] / 1024:.1f} KiB sent, {stream['tallyLoads']} tally loads, "
+                  f"{stream['slowDropped']} slow subscribers dropped")
+        self.recorder.print_report()
+        return result
+
+
+class ThunderingHerdTest:
+    """Fires thousands of concurrent GET /public/rsvp/{token} on one token
+
+    Reports latency and the share of requests answered from the server's token cache,
+    read from the X-Cache response header (HIT / COALESCED / MISS).
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, requests_total=2000, concurrency=200):
+        self.base_url = base_url
+        self.requests_total = max(1, int(requests_total))
+        self.concurrency = max(1, int(concurrency))
+        self.recorder = LatencyRecorder()
+
+    def run(self):
+        print("🚀 Starting Thundering-Herd Test")
+        print(f"📍 Base URL: {self.base_url}")
+        print(f"🐘 {self.requests_total} GETs on one token, concurrency {self.concurrency}")
+        print("=" * 60)
+
+        owner = InstrumentedSession(LatencyRecorder(), self.base_url)
+        _, token = setup_benchmark(owner, self.base_url, "Herd Test", "Thundering Herd", public=True,
+                                   guests_planned=100)
+        if not token:
+            return None
+
+        local = threading.local()
+        cache_results = {}
+        lock = threading.Lock()
+        start_gate = threading.Barrier(self.concurrency)
+
+        def fetch(index):
+            if not hasattr(local, 'session'):
+                local.session = InstrumentedSession(self.recorder, self.base_url)
+                # Release the first wave together so the cold cache sees a real herd
+                try:
+                    start_gate.wait(timeout=30)
+                except threading.BrokenBarrierError:
+                    pass
+            response = local.session.get(f"{self.base_url}/public/rsvp/{token}", timeout=60)
+            outcome = response.headers.get('X-Cache', 'NONE') if response.status_code == 200 else f"HTTP {response.status_code}"
+            with lock:
+                cache_results[outcome] = cache_results.get(outcome, 0) + 1
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(fetch, range(self.requests_total)))
+
+        served = sum(count for outcome, count in cache_results.items() if outcome in ('HIT', 'COALESCED', 'MISS'))
+        cached = cache_results.get('HIT', 0) + cache_results.get('COALESCED', 0)
+        hit_rate = cached / served * 100 if served else 0.0
+
+        print("\n" + "=" * 60)
+        print("📊 THUNDERING-HERD SUMMARY")
+        print("=" * 60)
+        for outcome in sorted(cache_results):
+            print(f"   {outcome}: {cache_results[outcome]}")
+        print(f"   Cache hit rate: {hit_rate:.1f}% (HIT + COALESCED)")
+        self.recorder.print_report()
+        return {"hit_rate": hit_rate, "outcomes": cache_results}
+
+
+def fetch_metrics(base_url, metrics_token):
+    """Read GET /api/metrics (needs METRICS_TOKEN on the server); None when unavailable"""
+    if not metrics_token:
+        return None
+    try:
+        response = requests.get(f"{base_url}/metrics", headers={'X-Metrics-Token': metrics_token}, timeout=10)
+        return response.json() if response.status_code == 200 else None
+    except Exception:
+        return None
+
+
+class SustainedThroughputBenchmark:
+    """Sustained request throughput on the public RSVP and guest-list endpoints
+
+    Each endpoint is driven for a fixed duration; with --metrics-token the Supabase-origin
+    request/connection counters from /api/metrics (every client in the server process, not just
+    the admin client) show how well connections are reused.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, duration=20.0, concurrency=16, metrics_token=None):
+        self.base_url = base_url
+        self.duration = float(duration)
+        self.concurrency = max(1, int(concurrency))
+        self.metrics_token = metrics_token
+        self.recorder = LatencyRecorder()
+        self.session = InstrumentedSession(LatencyRecorder(), base_url)
+
+    def _drive(self, label, path, authenticated):
+        recorder = LatencyRecorder()
+        deadline = time.monotonic() + self.duration
+        before = fetch_metrics(self.base_url, self.metrics_token)
+
+        def worker(_):
+            session = InstrumentedSession(recorder, self.base_url)
+            if authenticated:
+                session.cookies.update(self.session.cookies)
+            while time.monotonic() < deadline:
+                session.get(f"{self.base_url}{path}", timeout=60)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(worker, range(self.concurrency)))
+
+        after = fetch_metrics(self.base_url, self.metrics_token)
+        total = recorder.total_requests()
+        elapsed = recorder.elapsed()
+        print(f"\n   {label}: {total} requests in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.1f} req/s)")
+
+        if before and after:
+            requests_made = after['supabase']['supabaseOriginRequests'] - before['supabase']['supabaseOriginRequests']
+            connections = after['supabase']['supabaseOriginConnectionsOpened'] - before['supabase']['supabaseOriginConnectionsOpened']
+            clients = after['supabase']['clientsCreated'] - before['supabase']['clientsCreated']
+            print(f"   Supabase origin (all clients): {requests_made} requests over {connections} new connections, "
+                  f"{clients} admin clients created")
+
+        self.recorder.merge(recorder)
+        return total / elapsed if elapsed else 0.0
+
+    def run(self):
+        print("🚀 Starting Sustained Throughput Benchmark")
+        print(f"📍 Base URL: {self.base_url}")
+        print(f"⏳ {self.duration:.0f}s per endpoint, concurrency {self.concurrency}")
+        print("=" * 60)
+
+        event_id, token = setup_benchmark(self.session, self.base_url, "Throughput Benchmark",
+                                          "Throughput Benchmark", public=True, guests_planned=100)
+        if not event_id:
+            return None
+
+        results = {
+            "public_rsvp": self._drive("GET /public/rsvp/{token}", f"/public/rsvp/{token}", False),
+            "guest_list": self._drive("GET /events/{id}/guests", f"/events/{event_id}/guests", True),
+        }
+
+        print("\n" + "=" * 60)
+        print("📊 SUSTAINED THROUGHPUT SUMMARY")
+        print("=" * 60)
+        self.recorder.print_report()
+        return results
+
+
+class WebhookDedupeTest:
+    """Duplicate and out-of-order Evolution webhook deliveries against one org
+
+    Every connection.update is delivered several times in shuffled order; the newest one is
+    'open'. With --metrics-token the webhookInbox counters show how many database writes the
+    burst cost, which must stay bounded by the number of inbox flushes, not deliveries.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, updates=200, retries=3, concurrency=16,
+                 webhook_secret=DEFAULT_WEBHOOK_SECRET, metrics_token=None):
+        self.base_url = base_url
+        self.updates = max(2, int(updates))
+        self.retries = max(1, int(retries))
+        self.concurrency = max(1, int(concurrency))
+        self.webhook_secret = webhook_secret
+        self.metrics_token = metrics_token
+        self.recorder = LatencyRecorder()
+        self.session = InstrumentedSession(LatencyRecorder(), base_url)
+
+    def _deliveries(self):
+        started = datetime.utcnow() - timedelta(minutes=5)
+        unique = []
+        for index in range(self.updates - 1):
+            state = "connecting" if index % 2 == 0 else "close"
+            unique.append({
+                "event": "connection.update",
+                "date_time": (started + timedelta(milliseconds=index)).isoformat() + "Z",
+                "data": {"state": state, "qrcode": {"base64": f"data:image/png;base64,QR{index:06d}"}}
+            })
+        unique.append({
+            "event": "connection.update",
+            "date_time": (started + timedelta(milliseconds=self.updates)).isoformat() + "Z",
+            "data": {"state": "open"}
+        })
+        deliveries = [payload for payload in unique for _ in range(self.retries)]
+        random.shuffle(deliveries)
+        return unique, deliveries
+
+    def _instance_status(self):
+        response = self.session.get(f"{self.base_url}/me")
+        if response.status_code != 200:
+            return None
+        return (response.json().get('evolutionInstance') or {}).get('status')
+
+    def run(self, settle_timeout=30):
+        print("🚀 Starting Webhook Dedupe Test")
+        print(f"📍 Base URL: {self.base_url}")
+        print(f"🔁 {self.updates} connection.update × {self.retries} deliveries, shuffled, "
+              f"concurrency {self.concurrency}")
+        print("=" * 60)
+
+        if not register_and_login(self.session, self.base_url, "Webhook Dedupe"):
+            return None
+        me = self.session.get(f"{self.base_url}/me").json()
+        org_id = (me.get('organization') or {}).get('id')
+        has_instance = bool(me.get('evolutionInstance'))
+        if not org_id:
+            print("❌ No organization for the test user")
+            return None
+
+        unique, deliveries = self._deliveries()
+        url = f"{self.base_url}/webhooks/evolution?secret={self.webhook_secret}&org={org_id}"
+        before = fetch_metrics(self.base_url, self.metrics_token)
+        local = threading.local()
+        acks = {"ok": 0, "failed": 0, "duplicates": 0}
+        lock = threading.Lock()
+
+        def deliver(payload):
+            if not hasattr(local, 'session'):
+                local.session = InstrumentedSession(self.recorder, self.base_url)
+            response = local.session.post(url, json=payload, timeout=60)
+            with lock:
+                if response.status_code == 200:
+                    acks["ok"] += 1
+                    acks["duplicates"] += response.json().get('duplicates', 0)
+                else:
+                    acks["failed"] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(deliver, deliveries))
+        elapsed = time.perf_counter() - started
+
+        final_status = None
+        deadline = time.monotonic() + settle_timeout
+        while has_instance and time.monotonic() < deadline:
+            final_status = self._instance_status()
+            if final_status == "open":
+                break
+            time.sleep(0.2)
+
+        print("\n" + "=" * 60)
+        print("📊 WEBHOOK DEDUPE SUMMARY")
+        print("=" * 60)
+        print(f"   {acks['ok']} deliveries acked in {elapsed:.2f}s, {acks['failed']} failed, "
+              f"{acks['duplicates']} reported as duplicates")
+
+        passed = acks["failed"] == 0
+        if has_instance:
+            correct = final_status == "open"
+            passed = passed and correct
+            print(f"{'✅' if correct else '❌'} Final instance status: {final_status} (expected open)")
+        else:
+            print("⚠️  Org has no Evolution instance - final state not checked")
+
+        results = {"deliveries": len(deliveries), "unique": len(unique), "final_status": final_status, **acks}
+        after = fetch_metrics(self.base_url, self.metrics_token)
+        if before and after:
+            inbox = {key: after['webhookInbox'][key] - before['webhookInbox'][key]
+                     for key in ('received', 'duplicates', 'durableDuplicates', 'coalesced', 'stale',
+                                 'batches', 'inboxWrites', 'instanceUpdates')}
+            bounded = inbox['instanceUpdates'] <= inbox['batches'] and inbox['inboxWrites'] <= 2 * inbox['batches']
+            passed = passed and bounded
+            print(f"   Inbox: {inbox['received']} received, {inbox['duplicates'] + inbox['durableDuplicates']} "
+                  f"duplicates dropped, {inbox['coalesced']} coalesced, {inbox['stale']} stale")
+            print(f"{'✅' if bounded else '❌'} DB writes: {inbox['instanceUpdates']} instance updates and "
+                  f"{inbox['inboxWrites']} inbox writes over {inbox['batches']} batches "
+                  f"(vs {len(deliveries)} deliveries)")
+            results["inbox"] = inbox
+        else:
+            print("   ⚠️  Pass --metrics-token to check the database write count")
+
+        self.recorder.print_report()
+        results["passed"] = passed
+        return results
+
+
+def parse_server_timing(header):
+    """Parse a Server-Timing header into {name: (duration_ms, description)}"""
+    metrics = {}
+    for entry in (header or '').split(','):
+        parts = [part.strip() for part in entry.split(';') if part.strip()]
+        if not parts:
+            continue
+        duration, description = 0.0, None
+        for part in parts[1:]:
+            key, _, value = part.partition('=')
+            if key == 'dur':
+                duration = float(value or 0)
+            elif key == 'desc':
+                description = value.strip('"')
+        metrics[parts[0]] = (duration, description)
+    return metrics
+
+
+class RouteSweep:
+    """Calls every API route and reports server-side dispatch, auth and handler time per route
+
+    Timings come from the Server-Timing header set by the route table, grouped by the
+    route pattern the server matched (e.g. "GET /events/:id/guests").
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, rounds=20, webhook_secret=DEFAULT_WEBHOOK_SECRET,
+                 metrics_token=None):
+        self.base_url = base_url
+        self.rounds = max(1, int(rounds))
+        self.webhook_secret = webhook_secret
+        self.metrics_token = metrics_token
+        self.recorder = LatencyRecorder()
+        self.session = InstrumentedSession(self.recorder, base_url)
+        self.anonymous = InstrumentedSession(self.recorder, base_url)
+        self.server_timings = {}
+        self.statuses = {}
+
+    def _call(self, session, method, path, **kwargs):
+        response = session.request(method, f"{self.base_url}{path}", timeout=120, **kwargs)
+        timing = parse_server_timing(response.headers.get('Server-Timing'))
+        if 'handler' in timing:
+            route = timing['handler'][1] or f"{method} {route_template(path)}"
+            totals = self.server_timings.setdefault(route, {"count": 0, "dispatch": 0.0, "auth": 0.0, "handler": 0.0})
+            totals["count"] += 1
+            for name in ('dispatch', 'auth', 'handler'):
+                totals[name] += timing.get(name, (0.0, None))[0]
+            self.statuses.setdefault(route, set()).add(response.status_code)
+        return response
+
+    def _endpoints(self, credentials, event_id, token, template_id, guest_id):
+        csv_body = "name,phone,email,tag\n" + "".join(
+            f'"Sweep {index}",+55119{index:08d},sweep{index}@example.com,sweep\n' for index in range(5))
+        webhook = {
+            "event": "messages.upsert",
+            "data": {"key": {"remoteJid": "5511999999999@s.whatsapp.net", "fromMe": False},
+                     "message": {"conversation": "👋"}}
+        }
+        metrics_headers = {'X-Metrics-Token': self.metrics_token} if self.metrics_token else {}
+        owner, anonymous = self.session, self.anonymous
+        return [
+            (anonymous, 'GET', '/', {}),
+            (anonymous, 'GET', '/metrics', {"headers": metrics_headers}),
+            (anonymous, 'POST', '/auth/login', {"json": credentials}),
+            (anonymous, 'POST', '/auth/logout', {}),
+            (owner, 'GET', '/me', {}),
+            (owner, 'GET', '/events', {"params": {"limit": 20}}),
+            (owner, 'GET', f'/events/{event_id}', {}),
+            (owner, 'GET', f'/events/{event_id}/guests', {"params": {"limit": 50}}),
+            (owner, 'POST', '/guests', {"json": {"eventId": event_id, "name": "Sweep Guest"}}),
+            (owner, 'POST', '/guests/import', {"params": {"eventId": event_id, "format": "csv"},
+                                               "data": csv_body.encode(),
+                                               "headers": {'Content-Type': 'text/csv'}}),
+            (owner, 'GET', '/templates', {}),
+            (owner, 'POST', '/templates', {"json": {"name": "Sweep", "bodyText": "Olá {{name}}"}}),
+            (owner, 'POST', '/messages/send', {"json": {"eventId": event_id, "templateId": template_id,
+                                                        "guestIds": [guest_id], "async": True}}),
+            (owner, 'GET', f'/messages/jobs/{uuid.uuid4()}', {}),
+            (owner, 'GET', '/dashboard', {}),
+            (anonymous, 'POST', f'/webhooks/evolution?secret={self.webhook_secret}&org=sweep', {"json": webhook}),
+            (anonymous, 'GET', f'/public/rsvp/{token}', {}),
+            (anonymous, 'POST', '/public/rsvp/confirm', {"json": {"token": token, "name": "Sweep RSVP"}}),
+            (anonymous, 'GET', f'/public/event/{event_id}', {}),
+            (anonymous, 'GET', '/does-not-exist', {}),
+        ]
+
+    def run(self):
+        print("🚀 Starting Route Sweep")
+        print(f"📍 Base URL: {self.base_url}")
+        print(f"🧭 {self.rounds} rounds over every route")
+        print("=" * 60)
+
+        credentials = register_and_login(self.session, self.base_url, "Route Sweep")
+        if not credentials:
+            return None
+        event_id, token = create_public_event(self.session, self.base_url, "Route Sweep", guests_planned=25)
+        template = self.session.post(f"{self.base_url}/templates",
+                                     json={"name": "Sweep", "bodyText": "Olá {{name}}"}).json()
+        guest = self.session.post(f"{self.base_url}/guests",
+                                  json={"eventId": event_id, "name": "Sweep Guest"}).json()
+        if not event_id or not template.get('id') or not guest.get('id'):
+            print("❌ Could not create the sweep fixtures")
+            return None
+
+        endpoints = self._endpoints(credentials, event_id, token, template['id'], guest['id'])
+        for _ in range(self.rounds):
+            for session, method, path, kwargs in endpoints:
+                self._call(session, method, path, **kwargs)
+
+        print("\n" + "=" * 60)
+        print("📊 ROUTE SWEEP SUMMARY (server-side averages)")
+        print("=" * 60)
+        print(f"   {'Route':<32} {'count':>6} {'dispatch µs':>12} {'auth ms':>9} {'handler ms':>11}  status")
+        for route in sorted(self.server_timings):
+            totals = self.server_timings[route]
+            count = totals["count"]
+            statuses = ",".join(str(code) for code in sorted(self.statuses[route]))
+            print(f"   {route:<32} {count:>6} {totals['dispatch'] / count * 1000:>12.1f} "
+                  f"{totals['auth'] / count:>9.2f} {totals['handler'] / count:>11.2f}  {statuses}")
+
+        if len(self.server_timings) < len(endpoints):
+            print(f"⚠️  {len(endpoints) - len(self.server_timings)} endpoints returned no Server-Timing header")
+
+        self.recorder.print_report()
+        return {route: {name: totals[name] / totals["count"] for name in ('dispatch', 'auth', 'handler')}
+                for route, totals in self.server_timings.items()}
+
+
+class GuestSearchBenchmark:
+    """Check-in search over large events and duplicate guests under double-tapped confirms
+
+    Imports `guests` synthetic guests into each of `events` events and times
+    GET /events/{id}/guests/search for random name prefixes. Then every public confirm is
+    submitted `taps` times concurrently (half of them for guests that were already imported,
+    spelled differently) and the guests that exist more than once afterwards are counted.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, events=2, guests=50000, queries=2000, confirms=200, taps=3,
+                 concurrency=16, seed=1):
+        self.base_url = base_url
+        self.events = max(1, int(events))
+        self.guests = max(1, int(guests))
+        self.queries = max(1, int(queries))
+        self.confirms = max(1, int(confirms))
+        self.taps = max(1, int(taps))
+        self.concurrency = max(1, int(concurrency))
+        self.rng = random.Random(seed)
+        self.recorder = LatencyRecorder()
+        self.session = InstrumentedSession(LatencyRecorder(), base_url)
+
+    @staticmethod
+    def _name_key(name):
+        """ASCII-only mirror of lib/utils/guestKey.js, enough for the synthetic names used here"""
+        return " ".join(re.findall(r"[a-z0-9]+", name.lower()))
+
+    def _worker_session(self, local):
+        if not hasattr(local, 'session'):
+            local.session = InstrumentedSession(self.recorder, self.base_url)
+            local.session.cookies.update(self.session.cookies)
+        return local.session
+
+    def _search(self, session, event_id, query, limit=20):
+        response = session.get(f"{self.base_url}/events/{event_id}/guests/search",
+                               params={"q": query, "limit": limit}, timeout=60)
+        return response.json().get('guests', []) if response.status_code == 200 else None
+
+    def setup(self):
+        if not register_and_login(self.session, self.base_url, "Guest Search"):
+            return None
+        events = []
+        for index in range(self.events):
+            event_id, token = create_public_event(self.session, self.base_url, f"Guest Search {index + 1}")
+            if not event_id:
+                return None
+            events.append((event_id, token))
+
+        client = GuestImportClient(self.base_url)
+        client.session.cookies.update(self.session.cookies)
+        path = f"/tmp/guest_search_{uuid.uuid4().hex[:8]}.csv"
+        client.write_synthetic_file(path, self.guests)
+        try:
+            for event_id, _ in events:
+                if not client.upload(path, event_id, 'csv'):
+                    return None
+        finally:
+            os.remove(path)
+        return events
+
+    def run_search(self, events):
+        """Random prefixes of "Convidado NNNNNN" in mixed case; full names must hit exactly one guest"""
+        queries = []
+        for _ in range(self.queries):
+            name = f"{self.rng.choice(('Convidado', 'CONVIDADO', 'convidado'))} {self.rng.randrange(self.guests):06d}"
+            queries.append((self.rng.choice(events)[0], name[:self.rng.randint(12, len(name))]))
+
+        local = threading.local()
+        outcomes = {"failed": 0, "missed": 0, "mismatched": 0, "rows": 0}
+        lock = threading.Lock()
+
+        def search(item):
+            event_id, query = item
+            guests = self._search(self._worker_session(local), event_id, query)
+            prefix = self._name_key(query)
+            with lock:
+                if guests is None:
+                    outcomes["failed"] += 1
+                    return
+                outcomes["rows"] += len(guests)
+                if len(prefix) == len("convidado 000000") and len(guests) != 1:
+                    outcomes["missed"] += 1
+                outcomes["mismatched"] += sum(1 for g in guests if not self._name_key(g['name']).startswith(prefix))
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(search, queries))
+        outcomes["elapsed"] = time.perf_counter() - started
+        return outcomes
+
+    def run_confirms(self, events):
+        """Each name confirmed `taps` times at once; returns the distinct (event, name_key, is_companion)"""
+        people = []
+        for index in range(self.confirms):
+            event_id, token = events[index % len(events)]
+            if index % 2 == 0:
+                name = f"Convidado Novo {index:05d}"
+            else:
+                existing = f"convidado {self.rng.randrange(self.guests):06d}"
+                name = self.rng.choice((existing.upper(), f"  {existing}  ", existing.replace(' ', '   ')))
+            people.append((event_id, token, name, f"Acompanhante {index:05d}"))
+        submissions = [person for person in people for _ in range(self.taps)]
+        self.rng.shuffle(submissions)
+
+        local = threading.local()
+        outcomes = {"ok": 0, "failed": 0, "created": 0}
+        lock = threading.Lock()
+
+        def confirm(person):
+            _, token, name, companion = person
+            if not hasattr(local, 'session'):
+                local.session = InstrumentedSession(self.recorder, self.base_url)
+            response = local.session.post(f"{self.base_url}/public/rsvp/confirm", json={
+                "token": token,
+                "name": name,
+                "companions": [companion]
+            }, timeout=120)
+            with lock:
+                if response.status_code == 200:
+                    outcomes["ok"] += 1
+                    outcomes["created"] += response.json().get('created', 0)
+                else:
+                    outcomes["failed"] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(confirm, submissions))
+        outcomes["elapsed"] = time.perf_counter() - started
+
+        distinct = {(event_id, self._name_key(name), False) for event_id, _, name, _ in people}
+        distinct |= {(event_id, self._name_key(companion), True) for event_id, _, _, companion in people}
+        return outcomes, distinct
+
+    def count_duplicates(self, people):
+        """Extra rows per confirmed guest and companion, found through the search endpoint itself"""
+        duplicates = 0
+        for event_id, name_key, is_companion in people:
+            rows = self._search(self.session, event_id, name_key, limit=50) or []
+            matches = sum(1 for g in rows
+                          if bool(g.get('companion_of')) == is_companion and self._name_key(g['name']) == name_key)
+            duplicates += max(0, matches - 1)
+        return duplicates
+
+    def run(self):
+        print("🚀 Starting Guest Search & De-duplication Benchmark")
+        print(f"📍 Base URL: {self.base_url}")
+        print(f"🔎 {self.events} events × {self.guests} guests, {self.queries} searches, "
+              f"{self.confirms} confirms × {self.taps} taps, concurrency {self.concurrency}")
+        print("=" * 60)
+
+        events = self.setup()
+        if not events:
+            return None
+
+        print("\n🔍 Searching guests by name prefix...")
+        search = self.run_search(events)
+        print("\n🔍 Confirming with double taps...")
+        confirms, distinct = self.run_confirms(events)
+        duplicates = self.count_duplicates(distinct)
+
+        counts = []
+        for event_id, token in events:
+            response = self.session.get(f"{self.base_url}/public/rsvp/{token}")
+            counts.append(response.json().get('guests_count') if response.status_code == 200 else None)
+        new_guests = sum(1 for _, name_key, is_companion in distinct if is_companion or 'novo' in name_key)
+        expected_count = self.events * self.guests + new_guests
+
+        histogram = self.recorder.histograms.get("GET /events/{id}/guests/search", LatencyHistogram())
+        confirm_histogram = self.recorder.histograms.get("POST /public/rsvp/confirm", LatencyHistogram())
+        searched = self.queries - search["failed"]
+        duplicate_rate = duplicates / len(distinct) * 100 if distinct else 0.0
+        result = {
+            "search_p50_ms": histogram.percentile(50) / 1000,
+            "search_p95_ms": histogram.percentile(95) / 1000,
+            "search_p99_ms": histogram.percentile(99) / 1000,
+            "searches_per_second": searched / search["elapsed"] if search["elapsed"] > 0 else 0.0,
+            "search_failed": search["failed"],
+            "search_missed": search["missed"],
+            "search_mismatched": search["mismatched"],
+            "confirms_ok": confirms["ok"],
+            "confirms_failed": confirms["failed"],
+            "guests_created": confirms["created"],
+            "duplicates": duplicates,
+            "duplicate_rate": duplicate_rate,
+            "guests_count": sum(c or 0 for c in counts),
+            "expected_guests_count": expected_count,
+        }
+
+        print("\n" + "=" * 60)
+        print("📊 GUEST SEARCH SUMMARY")
+        print("=" * 60)
+        print(f"   Search: p50 {result['search_p50_ms']:.1f}ms, p95 {result['search_p95_ms']:.1f}ms, "
+              f"p99 {result['search_p99_ms']:.1f}ms ({result['searches_per_second']:.1f} searches/s, "
+              f"{search['rows'] / searched if searched else 0:.1f} rows per search)")
+        status = "✅" if not (search["failed"] or search["missed"] or search["mismatched"]) else "❌"
+        print(f"{status} {search['failed']} failed, {search['missed']} full names not found, "
+              f"{search['mismatched']} rows outside the prefix")
+        print(f"   Confirms: {confirms['ok']} ok, {confirms['failed']} failed, "
+              f"p99 {confirm_histogram.percentile(99) / 1000:.1f}ms, {confirms['created']} guests created")
+        status = "✅" if duplicates == 0 else "❌"
+        print(f"{status} Duplicate guests: {duplicates} ({duplicate_rate:.2f}% of "
+              f"{len(distinct)} confirmed guests and companions)")
+        status = "✅" if result["guests_count"] == expected_count else "⚠️ "
+        print(f"{status} guests_count {result['guests_count']} (expected {expected_count})")
+        self.recorder.print_report()
+        return result
+
+
+def parse_sizes(value):
+    return [int(part) for part in value.split(',') if part.strip()]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backend API tests for the Event Management System")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL, help="API base URL")
+    parser.add_argument("--load", action="store_true",
+                        help="run the end-to-end flow as concurrent virtual users")
+    parser.add_argument("--users", type=int, default=10, help="number of virtual users in load mode")
+    parser.add_argument("--ramp-up", type=float, default=5.0,
+                        help="seconds over which virtual users are started")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="target aggregate requests per second (0 = unthrottled)")
+    parser.add_argument("--bulk-send", type=parse_sizes, default=None, metavar="SIZES",
+                        help="benchmark full fan-out sends for comma-separated guest counts, e.g. 100,1000,10000")
+    parser.add_argument("--seed-workers", type=int, default=16,
+                        help="concurrent requests used to seed guests")
+    parser.add_argument("--evolution-standin", default=None, metavar="URL",
+                        help="Evolution stand-in base URL, used to reset and read gateway counters")
+    parser.add_argument("--gateway-rate", type=float, default=0.0, metavar="PER_SECOND",
+                        help="with --bulk-send, make the stand-in enforce this per-instance send rate")
+    parser.add_argument("--import-guests", default=None, metavar="PATH",
+                        help="stream a CSV/JSONL guest file to /api/guests/import")
+    parser.add_argument("--import-synthetic", type=int, default=0, metavar="ROWS",
+                        help="generate and stream a synthetic guest file with this many rows")
+    parser.add_argument("--import-format", choices=("csv", "jsonl"), default="csv",
+                        help="format for synthetic guest files")
+    parser.add_argument("--hammer", type=int, default=0, metavar="N",
+                        help="benchmark N authenticated GET /me + /dashboard rounds on one session")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="concurrent requests for --hammer")
+    parser.add_argument("--dashboard-seed", type=int, default=0, metavar="MESSAGES",
+                        help="seed this many messages and check /dashboard latency stays flat")
+    parser.add_argument("--template-bench", type=int, default=0, metavar="GUESTS",
+                        help="compare send time of a short vs a long template over this many guests")
+    parser.add_argument("--placeholders", type=int, default=400,
+                        help="number of placeholders in the long template for --template-bench")
+    parser.add_argument("--send-mode", choices=("sync", "async"), default="sync",
+                        help="send messages inline or as a queued job polled for progress")
+    parser.add_argument("--rsvp-stress", type=int, default=0, metavar="CONFIRMS",
+                        help="fire this many anonymous RSVP confirms against one rsvp_token")
+    parser.add_argument("--companions", type=int, default=4,
+                        help="companions per confirm for --rsvp-stress")
+    parser.add_argument("--herd", type=int, default=0, metavar="REQUESTS",
+                        help="fire this many concurrent GET /public/rsvp/{token} on one token")
+    parser.add_argument("--throughput", type=float, default=0, metavar="SECONDS",
+                        help="drive the public RSVP and guest-list endpoints for this long each")
+    parser.add_argument("--metrics-token", default=None,
+                        help="METRICS_TOKEN of the server, to read /api/metrics counters")
+    parser.add_argument("--webhook-replay", type=int, default=0, metavar="MESSAGES",
+                        help="after webhook validation, replay this many synthetic messages.upsert replies")
+    parser.add_argument("--webhook-secret", default=DEFAULT_WEBHOOK_SECRET,
+                        help="EVOLUTION_WEBHOOK_SECRET of the server")
+    parser.add_argument("--webhook-dedupe", type=int, default=0, metavar="UPDATES",
+                        help="deliver this many connection.update events with retries, shuffled")
+    parser.add_argument("--retries", type=int, default=3,
+                        help="deliveries of each webhook for --webhook-dedupe")
+    parser.add_argument("--route-sweep", type=int, default=0, metavar="ROUNDS",
+                        help="call every API route this many times and report Server-Timing per route")
+    parser.add_argument("--message-log", type=int, default=0, metavar="MESSAGES",
+                        help="send this many messages and report DB calls and log payload size per message")
+    parser.add_argument("--event-children", type=int, default=0, metavar="N",
+                        help="Create Event also posts events with N initialGifts and N initialRoles each")
+    parser.add_argument("--child-events", type=int, default=20,
+                        help="events posted concurrently for --event-children")
+    parser.add_argument("--rsvp-stream", type=int, default=0, metavar="SUBSCRIBERS",
+                        help="open this many RSVP event streams and measure fan-out of public confirms")
+    parser.add_argument("--stream-confirms", type=int, default=50,
+                        help="confirms fired while the --rsvp-stream subscribers listen")
+    parser.add_argument("--guest-search", type=int, default=0, metavar="EVENTS",
+                        help="import --search-guests guests into this many events and benchmark check-in search")
+    parser.add_argument("--search-guests", type=int, default=50000,
+                        help="guests per event for --guest-search")
+    parser.add_argument("--search-queries", type=int, default=2000,
+                        help="prefix searches fired by --guest-search")
+    parser.add_argument("--dedupe-confirms", type=int, default=200,
+                        help="distinct public confirms (each double-tapped) for --guest-search")
+    parser.add_argument("--taps", type=int, default=3,
+                        help="concurrent submissions of each confirm for --guest-search")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    tester = EventManagementAPITester()
-    results = tester.run_all_tests()
\ No newline at end of file
+    args = parse_args()
+
+    if args.guest_search:
+        benchmark = GuestSearchBenchmark(args.base_url, events=args.guest_search, guests=args.search_guests,
+                                         queries=args.search_queries, confirms=args.dedupe_confirms,
+                                         taps=args.taps, concurrency=args.concurrency)
+        results = benchmark.run()
+    elif args.rsvp_stream:
+        test = RsvpStreamFanoutTest(args.base_url, subscribers=args.rsvp_stream, confirms=args.stream_confirms,
+                                    concurrency=args.concurrency, metrics_token=args.metrics_token)
+        results = test.run()
+    elif args.message_log:
+        benchmark = MessageLogBenchmark(args.base_url, messages=args.message_log, metrics_token=args.metrics_token,
+                                        evolution_standin_url=args.evolution_standin)
+        results = benchmark.run()
+    elif args.route_sweep:
+        sweep = RouteSweep(args.base_url, rounds=args.route_sweep, webhook_secret=args.webhook_secret,
+                           metrics_token=args.metrics_token)
+        results = sweep.run()
+    elif args.webhook_dedupe:
+        test = WebhookDedupeTest(args.base_url, updates=args.webhook_dedupe, retries=args.retries,
+                                 concurrency=args.concurrency, webhook_secret=args.webhook_secret,
+                                 metrics_token=args.metrics_token)
+        results = test.run()
+    elif args.throughput:
+        benchmark = SustainedThroughputBenchmark(args.base_url, duration=args.throughput,
+                                                 concurrency=args.concurrency, metrics_token=args.metrics_token)
+        results = benchmark.run()
+    elif args.herd:
+        herd = ThunderingHerdTest(args.base_url, requests_total=args.herd, concurrency=max(args.concurrency, 1))
+        results = herd.run()
+    elif args.rsvp_stress:
+        stress = PublicRsvpStress(args.base_url, confirms=args.rsvp_stress, companions=args.companions,
+                                  concurrency=args.concurrency)
+        results = stress.run()
+    elif args.template_bench:
+        benchmark = TemplateRenderBenchmark(args.base_url, guests=args.template_bench,
+                                            placeholders=args.placeholders)
+        results = benchmark.run()
+    elif args.hammer:
+        benchmark = SessionEndpointBenchmark(args.base_url, iterations=args.hammer, concurrency=args.concurrency)
+        results = benchmark.run()
+    elif args.import_guests or args.import_synthetic:
+        client = GuestImportClient(args.base_url)
+        results = client.run(args.import_guests, args.import_synthetic, args.import_format)
+    elif args.bulk_send:
+        benchmark = BulkSendBenchmark(args.base_url, sizes=args.bulk_send, seed_workers=args.seed_workers,
+                                      evolution_standin_url=args.evolution_standin,
+                                      gateway_rate=args.gateway_rate)
+        results = benchmark.run()
+    elif args.load:
+        runner = LoadTestRunner(args.base_url, users=args.users, ramp_up=args.ramp_up, rate=args.rate)
+        results = runner.run()
+    else:
+        tester = EventManagementAPITester(args.base_url, dashboard_seed_messages=args.dashboard_seed,
+                                          send_mode=args.send_mode, webhook_replay=args.webhook_replay,
+                                          webhook_secret=args.webhook_secret, concurrency=args.concurrency,
+                                          metrics_token=args.metrics_token, event_children=args.event_children,
+                                          child_events=args.child_events)
+        results = tester.run_all_tests()
\ No newline at end of file
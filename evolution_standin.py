@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Local Evolution API stand-in for offline WhatsApp gateway testing
+Implements the instance, webhook and send-message endpoints used by lib/evolution.js and lets
+each call be slowed down, rejected with 429/5xx or left hanging to mimic a real gateway.
+With --rate-limit, sendText is also limited per instance like the real gateway: calls over the
+limit get 429 with Retry-After, and /__standin/stats reports achieved vs. allowed throughput.
+
+Point the app at it with:
+    EVOLUTION_BASE_URL=http://127.0.0.1:8081 EVOLUTION_TOKEN=standin yarn dev
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import time
+import uuid
+
+from standin_http import DROP_CONNECTION, AsyncHTTPServer, json_response
+
+OPERATIONS = ('create_instance', 'set_webhook', 'send_message', 'instance_status')
+
+
+class LatencyDistribution:
+    """Latency sampler parsed from specs like fixed:50, uniform:20,200, normal:120,30,
+    lognormal:4.5,0.5 (mu/sigma of ln ms) or exp:80 (mean ms)"""
+
+    def __init__(self, kind='fixed', params=(0.0,)):
+        self.kind = kind
+        self.params = tuple(float(p) for p in params)
+
+    @classmethod
+    def parse(cls, spec):
+        kind, _, raw = str(spec or 'fixed:0').partition(':')
+        params = [p for p in raw.split(',') if p.strip()] or ['0']
+        expected = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exp': 1}
+        if kind not in expected or len(params) != expected[kind]:
+            raise ValueError(f"Invalid latency spec '{spec}'")
+        return cls(kind, params)
+
+    def sample(self):
+        """Return a latency in seconds"""
+        p = self.params
+        if self.kind == 'fixed':
+            ms = p[0]
+        elif self.kind == 'uniform':
+            ms = random.uniform(p[0], p[1])
+        elif self.kind == 'normal':
+            ms = random.gauss(p[0], p[1])
+        elif self.kind == 'lognormal':
+            ms = random.lognormvariate(p[0], p[1])
+        else:
+            ms = random.expovariate(1.0 / p[0]) if p[0] > 0 else 0.0
+        return max(0.0, ms) / 1000.0
+
+    def __str__(self):
+        return f"{self.kind}:{','.join(f'{p:g}' for p in self.params)}"
+
+
+class FaultProfile:
+    """Latency and failure injection settings for one operation"""
+
+    def __init__(self, latency='fixed:0', error_429=0.0, error_5xx=0.0, timeout_rate=0.0, timeout_seconds=30.0):
+        self.latency = latency if isinstance(latency, LatencyDistribution) else LatencyDistribution.parse(latency)
+        self.error_429 = float(error_429)
+        self.error_5xx = float(error_5xx)
+        self.timeout_rate = float(timeout_rate)
+        self.timeout_seconds = float(timeout_seconds)
+
+    def updated(self, changes):
+        values = self.to_dict()
+        values.update(changes or {})
+        return FaultProfile(**values)
+
+    def to_dict(self):
+        return {
+            'latency': str(self.latency),
+            'error_429': self.error_429,
+            'error_5xx': self.error_5xx,
+            'timeout_rate': self.timeout_rate,
+            'timeout_seconds': self.timeout_seconds,
+        }
+
+
+class InstanceRateLimit:
+    """Per-instance token bucket for sendText, plus accepted-send timestamps for reporting"""
+
+    def __init__(self, per_second, burst):
+        self.per_second = per_second
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.accepted = 0
+        self.rejected = 0
+        self.first_accepted = None
+        self.last_accepted = None
+
+    def try_take(self):
+        """Returns 0 when the call is allowed, else the seconds until a token is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.per_second)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            self.accepted += 1
+            self.first_accepted = self.first_accepted or now
+            self.last_accepted = now
+            return 0.0
+        self.rejected += 1
+        return (1 - self.tokens) / self.per_second
+
+    def achieved_per_second(self):
+        if self.accepted < 2:
+            return 0.0
+        return (self.accepted - 1) / (self.last_accepted - self.first_accepted)
+
+
+class EvolutionStandin(AsyncHTTPServer):
+    server_name = 'evolution-standin'
+
+    def __init__(self, host='127.0.0.1', port=8081, token=None, default_profile=None, profiles=None,
+                 rate_limit=0.0, rate_burst=None):
+        super().__init__(host, port)
+        self.token = token
+        self.default_profile = default_profile or FaultProfile()
+        self.profiles = dict(profiles or {})
+        self.instances = {}
+        self.rate_limit = float(rate_limit)
+        self.rate_burst = float(rate_burst if rate_burst is not None else max(1.0, rate_limit))
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.started_at = time.monotonic()
+        self.stats = {op: {'calls': 0, 'ok': 0, '429': 0, '5xx': 0, 'timeouts': 0} for op in OPERATIONS}
+        self.messages_sent = 0
+        self.rate_limits = {}
+
+    def _rate_limited(self, instance_name):
+        """Apply the per-instance send limit; returns a 429 response or None"""
+        if self.rate_limit <= 0:
+            return None
+        limiter = self.rate_limits.get(instance_name)
+        if limiter is None:
+            limiter = self.rate_limits[instance_name] = InstanceRateLimit(self.rate_limit, self.rate_burst)
+        wait = limiter.try_take()
+        if not wait:
+            return None
+        return json_response(429, {'error': 'Rate limit exceeded'}, {'Retry-After': str(max(1, math.ceil(wait)))})
+
+    def _rate_limit_stats(self):
+        instances = {
+            name: {
+                'accepted': limiter.accepted,
+                'rejected': limiter.rejected,
+                'achieved_per_second': limiter.achieved_per_second(),
+            }
+            for name, limiter in self.rate_limits.items()
+        }
+        return {
+            'allowed_per_second': self.rate_limit,
+            'burst': self.rate_burst,
+            'rejected': sum(limiter.rejected for limiter in self.rate_limits.values()),
+            'instances': instances,
+        }
+
+    def profile_for(self, operation):
+        return self.profiles.get(operation, self.default_profile)
+
+    def _authorized(self, request):
+        if not self.token:
+            return True
+        bearer = request.header('authorization', '')
+        return bearer == f'Bearer {self.token}' or request.header('apikey') == self.token
+
+    async def _inject(self, operation):
+        """Apply the operation's fault profile; returns a response to short-circuit with, or None"""
+        profile = self.profile_for(operation)
+        stats = self.stats[operation]
+        stats['calls'] += 1
+
+        roll = random.random()
+        if roll < profile.timeout_rate:
+            stats['timeouts'] += 1
+            await asyncio.sleep(profile.timeout_seconds)
+            return DROP_CONNECTION
+
+        await asyncio.sleep(profile.latency.sample())
+
+        roll = random.random()
+        if roll < profile.error_429:
+            stats['429'] += 1
+            return json_response(429, {'error': 'Too Many Requests'}, {'Retry-After': '1'})
+        if roll < profile.error_429 + profile.error_5xx:
+            stats['5xx'] += 1
+            return json_response(random.choice((500, 502, 503)), {'error': 'Gateway error'})
+
+        stats['ok'] += 1
+        return None
+
+    def _instance(self, name):
+        return self.instances.setdefault(name, {
+            'instanceName': name,
+            'connectionStatus': 'open',
+            'webhook': None,
+        })
+
+    async def handle(self, request):
+        path = request.path.rstrip('/') or '/'
+        parts = path.strip('/').split('/')
+
+        if parts[0] == '__standin':
+            return self._control(request, parts[1:])
+
+        if not self._authorized(request):
+            return json_response(401, {'error': 'Unauthorized'})
+
+        if request.method == 'POST' and path == '/manager/instance':
+            body = request.json({}) or {}
+            name = body.get('instanceName') or f'standin-{uuid.uuid4().hex[:8]}'
+            injected = await self._inject('create_instance')
+            if injected:
+                return injected
+            instance = self._instance(name)
+            instance['connectionStatus'] = 'pending'
+            return json_response(201, {
+                'instance': {'instanceName': name, 'connectionStatus': 'pending'},
+                'qrcode': {'base64': 'data:image/png;base64,iVBORw0KGgo='},
+            })
+
+        if request.method == 'POST' and len(parts) == 2 and parts[0] == 'webhook':
+            injected = await self._inject('set_webhook')
+            if injected:
+                return injected
+            body = request.json({}) or {}
+            instance = self._instance(parts[1])
+            instance['webhook'] = {'url': body.get('url'), 'events': body.get('events', [])}
+            return json_response(200, {'webhook': instance['webhook'], 'success': True})
+
+        if request.method == 'POST' and len(parts) == 3 and parts[:2] == ['message', 'sendText']:
+            limited = self._rate_limited(parts[2])
+            if limited:
+                return limited
+            injected = await self._inject('send_message')
+            if injected:
+                return injected
+            body = request.json({}) or {}
+            if not body.get('number') or body.get('text') is None:
+                return json_response(400, {'error': 'number and text are required'})
+            self._instance(parts[2])
+            self.messages_sent += 1
+            message_id = uuid.uuid4().hex[:20].upper()
+            return json_response(201, {
+                'key': {
+                    'remoteJid': f"{str(body['number']).lstrip('+')}@s.whatsapp.net",
+                    'fromMe': True,
+                    'id': message_id,
+                },
+                'messageId': message_id,
+                'status': 'PENDING',
+                'messageTimestamp': int(time.time()),
+            })
+
+        if request.method == 'GET' and len(parts) == 2 and parts[0] == 'instance':
+            injected = await self._inject('instance_status')
+            if injected:
+                return injected
+            instance = self._instance(parts[1])
+            return json_response(200, {'connectionStatus': instance['connectionStatus']})
+
+        return json_response(404, {'error': f'Route {path} not found'})
+
+    def _control(self, request, parts):
+        """GET /__standin/stats, POST /__standin/config, POST /__standin/reset"""
+        action = parts[0] if parts else ''
+
+        if action == 'stats' and request.method == 'GET':
+            elapsed = time.monotonic() - self.started_at
+            return json_response(200, {
+                'elapsed_seconds': elapsed,
+                'messages_sent': self.messages_sent,
+                'messages_per_second': self.messages_sent / elapsed if elapsed > 0 else 0.0,
+                'instances': len(self.instances),
+                'operations': self.stats,
+                'rate_limit': self._rate_limit_stats(),
+            })
+
+        if action == 'config' and request.method == 'GET':
+            return json_response(200, self._config())
+
+        if action == 'config' and request.method == 'POST':
+            body = request.json({}) or {}
+            try:
+                if 'default' in body:
+                    self.default_profile = self.default_profile.updated(body['default'])
+                for operation in OPERATIONS:
+                    if operation in body:
+                        self.profiles[operation] = self.profile_for(operation).updated(body[operation])
+                if 'rate_limit' in body:
+                    limit = body['rate_limit'] or {}
+                    self.rate_limit = float(limit.get('per_second', self.rate_limit))
+                    self.rate_burst = float(limit.get('burst', max(1.0, self.rate_limit)))
+                    self.rate_limits = {}
+            except (TypeError, ValueError) as e:
+                return json_response(400, {'error': str(e)})
+            return json_response(200, self._config())
+
+        if action == 'reset' and request.method == 'POST':
+            self.reset_stats()
+            return json_response(200, {'reset': True})
+
+        return json_response(404, {'error': 'Unknown stand-in control route'})
+
+    def _config(self):
+        return {
+            'rate_limit': {'per_second': self.rate_limit, 'burst': self.rate_burst},
+            'default': self.default_profile.to_dict(),
+            **{op: profile.to_dict() for op, profile in self.profiles.items()},
+        }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Local Evolution API stand-in with fault injection")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--token", default=None, help="require this bearer token (default: accept any)")
+    parser.add_argument("--latency", default="fixed:0",
+                        help="default latency distribution, e.g. lognormal:5,0.4 or uniform:50,300")
+    parser.add_argument("--send-latency", default=None, help="latency distribution for sendText only")
+    parser.add_argument("--error-429", type=float, default=0.0, help="fraction of calls answered with 429")
+    parser.add_argument("--error-5xx", type=float, default=0.0, help="fraction of calls answered with 5xx")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="fraction of calls left hanging")
+    parser.add_argument("--timeout-seconds", type=float, default=30.0,
+                        help="how long a hanging call waits before the connection is dropped")
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="sendText calls per second allowed per instance (0 = unlimited)")
+    parser.add_argument("--rate-burst", type=float, default=None,
+                        help="burst size for --rate-limit (default: one second's worth)")
+    parser.add_argument("--seed", type=int, default=None, help="random seed for reproducible runs")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    default_profile = FaultProfile(
+        latency=args.latency,
+        error_429=args.error_429,
+        error_5xx=args.error_5xx,
+        timeout_rate=args.timeout_rate,
+        timeout_seconds=args.timeout_seconds,
+    )
+    profiles = {}
+    if args.send_latency:
+        profiles['send_message'] = default_profile.updated({'latency': args.send_latency})
+
+    server = EvolutionStandin(args.host, args.port, args.token, default_profile, profiles,
+                              rate_limit=args.rate_limit, rate_burst=args.rate_burst)
+    await server.start()
+    print(f"🟢 Evolution stand-in listening on http://{server.host}:{server.port}")
+    print(f"   Profile: {default_profile.to_dict()}")
+    if server.rate_limit > 0:
+        print(f"   Rate limit: {server.rate_limit:g}/s per instance (burst {server.rate_burst:g})")
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
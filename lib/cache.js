@@ -0,0 +1,152 @@
+import { registerMetricsSource } from './metrics.js'
+
+// In-process TTL + LRU cache (per server process, not shared between instances)
+export class TTLCache {
+  constructor({ max = 1000, ttlMs = 60000 } = {}) {
+    this.max = max
+    this.ttlMs = ttlMs
+    this.entries = new Map()
+    this.inflight = new Map()
+    this.hits = 0
+    this.misses = 0
+  }
+
+  get enabled() {
+    return this.ttlMs > 0 && this.max > 0
+  }
+
+  get size() {
+    return this.entries.size
+  }
+
+  get(key) {
+    const entry = this.entries.get(key)
+    if (!entry) {
+      this.misses++
+      return undefined
+    }
+    if (entry.expiresAt <= Date.now()) {
+      this.entries.delete(key)
+      this.misses++
+      return undefined
+    }
+    // Map keeps insertion order: re-inserting marks the key as most recently used
+    this.entries.delete(key)
+    this.entries.set(key, entry)
+    this.hits++
+    return entry.value
+  }
+
+  set(key, value, ttlMs = this.ttlMs) {
+    if (!this.enabled) return value
+    this.entries.delete(key)
+    this.entries.set(key, { value, expiresAt: Date.now() + ttlMs })
+    while (this.entries.size > this.max) {
+      this.entries.delete(this.entries.keys().next().value)
+    }
+    return value
+  }
+
+  delete(key) {
+    this.inflight.delete(key)
+    return this.entries.delete(key)
+  }
+
+  clear() {
+    this.entries.clear()
+    this.inflight.clear()
+  }
+
+  // Keeps the entry's expiry; no-op when the key is not cached
+  update(key, fn) {
+    const entry = this.entries.get(key)
+    if (!entry || entry.expiresAt <= Date.now()) return undefined
+    entry.value = fn(entry.value)
+    return entry.value
+  }
+
+  // Like getOrLoad, but also reports where the value came from: 'hit', 'load', or
+  // 'coalesced' when it piggy-backed on a load already in flight for the same key.
+  // null/undefined results are not cached so a later insert is picked up immediately.
+  async lookup(key, loader) {
+    const cached = this.get(key)
+    if (cached !== undefined) return { value: cached, source: 'hit' }
+
+    if (this.inflight.has(key)) return { value: await this.inflight.get(key), source: 'coalesced' }
+
+    let promise
+    promise = (async () => {
+      try {
+        const value = await loader()
+        if (value !== undefined && value !== null && this.inflight.get(key) === promise) {
+          this.set(key, value)
+        }
+        return value
+      } finally {
+        if (this.inflight.get(key) === promise) this.inflight.delete(key)
+      }
+    })()
+
+    this.inflight.set(key, promise)
+    return { value: await promise, source: 'load' }
+  }
+
+  // Returns the cached value or runs `loader` once for concurrent callers of the same key
+  async getOrLoad(key, loader) {
+    return (await this.lookup(key, loader)).value
+  }
+
+  stats() {
+    return { size: this.entries.size, hits: this.hits, misses: this.misses }
+  }
+}
+
+const ORG_CACHE_TTL_MS = Number(process.env.ORG_CACHE_TTL_MS ?? 60000)
+const ORG_CACHE_MAX = Number(process.env.ORG_CACHE_MAX ?? 5000)
+
+// user id -> organization row
+export const userOrgCache = new TTLCache({ max: ORG_CACHE_MAX, ttlMs: ORG_CACHE_TTL_MS })
+
+// org id -> evolution_instances row
+export const orgInstanceCache = new TTLCache({ max: ORG_CACHE_MAX, ttlMs: ORG_CACHE_TTL_MS })
+
+export function invalidateUserOrg(userId) {
+  userOrgCache.delete(userId)
+}
+
+export function invalidateOrg(orgId) {
+  orgInstanceCache.delete(orgId)
+  for (const [userId, entry] of userOrgCache.entries) {
+    if (entry.value?.id === orgId) userOrgCache.delete(userId)
+  }
+}
+
+// Public RSVP page data: rsvp_token -> event payload, and event id -> guest count.
+// The payload TTL is short; the counter is adjusted in place by confirms and imports.
+export const publicEventCache = new TTLCache({
+  max: Number(process.env.PUBLIC_EVENT_CACHE_MAX ?? 1000),
+  ttlMs: Number(process.env.PUBLIC_EVENT_CACHE_TTL_MS ?? 5000)
+})
+
+export const eventGuestCountCache = new TTLCache({
+  max: Number(process.env.PUBLIC_EVENT_CACHE_MAX ?? 1000),
+  ttlMs: Number(process.env.GUEST_COUNT_CACHE_TTL_MS ?? 60000)
+})
+
+export function adjustEventGuestCount(eventId, delta) {
+  eventGuestCountCache.update(eventId, count => count + delta)
+}
+
+export function invalidatePublicEvent(eventId) {
+  eventGuestCountCache.delete(eventId)
+  for (const [token, entry] of publicEventCache.entries) {
+    if (entry.value?.id === eventId) publicEventCache.delete(token)
+  }
+}
+
+registerMetricsSource('caches', () => ({
+  userOrg: userOrgCache.stats(),
+  orgInstance: orgInstanceCache.stats(),
+  publicEvent: publicEventCache.stats(),
+  eventGuestCount: eventGuestCountCache.stats()
+}))
@@ -1,3 +1,94 @@
+import { tracedFetch } from './tracing.js'
+import { TokenBucket, RetryBudget } from './rateLimiter.js'
+import { registerMetricsSource } from './metrics.js'
+
+const evolutionFetch = tracedFetch('evolution')
+
+// Send-queue sends (paced: true) are paced per instance_id by a token bucket; the synchronous
+// POST /api/messages/send loop is not, since at SEND_RATE_PER_INSTANCE a large send would
+// outlast the HTTP request (large sends belong in ?mode=async). sendText has no idempotency key,
+// so only failures where the gateway cannot have sent the message are retried: 429 answers and
+// connection errors raised before the request went out (refused, DNS, connect timeout). A
+// timeout, reset or 5xx after the request was sent may already have delivered the invite; it is
+// not retried and the error carries deliveryUnknown. Retries use full-jitter exponential
+// backoff, bounded per message by EVOLUTION_SEND_MAX_ATTEMPTS and per instance by a retry
+// budget. A 429 also halves the instance's rate and holds its bucket for Retry-After, which
+// slows the queue even when the synchronous loop hit the limit; successes grow the rate back.
+const SEND_RATE_PER_INSTANCE = Number(process.env.SEND_RATE_PER_INSTANCE ?? 5)
+const SEND_BURST = Number(process.env.SEND_BURST ?? SEND_RATE_PER_INSTANCE)
+const SEND_MIN_RATE = Math.min(SEND_RATE_PER_INSTANCE, 0.5)
+const SEND_MAX_ATTEMPTS = Math.max(1, Number(process.env.EVOLUTION_SEND_MAX_ATTEMPTS ?? 5))
+const SEND_TIMEOUT_MS = Number(process.env.EVOLUTION_SEND_TIMEOUT_MS ?? 15000)
+const BACKOFF_BASE_MS = Number(process.env.EVOLUTION_BACKOFF_BASE_MS ?? 250)
+const BACKOFF_MAX_MS = Number(process.env.EVOLUTION_BACKOFF_MAX_MS ?? 10000)
+const RETRY_BUDGET_RATIO = Number(process.env.EVOLUTION_RETRY_BUDGET_RATIO ?? 0.2)
+const PRE_SEND_ERROR_CODES = new Set(['ECONNREFUSED', 'ENOTFOUND', 'EAI_AGAIN', 'UND_ERR_CONNECT_TIMEOUT'])
+
+const sendLanes = new Map()
+const sendStats = {
+  requests: 0,
+  sent: 0,
+  failed: 0,
+  retries: 0,
+  rateLimited: 0,
+  serverErrors: 0,
+  networkErrors: 0,
+  unknownOutcome: 0,
+  budgetExhausted: 0
+}
+
+function sendLane(instanceId) {
+  let lane = sendLanes.get(instanceId)
+  if (!lane) {
+    lane = {
+      rate: SEND_RATE_PER_INSTANCE,
+      bucket: new TokenBucket({ ratePerSec: SEND_RATE_PER_INSTANCE, burst: SEND_BURST }),
+      budget: new RetryBudget({ ratio: RETRY_BUDGET_RATIO })
+    }
+    sendLanes.set(instanceId, lane)
+  }
+  return lane
+}
+
+registerMetricsSource('evolution', () => ({
+  ...sendStats,
+  configuredRatePerInstance: SEND_RATE_PER_INSTANCE,
+  instances: Object.fromEntries([...sendLanes].map(([id, lane]) => [id, {
+    ratePerSec: lane.rate,
+    retryBudget: lane.budget.balance
+  }]))
+}))
+
+// Retry-After is either delta-seconds or an HTTP date
+function parseRetryAfter(value) {
+  if (!value) return 0
+  const seconds = Number(value)
+  if (Number.isFinite(seconds)) return Math.max(0, seconds * 1000)
+  const date = Date.parse(value)
+  return Number.isFinite(date) ? Math.max(0, date - Date.now()) : 0
+}
+
+function backoffDelay(attempt) {
+  return Math.random() * Math.min(BACKOFF_MAX_MS, BACKOFF_BASE_MS * 2 ** (attempt - 1))
+}
+
+// fetch wraps socket errors in a TypeError whose cause carries the code
+function failedBeforeSend(error) {
+  return PRE_SEND_ERROR_CODES.has(error?.cause?.code ?? error?.code)
+}
+
+function onRateLimited(lane, retryAfterMs) {
+  lane.rate = Math.max(SEND_MIN_RATE, lane.rate / 2)
+  lane.bucket.setRate(lane.rate)
+  if (retryAfterMs > 0) lane.bucket.penalize(retryAfterMs)
+}
+
+function onDelivered(lane) {
+  if (lane.rate >= SEND_RATE_PER_INSTANCE) return
+  lane.rate = Math.min(SEND_RATE_PER_INSTANCE, lane.rate + SEND_RATE_PER_INSTANCE / 20)
+  lane.bucket.setRate(lane.rate)
+}
+
 // Evolution API Service
 class EvolutionAPI {
   constructor() {
@@ -30,7 +121,7 @@ class EvolutionAPI {
 
     try {
       // Create instance via Evolution Manager API
-      const response = await fetch(`${this.baseUrl}/manager/instance`, {
+      const response = await evolutionFetch(`${this.baseUrl}/manager/instance`, {
         method: 'POST',
         headers: {
           'Authorization': `Bearer ${this.token}`,
@@ -72,7 +163,7 @@ class EvolutionAPI {
     }
 
     try {
-      const response = await fetch(`${this.baseUrl}/webhook/${instanceId}`, {
+      const response = await evolutionFetch(`${this.baseUrl}/webhook/${instanceId}`, {
         method: 'POST',
         headers: {
           'Authorization': `Bearer ${this.token}`,
@@ -96,7 +187,7 @@ class EvolutionAPI {
     }
   }
 
-  async sendMessage({ instanceId, to, message }) {
+  async sendMessage({ instanceId, to, message, paced = false }) {
     if (this.isMockMode) {
       console.log('🟡 Mock: Sending message to', to, 'via instance:', instanceId)
       console.log('🟡 Mock: Message:', message)
@@ -108,27 +199,63 @@ class EvolutionAPI {
       }
     }
 
-    try {
-      const response = await fetch(`${this.baseUrl}/message/sendText/${instanceId}`, {
-        method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${this.token}`,
-          'Content-Type': 'application/json'
-        },
-        body: JSON.stringify({
-          number: to,
-          text: message
+    const lane = sendLane(instanceId)
+    lane.budget.deposit()
+
+    for (let attempt = 1; ; attempt++) {
+      if (paced) await lane.bucket.take()
+      sendStats.requests++
+
+      let error
+      let retryAfterMs = 0
+      try {
+        const response = await evolutionFetch(`${this.baseUrl}/message/sendText/${instanceId}`, {
+          method: 'POST',
+          headers: {
+            'Authorization': `Bearer ${this.token}`,
+            'Content-Type': 'application/json'
+          },
+          body: JSON.stringify({
+            number: to,
+            text: message
+          }),
+          signal: AbortSignal.timeout(SEND_TIMEOUT_MS)
         })
-      })
 
-      if (!response.ok) {
-        throw new Error(`Send message failed: ${response.status}`)
+        if (response.ok) {
+          onDelivered(lane)
+          sendStats.sent++
+          return await response.json()
+        }
+
+        error = new Error(`Send message failed: ${response.status}`)
+        error.status = response.status
+        if (response.status === 429) {
+          sendStats.rateLimited++
+          retryAfterMs = parseRetryAfter(response.headers.get('retry-after'))
+          onRateLimited(lane, retryAfterMs)
+        } else if (response.status >= 500) {
+          sendStats.serverErrors++
+        }
+      } catch (networkError) {
+        sendStats.networkErrors++
+        error = networkError
       }
 
-      return await response.json()
-    } catch (error) {
-      console.error('Evolution API sendMessage error:', error)
-      throw error
+      const retryable = error.status === 429 || (error.status === undefined && failedBeforeSend(error))
+      if (!retryable || attempt >= SEND_MAX_ATTEMPTS || !lane.budget.tryWithdraw()) {
+        if (retryable && attempt < SEND_MAX_ATTEMPTS) sendStats.budgetExhausted++
+        sendStats.failed++
+        error.attempts = attempt
+        // Anything but a 4xx answer or a pre-send connection error may have been delivered
+        error.deliveryUnknown = error.status === undefined ? !failedBeforeSend(error) : error.status >= 500
+        if (error.deliveryUnknown) sendStats.unknownOutcome++
+        console.error('Evolution API sendMessage error:', error)
+        throw error
+      }
+
+      sendStats.retries++
+      await new Promise(resolve => setTimeout(resolve, Math.max(retryAfterMs, backoffDelay(attempt))))
     }
   }
 
@@ -141,7 +268,7 @@ class EvolutionAPI {
     }
 
     try {
-      const response = await fetch(`${this.baseUrl}/instance/${instanceId}`, {
+      const response = await evolutionFetch(`${this.baseUrl}/instance/${instanceId}`, {
         method: 'GET',
         headers: {
           'Authorization': `Bearer ${this.token}`
@@ -0,0 +1,224 @@
+import { createSupabaseAdmin } from './supabase/server.js'
+import { cachedRsvpStatus, resolveRsvpStatus } from './rsvpStatus.js'
+import { registerMetricsSource } from './metrics.js'
+import { traceBackground } from './tracing.js'
+import { publishRsvpChanges } from './rsvpStream.js'
+import { classifyReply, phoneCandidates } from './utils/replyParser.js'
+
+// Inbound WhatsApp RSVP pipeline: the Evolution webhook only enqueues replies; a background
+// drain matches senders to guests by phone and applies RSVP updates in batches.
+const INBOUND_BATCH_SIZE = Number(process.env.INBOUND_RSVP_BATCH_SIZE ?? 200)
+const INBOUND_FLUSH_MS = Number(process.env.INBOUND_RSVP_FLUSH_MS ?? 50)
+
+const pending = []
+let draining = false
+let flushTimer = null
+
+const stats = {
+  received: 0,
+  ignored: 0,
+  processed: 0,
+  matched: 0,
+  unmatched: 0,
+  updates: 0,
+  batches: 0,
+  errors: 0,
+  lagMsTotal: 0,
+  lagMsMax: 0,
+  lastProcessedAt: null
+}
+
+registerMetricsSource('inboundRsvp', () => ({
+  ...stats,
+  queued: pending.length,
+  lagMsAvg: stats.processed ? stats.lagMsTotal / stats.processed : 0
+}))
+
+function messageText(message) {
+  return message?.conversation ||
+    message?.extendedTextMessage?.text ||
+    message?.buttonsResponseMessage?.selectedDisplayText ||
+    message?.listResponseMessage?.title ||
+    message?.reactionMessage?.text ||
+    ''
+}
+
+// Accepts the `data` of a messages.upsert webhook (single message, array or { messages: [] })
+export function parseInboundMessages(data) {
+  const list = Array.isArray(data) ? data : Array.isArray(data?.messages) ? data.messages : [data]
+  const parsed = []
+
+  for (const item of list) {
+    const key = item?.key || {}
+    if (!key.remoteJid || key.fromMe || key.remoteJid.endsWith('@g.us')) continue
+
+    const reply = classifyReply(messageText(item.message))
+    if (!reply) continue
+
+    const timestamp = Number(item.messageTimestamp)
+    parsed.push({
+      messageId: key.id || null,
+      phones: phoneCandidates(key.remoteJid),
+      sentAt: Number.isFinite(timestamp) && timestamp > 0 ? timestamp * 1000 : Date.now(),
+      ...reply
+    })
+  }
+
+  return parsed
+}
+
+function scheduleDrain() {
+  if (draining || flushTimer) return
+  flushTimer = setTimeout(() => {
+    flushTimer = null
+    traceBackground('inboundRsvp.drain', { queued: pending.length }, drain)
+      .catch(error => console.error('Inbound RSVP drain error:', error))
+  }, INBOUND_FLUSH_MS)
+  flushTimer.unref?.()
+}
+
+// Called by the webhook inbox; returns how many replies were queued and a promise that
+// resolves to false if any of them could not be applied
+export function enqueueInboundMessages(orgId, data) {
+  const replies = parseInboundMessages(data)
+  const list = Array.isArray(data) ? data : Array.isArray(data?.messages) ? data.messages : [data]
+  stats.received += list.length
+  stats.ignored += list.length - replies.length
+
+  if (!orgId || !replies.length) return { queued: 0, applied: Promise.resolve(true) }
+
+  const receivedAt = Date.now()
+  let resolveApplied
+  const ticket = {
+    remaining: replies.length,
+    ok: true,
+    applied: new Promise(resolve => { resolveApplied = resolve })
+  }
+  ticket.settle = ok => {
+    ticket.ok = ticket.ok && ok
+    if (--ticket.remaining === 0) resolveApplied(ticket.ok)
+  }
+
+  for (const reply of replies) pending.push({ orgId, receivedAt, ticket, ...reply })
+  scheduleDrain()
+  return { queued: replies.length, applied: ticket.applied }
+}
+
+async function applyOrgBatch(supabase, orgId, replies) {
+  const phones = [...new Set(replies.flatMap(r => r.phones))]
+
+  // guests (org_id, phone_e164) is indexed; the newest invite wins when a phone is on several events
+  const { data: guests, error } = await supabase
+    .from('guests')
+    .select('id, event_id, name, phone_e164, created_at')
+    .eq('org_id', orgId)
+    .in('phone_e164', phones)
+    .order('created_at', { ascending: false })
+
+  if (error) throw new Error(`Inbound RSVP guest lookup failed: ${error.message}`)
+
+  const guestByPhone = new Map()
+  for (const guest of guests || []) {
+    if (!guestByPhone.has(guest.phone_e164)) guestByPhone.set(guest.phone_e164, guest)
+  }
+
+  // Last reply per guest wins
+  const latest = new Map()
+  for (const reply of replies) {
+    const guest = reply.phones.map(p => guestByPhone.get(p)).find(Boolean)
+    if (!guest) {
+      stats.unmatched++
+      continue
+    }
+    stats.matched++
+    const previous = latest.get(guest.id)
+    if (!previous || previous.reply.sentAt <= reply.sentAt) latest.set(guest.id, { guest, reply })
+  }
+
+  // One UPDATE per distinct (status, companions) pair
+  const groups = new Map()
+  for (const { guest, reply } of latest.values()) {
+    const key = `${reply.status}:${reply.companions ?? ''}`
+    if (!groups.has(key)) groups.set(key, { status: reply.status, companions: reply.companions, guests: [] })
+    groups.get(key).guests.push(guest)
+  }
+
+  const respondedAt = new Date().toISOString()
+  for (const group of groups.values()) {
+    const targets = group.guests
+    let status = cachedRsvpStatus(group.status)
+
+    // The probe only sets the probed guest's status; companions and responded_at still come
+    // from the update below, which includes that guest
+    if (status === undefined) {
+      const [probe] = targets
+      status = await resolveRsvpStatus(supabase, group.status, { eventId: probe.event_id, guestId: probe.id })
+    }
+    if (!status) continue
+
+    const changes = { status, responded_at: respondedAt }
+    if (group.companions !== undefined) changes.companions_count = group.companions
+
+    const { error: updateError } = await supabase
+      .from('rsvps')
+      .update(changes)
+      .in('guest_id', targets.map(g => g.id))
+
+    if (updateError) throw new Error(`Inbound RSVP update failed: ${updateError.message}`)
+    stats.updates++
+    publishGroup(group.guests, status, group.companions)
+  }
+}
+
+// The previous status is not read back, so stream subscribers reload their counts
+function publishGroup(guests, status, companions) {
+  const byEvent = new Map()
+  for (const guest of guests) {
+    if (!byEvent.has(guest.event_id)) byEvent.set(guest.event_id, [])
+    byEvent.get(guest.event_id).push({ guestId: guest.id, name: guest.name, status, companions, previousStatus: undefined })
+  }
+  for (const [eventId, changes] of byEvent) publishRsvpChanges(eventId, changes)
+}
+
+async function drain() {
+  if (draining) return
+  draining = true
+  const supabase = createSupabaseAdmin()
+
+  try {
+    while (pending.length) {
+      const batch = pending.splice(0, INBOUND_BATCH_SIZE)
+      stats.batches++
+
+      const byOrg = new Map()
+      for (const reply of batch) {
+        if (!byOrg.has(reply.orgId)) byOrg.set(reply.orgId, [])
+        byOrg.get(reply.orgId).push(reply)
+      }
+
+      for (const [orgId, replies] of byOrg) {
+        let ok = true
+        try {
+          await applyOrgBatch(supabase, orgId, replies)
+        } catch (error) {
+          ok = false
+          stats.errors++
+          console.error(error)
+        }
+        for (const reply of replies) reply.ticket.settle(ok)
+      }
+
+      const now = Date.now()
+      for (const reply of batch) {
+        const lag = now - reply.receivedAt
+        stats.lagMsTotal += lag
+        stats.lagMsMax = Math.max(stats.lagMsMax, lag)
+      }
+      stats.processed += batch.length
+      stats.lastProcessedAt = new Date(now).toISOString()
+    }
+  } finally {
+    draining = false
+    if (pending.length) scheduleDrain()
+  }
+}
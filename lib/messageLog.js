@@ -0,0 +1,93 @@
+import { createSupabaseAdmin } from './supabase/server.js'
+import { registerMetricsSource } from './metrics.js'
+import { traceBackground } from './tracing.js'
+
+// `messages` log rows are buffered and written with multi-row inserts instead of one insert
+// per sent message. A batch is written once MESSAGE_LOG_BATCH_SIZE rows are pending or
+// MESSAGE_LOG_FLUSH_MS after the first one. Callers that must see their rows persisted await
+// flush(): the synchronous send route before it returns (on every path), the send queue with
+// every job progress write and when a job ends.
+//
+// MESSAGE_LOG_PAYLOAD=compact stores template id/version + the template's variables and the
+// gateway message id instead of the rendered text and the full gateway response.
+const MESSAGE_LOG_BATCH_SIZE = Math.max(1, Number(process.env.MESSAGE_LOG_BATCH_SIZE ?? 200))
+const MESSAGE_LOG_FLUSH_MS = Number(process.env.MESSAGE_LOG_FLUSH_MS ?? 250)
+export const MESSAGE_LOG_PAYLOAD = process.env.MESSAGE_LOG_PAYLOAD === 'compact' ? 'compact' : 'full'
+
+export class MessageLogBuffer {
+  constructor({ batchSize = MESSAGE_LOG_BATCH_SIZE, flushMs = MESSAGE_LOG_FLUSH_MS } = {}) {
+    this.batchSize = batchSize
+    this.flushMs = flushMs
+    this.pending = []
+    this.timer = null
+    this.tail = Promise.resolve()
+    this.counters = { rows: 0, inserts: 0, fallbackInserts: 0, failedRows: 0, payloadBytes: 0 }
+  }
+
+  add(row) {
+    this.pending.push(row)
+    if (this.pending.length >= this.batchSize) {
+      this.flush().catch(error => console.error('Message log flush error:', error))
+    } else if (!this.timer) {
+      this.timer = setTimeout(() => {
+        this.timer = null
+        traceBackground('messageLog.flush', { pending: this.pending.length }, () => this.flush())
+          .catch(error => console.error('Message log flush error:', error))
+      }, this.flushMs)
+      this.timer.unref?.()
+    }
+  }
+
+  // Resolves once every row added before the call has been written (or given up on)
+  flush() {
+    this.tail = this.tail.catch(() => {}).then(() => this.writePending())
+    return this.tail
+  }
+
+  async writePending() {
+    const supabase = createSupabaseAdmin()
+
+    while (this.pending.length) {
+      const batch = this.pending.splice(0, this.batchSize)
+      const { error } = await supabase.from('messages').insert(batch)
+      this.counters.inserts++
+
+      if (error) {
+        // Pin down the bad rows instead of losing the whole batch
+        console.error('Message log batch insert error:', error)
+        for (const row of batch) {
+          const { error: rowError } = await supabase.from('messages').insert([row])
+          this.counters.fallbackInserts++
+          if (rowError) {
+            this.counters.failedRows++
+            console.error('Message log insert error:', rowError)
+          } else {
+            this.recordRow(row)
+          }
+        }
+        continue
+      }
+
+      batch.forEach(row => this.recordRow(row))
+    }
+  }
+
+  recordRow(row) {
+    this.counters.rows++
+    this.counters.payloadBytes += Buffer.byteLength(JSON.stringify(row.payload ?? null))
+  }
+
+  stats() {
+    return {
+      ...this.counters,
+      pending: this.pending.length,
+      payloadMode: MESSAGE_LOG_PAYLOAD,
+      rowsPerInsert: this.counters.inserts ? this.counters.rows / this.counters.inserts : 0,
+      payloadBytesPerRow: this.counters.rows ? this.counters.payloadBytes / this.counters.rows : 0
+    }
+  }
+}
+
+export const messageLog = new MessageLogBuffer()
+
+registerMetricsSource('messageLog', () => messageLog.stats())
@@ -0,0 +1,92 @@
+import { evolutionAPI } from './evolution.js'
+import { renderCompiled, getGuestVariables } from './utils/templates.js'
+import { withSpan } from './tracing.js'
+import { messageLog, MESSAGE_LOG_PAYLOAD } from './messageLog.js'
+
+// Compact payloads keep what is needed to re-render the message: the template version and
+// the values of the placeholders it actually uses
+function sentPayload({ template, compiledTemplate, variables, message, sendResult }) {
+  if (MESSAGE_LOG_PAYLOAD !== 'compact') {
+    return {
+      templateId: template.id,
+      message,
+      evolutionResponse: sendResult
+    }
+  }
+
+  const used = {}
+  for (const part of compiledTemplate) {
+    if (typeof part !== 'string' && Object.prototype.hasOwnProperty.call(variables, part.name)) {
+      used[part.name] = variables[part.name]
+    }
+  }
+  return {
+    templateId: template.id,
+    templateVersion: template.updated_at ?? template.created_at ?? null,
+    variables: used,
+    messageId: gatewayMessageId(sendResult)
+  }
+}
+
+// Evolution answers with the WhatsApp message key; mock mode returns a flat messageId
+function gatewayMessageId(sendResult) {
+  return sendResult?.key?.id ?? sendResult?.messageId ?? null
+}
+
+// Sends one rendered invite and queues its `messages` log row (see messageLog.js); never throws.
+// `paced` holds the send to the instance's rate (see evolution.js)
+export async function sendGuestMessage({ orgId, eventId, template, compiledTemplate, eventVariables, guest, instance, paced = false }) {
+  try {
+    const variables = { ...eventVariables, ...getGuestVariables(guest) }
+    const message = renderCompiled(compiledTemplate, variables)
+
+    const sendResult = await withSpan('evolution.sendMessage', { guestId: guest.id }, () =>
+      evolutionAPI.sendMessage({
+        instanceId: instance.instance_id,
+        to: guest.phone_e164,
+        message,
+        paced
+      })
+    )
+
+    // Log message
+    messageLog.add({
+      org_id: orgId,
+      event_id: eventId,
+      guest_id: guest.id,
+      status: 'sent',
+      payload: sentPayload({ template, compiledTemplate, variables, message, sendResult })
+    })
+
+    return {
+      guestId: guest.id,
+      guestName: guest.name,
+      status: 'sent',
+      messageId: gatewayMessageId(sendResult)
+    }
+  } catch (error) {
+    console.error(`Failed to send message to ${guest.name}:`, error)
+
+    // deliveryUnknown: the gateway may have sent it anyway (timeout, 5xx), so check before resending
+    const deliveryUnknown = !!error.deliveryUnknown
+    messageLog.add({
+      org_id: orgId,
+      event_id: eventId,
+      guest_id: guest.id,
+      status: 'failed',
+      payload: {
+        templateId: template.id,
+        error: error.message,
+        ...(deliveryUnknown ? { deliveryUnknown } : {})
+      }
+    })
+
+    return {
+      guestId: guest.id,
+      guestName: guest.name,
+      status: 'failed',
+      error: error.message,
+      ...(deliveryUnknown ? { deliveryUnknown } : {})
+    }
+  }
+}
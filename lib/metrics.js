@@ -0,0 +1,29 @@
+// Process-wide metrics registry, served by GET /api/metrics when METRICS_TOKEN is set
+const sources = new Map()
+
+export function registerMetricsSource(name, collect) {
+  sources.set(name, collect)
+}
+
+export function collectMetrics() {
+  const snapshot = {
+    pid: process.pid,
+    uptimeSeconds: Math.round(process.uptime()),
+    memory: process.memoryUsage()
+  }
+  for (const [name, collect] of sources) {
+    try {
+      snapshot[name] = collect()
+    } catch (error) {
+      snapshot[name] = { error: error.message }
+    }
+  }
+  return snapshot
+}
+
+export function metricsAuthorized(request) {
+  const expected = process.env.METRICS_TOKEN
+  if (!expected) return false
+  const provided = request.headers.get('x-metrics-token') || request.nextUrl.searchParams.get('token')
+  return provided === expected
+}
@@ -0,0 +1,68 @@
+// Token bucket: `ratePerSec` tokens refill continuously up to `burst`
+export class TokenBucket {
+  constructor({ ratePerSec = 5, burst = ratePerSec } = {}) {
+    this.ratePerSec = ratePerSec
+    this.burst = Math.max(1, burst)
+    this.tokens = this.burst
+    this.updatedAt = Date.now()
+  }
+
+  refill() {
+    const now = Date.now()
+    if (this.ratePerSec > 0) {
+      this.tokens = Math.min(this.burst, this.tokens + ((now - this.updatedAt) / 1000) * this.ratePerSec)
+    }
+    this.updatedAt = now
+  }
+
+  tryTake(n = 1) {
+    if (!(this.ratePerSec > 0)) return true
+    this.refill()
+    if (this.tokens >= n) {
+      this.tokens -= n
+      return true
+    }
+    return false
+  }
+
+  // Holds off every caller for `ms` (e.g. a gateway's Retry-After) by running the bucket into debt
+  penalize(ms) {
+    if (!(this.ratePerSec > 0)) return
+    this.refill()
+    this.tokens = Math.min(this.tokens, -(ms / 1000) * this.ratePerSec)
+  }
+
+  // Changes the refill rate, keeping the tokens accumulated so far
+  setRate(ratePerSec) {
+    this.refill()
+    this.ratePerSec = ratePerSec
+  }
+
+  // Resolves once a token is available; a rate of 0 disables limiting
+  async take(n = 1) {
+    while (!this.tryTake(n)) {
+      const waitMs = Math.ceil(((n - this.tokens) / this.ratePerSec) * 1000)
+      await new Promise(resolve => setTimeout(resolve, Math.max(1, waitMs)))
+    }
+  }
+}
+
+// Retry budget: every request deposits `ratio` retry tokens (up to `max`) and every retry
+// withdraws one, so retries stay a bounded fraction of traffic even when the gateway is down.
+export class RetryBudget {
+  constructor({ ratio = 0.2, reserve = 10, max = 100 } = {}) {
+    this.ratio = ratio
+    this.max = Math.max(reserve, max)
+    this.balance = reserve
+  }
+
+  deposit() {
+    this.balance = Math.min(this.max, this.balance + this.ratio)
+  }
+
+  tryWithdraw() {
+    if (this.balance < 1) return false
+    this.balance -= 1
+    return true
+  }
+}
@@ -0,0 +1,153 @@
+// Method + path-pattern route table compiled into a segment trie.
+// Patterns use `:name` segments for parameters, e.g. '/events/:id/guests'. Static segments
+// win over parameters; when the static branch has no handler for the method, matching
+// falls back to the parameter branch (so POST /public/rsvp/confirm and
+// GET /public/rsvp/:token can coexist).
+function createNode() {
+  return { children: new Map(), param: null, routes: new Map() }
+}
+
+function splitPath(path) {
+  return path.split('/').filter(Boolean)
+}
+
+export class Router {
+  constructor() {
+    this.root = createNode()
+    this.routes = []
+    this.stats = new Map()
+    this.timingHooks = []
+  }
+
+  // options.public: the handler runs without resolving the user/org
+  add(method, pattern, handler, options = {}) {
+    let node = this.root
+    for (const segment of splitPath(pattern)) {
+      if (segment.startsWith(':')) {
+        const name = segment.slice(1)
+        if (!node.param) node.param = { name, node: createNode() }
+        if (node.param.name !== name) {
+          throw new Error(`Conflicting parameter names :${node.param.name} and :${name} in ${pattern}`)
+        }
+        node = node.param.node
+      } else {
+        if (!node.children.has(segment)) node.children.set(segment, createNode())
+        node = node.children.get(segment)
+      }
+    }
+
+    if (node.routes.has(method)) throw new Error(`Duplicate route ${method} ${pattern}`)
+    const route = { method, pattern, key: `${method} ${pattern}`, handler, public: !!options.public }
+    node.routes.set(method, route)
+    this.routes.push(route)
+    return this
+  }
+
+  get(pattern, handler, options) {
+    return this.add('GET', pattern, handler, options)
+  }
+
+  post(pattern, handler, options) {
+    return this.add('POST', pattern, handler, options)
+  }
+
+  // Returns { route, params } or null
+  match(method, path) {
+    const segments = splitPath(path)
+    const params = {}
+
+    const walk = (node, index) => {
+      if (index === segments.length) return node.routes.get(method) || null
+
+      const child = node.children.get(segments[index])
+      if (child) {
+        const found = walk(child, index + 1)
+        if (found) return found
+      }
+
+      if (node.param) {
+        const found = walk(node.param.node, index + 1)
+        if (found) {
+          params[node.param.name] = segments[index]
+          return found
+        }
+      }
+      return null
+    }
+
+    const route = walk(this.root, 0)
+    return route ? { route, params } : null
+  }
+
+  // Methods that have a route for this path, so a method mismatch can answer 405 instead of 404
+  allowedMethods(path) {
+    const segments = splitPath(path)
+    const methods = new Set()
+
+    const walk = (node, index) => {
+      if (index === segments.length) {
+        for (const method of node.routes.keys()) methods.add(method)
+        return
+      }
+      const child = node.children.get(segments[index])
+      if (child) walk(child, index + 1)
+      if (node.param) walk(node.param.node, index + 1)
+    }
+
+    walk(this.root, 0)
+    return [...methods]
+  }
+
+  // Per-route timing hook: fn(routeKey, timings, status) runs after every request
+  onTiming(fn) {
+    this.timingHooks.push(fn)
+  }
+
+  record(routeKey, timings, status) {
+    let entry = this.stats.get(routeKey)
+    if (!entry) {
+      entry = { count: 0, errors: 0, dispatchMs: 0, authMs: 0, handlerMs: 0, maxMs: 0 }
+      this.stats.set(routeKey, entry)
+    }
+    const total = timings.dispatch + timings.auth + timings.handler
+    entry.count++
+    if (status >= 500) entry.errors++
+    entry.dispatchMs += timings.dispatch
+    entry.authMs += timings.auth
+    entry.handlerMs += timings.handler
+    entry.maxMs = Math.max(entry.maxMs, total)
+
+    for (const hook of this.timingHooks) {
+      try {
+        hook(routeKey, timings, status)
+      } catch (error) {
+        console.error('Route timing hook error:', error)
+      }
+    }
+  }
+
+  timingSummary() {
+    const summary = {}
+    for (const [routeKey, entry] of this.stats) {
+      summary[routeKey] = {
+        count: entry.count,
+        errors: entry.errors,
+        avgDispatchMs: entry.dispatchMs / entry.count,
+        avgAuthMs: entry.authMs / entry.count,
+        avgHandlerMs: entry.handlerMs / entry.count,
+        maxMs: entry.maxMs
+      }
+    }
+    return summary
+  }
+}
+
+// Server-Timing header value, e.g. `dispatch;dur=0.02, auth;dur=12.1, handler;dur=48.3;desc="GET /events"`
+export function serverTimingHeader(timings, routeKey) {
+  const desc = routeKey ? `;desc="${routeKey.replace(/"/g, '')}"` : ''
+  return [
+    `dispatch;dur=${timings.dispatch.toFixed(3)}`,
+    `auth;dur=${timings.auth.toFixed(3)}`,
+    `handler;dur=${timings.handler.toFixed(3)}${desc}`
+  ].join(', ')
+}
@@ -0,0 +1,84 @@
+import { withSpan } from './tracing.js'
+
+// The rsvps.status CHECK constraint differs between deployments, so the values used for
+// "confirmed" / "declined" are discovered by probing once and then remembered for the
+// whole process. Set RSVP_CONFIRMED_STATUS / RSVP_DECLINED_STATUS to skip the probe.
+const CANDIDATES = {
+  confirmed: ['confirmed', 'yes', 'accepted', 'attending', 'going', 'present', 'confirmado'],
+  declined: ['declined', 'no', 'rejected', 'not_attending', 'not_going', 'absent', 'recusado']
+}
+
+const resolved = {
+  confirmed: process.env.RSVP_CONFIRMED_STATUS || undefined,
+  declined: process.env.RSVP_DECLINED_STATUS || undefined
+}
+const probing = {}
+
+export function cachedRsvpStatus(kind) {
+  return resolved[kind]
+}
+
+export function cachedConfirmedStatus() {
+  return cachedRsvpStatus('confirmed')
+}
+
+// Tenta atualizar o RSVP do convidado para cada candidato até um passar no CHECK
+async function tryUpgradeRsvpStatus(supabase, kind, { eventId, guestId }) {
+  for (const status of CANDIDATES[kind]) {
+    const { error } = await supabase
+      .from('rsvps')
+      .update({ status })
+      .eq('event_id', eventId)
+      .eq('guest_id', guestId)
+
+    // se não houver erro, ótimo — status atualizado
+    if (!error) return { ok: true, status }
+    // se der erro por constraint, tenta o próximo
+    const msg = (error?.message || '').toLowerCase()
+    if (msg.includes('check constraint') || msg.includes('invalid') || msg.includes('violates')) continue
+
+    // erro inesperado — retorna
+    return { ok: false, error }
+  }
+
+  // nenhum dos candidatos foi aceito — seguimos com 'pending'
+  return { ok: false, rejected: true, error: { message: 'Nenhum status alternativo foi aceito; RSVP permanece como pending.' } }
+}
+
+// Sets the guest's RSVP to the deployment's value for `kind` and caches that value.
+// Concurrent first calls share one probe. Returns the status now stored, or null if
+// none of the candidates was accepted.
+export async function resolveRsvpStatus(supabase, kind, { eventId, guestId }) {
+  if (resolved[kind] !== undefined) return resolved[kind]
+
+  if (!probing[kind]) {
+    probing[kind] = withSpan('rsvpStatus.probe', { kind }, span =>
+      tryUpgradeRsvpStatus(supabase, kind, { eventId, guestId }).then(result => {
+        if (span) span.attributes.status = result.ok ? result.status : null
+        return result
+      })
+    )
+      .then(result => {
+        // Only a definitive answer is cached; transient errors are probed again next time
+        if (result.ok) resolved[kind] = result.status
+        else if (result.rejected) resolved[kind] = null
+        return { ...result, probedGuestId: guestId }
+      })
+      .finally(() => { probing[kind] = null })
+  }
+
+  const result = await probing[kind]
+  if (result.probedGuestId === guestId || !result.ok) return result.ok ? result.status : null
+
+  // Another request ran the probe; apply its answer to this guest's row
+  const { error } = await supabase
+    .from('rsvps')
+    .update({ status: result.status })
+    .eq('event_id', eventId)
+    .eq('guest_id', guestId)
+  return error ? null : result.status
+}
+
+export function resolveConfirmedStatus(supabase, target) {
+  return resolveRsvpStatus(supabase, 'confirmed', target)
+}
@@ -0,0 +1,272 @@
+import { createSupabaseAdmin } from './supabase/server.js'
+import { registerMetricsSource } from './metrics.js'
+
+// In-process RSVP hub behind GET /api/events/{id}/rsvps/stream (server-sent events).
+// Each subscriber gets a `snapshot` frame with the event's running counts, then one `rsvp`
+// frame per coalesced batch of changes. Counts are loaded once per event while it has
+// subscribers (get_event_rsvp_counts) and kept current from the published deltas; a change
+// whose previous status is unknown, or a batch that a load may already have counted, triggers
+// a reload instead. Frames are encoded once and shared by every subscriber; one that falls
+// RSVP_STREAM_MAX_QUEUED frames behind is dropped.
+//
+// Changes are published only to subscribers of the same server process. With several
+// instances, `rsvp` frames for changes made elsewhere are missed; the counts are reloaded
+// every RSVP_STREAM_RESYNC_MS and sent as a new `snapshot` frame when they moved.
+const RSVP_STREAM_COALESCE_MS = Number(process.env.RSVP_STREAM_COALESCE_MS ?? 50)
+const RSVP_STREAM_HEARTBEAT_MS = Number(process.env.RSVP_STREAM_HEARTBEAT_MS ?? 15000)
+const RSVP_STREAM_RESYNC_MS = Number(process.env.RSVP_STREAM_RESYNC_MS ?? 30000)
+const RSVP_STREAM_MAX_QUEUED = Number(process.env.RSVP_STREAM_MAX_QUEUED ?? 256)
+
+const encoder = new TextEncoder()
+const HEARTBEAT = encoder.encode(': ping\n\n')
+
+// event id -> { subscribers, tally, loading, loadedAt, pending, firstPendingAt, timer, stale }
+const channels = new Map()
+let heartbeatTimer = null
+let resyncTimer = null
+
+const stats = {
+  opened: 0,
+  closed: 0,
+  slowDropped: 0,
+  published: 0,
+  frames: 0,
+  deliveries: 0,
+  bytesSent: 0,
+  tallyLoads: 0,
+  overlappedReloads: 0,
+  resyncSnapshots: 0,
+  errors: 0
+}
+
+registerMetricsSource('rsvpStream', () => {
+  let subscribers = 0
+  for (const channel of channels.values()) subscribers += channel.subscribers.size
+  return { ...stats, channels: channels.size, subscribers }
+})
+
+function encodeFrame(type, data) {
+  return encoder.encode(`event: ${type}\ndata: ${JSON.stringify(data)}\n\n`)
+}
+
+function channelFor(eventId) {
+  let channel = channels.get(eventId)
+  if (!channel) {
+    channel = {
+      subscribers: new Set(),
+      tally: null,
+      loading: null,
+      loadedAt: 0,
+      pending: [],
+      firstPendingAt: 0,
+      timer: null,
+      stale: false
+    }
+    channels.set(eventId, channel)
+  }
+  return channel
+}
+
+async function loadTally(eventId) {
+  const { data, error } = await createSupabaseAdmin().rpc('get_event_rsvp_counts', { p_event_id: eventId })
+  stats.tallyLoads++
+  if (error) throw new Error(`Failed to load RSVP counts: ${error.message}`)
+  return { counts: data?.counts || {}, total: data?.total || 0 }
+}
+
+// Concurrent callers share one load; changes published meanwhile force another one
+async function ensureTally(eventId, channel) {
+  while (!channel.tally || channel.stale) {
+    if (!channel.loading) {
+      channel.stale = false
+      channel.loading = loadTally(eventId)
+        .then(tally => {
+          channel.tally = tally
+          channel.loadedAt = Date.now()
+        })
+        .finally(() => { channel.loading = null })
+    }
+    await channel.loading
+  }
+  return channel.tally
+}
+
+function write(subscriber, bytes) {
+  const { controller } = subscriber
+  if (controller.desiredSize !== null && controller.desiredSize < -RSVP_STREAM_MAX_QUEUED) {
+    stats.slowDropped++
+    subscriber.close(new Error('RSVP stream consumer too slow'))
+    return
+  }
+  controller.enqueue(bytes)
+  stats.deliveries++
+  stats.bytesSent += bytes.byteLength
+}
+
+function broadcast(channel, bytes) {
+  stats.frames++
+  for (const subscriber of channel.subscribers) {
+    if (subscriber.ready) write(subscriber, bytes)
+  }
+}
+
+function applyChanges(tally, changes) {
+  for (const change of changes) {
+    if (change.previousStatus === undefined) return false
+    if (change.previousStatus === change.status) continue
+    if (change.previousStatus === null) {
+      tally.total++
+    } else {
+      tally.counts[change.previousStatus] = Math.max(0, (tally.counts[change.previousStatus] || 0) - 1)
+    }
+    tally.counts[change.status] = (tally.counts[change.status] || 0) + 1
+  }
+  return true
+}
+
+// A change is committed shortly before it is published, so a load that was in flight during
+// the batch, or finished less than one coalesce window before its first change, may already
+// count some of it. Applying the deltas would count those twice; such a batch reloads instead.
+function overlapsLoad(channel, firstPendingAt) {
+  return !!channel.loading || channel.loadedAt >= firstPendingAt - RSVP_STREAM_COALESCE_MS
+}
+
+async function flushChannel(eventId, channel) {
+  channel.timer = null
+  const changes = channel.pending.splice(0, channel.pending.length)
+  if (!changes.length || !channel.subscribers.size) return
+
+  if (!channel.tally || overlapsLoad(channel, channel.firstPendingAt)) {
+    if (channel.tally) stats.overlappedReloads++
+    channel.stale = true
+  } else if (!applyChanges(channel.tally, changes)) {
+    channel.stale = true
+  }
+  const tally = await ensureTally(eventId, channel)
+
+  broadcast(channel, encodeFrame('rsvp', {
+    eventId,
+    changes: changes.map(({ previousStatus, ...change }) => change),
+    counts: tally.counts,
+    total: tally.total,
+    at: Date.now()
+  }))
+}
+
+function sameTally(a, b) {
+  if (a.total !== b.total) return false
+  const keys = new Set([...Object.keys(a.counts), ...Object.keys(b.counts)])
+  return [...keys].every(key => (a.counts[key] || 0) === (b.counts[key] || 0))
+}
+
+// Picks up changes made by other server processes; a channel with a batch pending or a load
+// in flight is left to that batch's flush
+async function resyncChannel(eventId, channel) {
+  if (!channel.tally || channel.loading || channel.pending.length) return
+  const before = channel.tally
+  channel.stale = true
+  const tally = await ensureTally(eventId, channel)
+  if (sameTally(before, tally)) return
+
+  stats.resyncSnapshots++
+  broadcast(channel, encodeFrame('snapshot', { eventId, counts: tally.counts, total: tally.total, at: Date.now() }))
+}
+
+function removeSubscriber(eventId, channel, subscriber) {
+  if (!channel.subscribers.delete(subscriber)) return
+  stats.closed++
+  if (!channel.subscribers.size) {
+    clearTimeout(channel.timer)
+    channels.delete(eventId)
+  }
+  if (!channels.size) {
+    clearInterval(heartbeatTimer)
+    clearInterval(resyncTimer)
+    heartbeatTimer = null
+    resyncTimer = null
+  }
+}
+
+function startTimers() {
+  if (!heartbeatTimer && RSVP_STREAM_HEARTBEAT_MS) {
+    heartbeatTimer = setInterval(() => {
+      for (const channel of channels.values()) {
+        for (const subscriber of channel.subscribers) write(subscriber, HEARTBEAT)
+      }
+    }, RSVP_STREAM_HEARTBEAT_MS)
+    heartbeatTimer.unref?.()
+  }
+
+  if (!resyncTimer && RSVP_STREAM_RESYNC_MS) {
+    resyncTimer = setInterval(() => {
+      for (const [eventId, channel] of channels) {
+        resyncChannel(eventId, channel).catch(error => {
+          stats.errors++
+          console.error('RSVP stream resync error:', error)
+        })
+      }
+    }, RSVP_STREAM_RESYNC_MS)
+    resyncTimer.unref?.()
+  }
+}
+
+// SSE body for one subscriber; ends when the client disconnects (`signal`) or falls behind
+export function openRsvpStream(eventId, signal) {
+  const channel = channelFor(eventId)
+  let subscriber
+
+  return new ReadableStream({
+    async start(controller) {
+      subscriber = {
+        controller,
+        ready: false,
+        close(error) {
+          removeSubscriber(eventId, channel, subscriber)
+          try {
+            if (error) controller.error(error)
+            else controller.close()
+          } catch {
+            // already closed by the client
+          }
+        }
+      }
+      channel.subscribers.add(subscriber)
+      stats.opened++
+      startTimers()
+      signal?.addEventListener('abort', () => subscriber.close(), { once: true })
+
+      try {
+        const tally = await ensureTally(eventId, channel)
+        write(subscriber, encodeFrame('snapshot', { eventId, counts: tally.counts, total: tally.total, at: Date.now() }))
+        subscriber.ready = true
+      } catch (error) {
+        stats.errors++
+        console.error('RSVP stream snapshot error:', error)
+        subscriber.close(error)
+      }
+    },
+    cancel() {
+      removeSubscriber(eventId, channel, subscriber)
+    }
+  })
+}
+
+// changes: [{ guestId, name, status, companionOf, previousStatus }] where previousStatus is
+// null for a new RSVP row and undefined when not known. Cheap no-op without subscribers.
+export function publishRsvpChanges(eventId, changes) {
+  const channel = channels.get(eventId)
+  if (!channel || !changes.length) return
+
+  stats.published += changes.length
+  if (!channel.pending.length) channel.firstPendingAt = Date.now()
+  channel.pending.push(...changes)
+  if (!channel.timer) {
+    channel.timer = setTimeout(() => {
+      flushChannel(eventId, channel).catch(error => {
+        stats.errors++
+        console.error('RSVP stream publish error:', error)
+      })
+    }, RSVP_STREAM_COALESCE_MS)
+    channel.timer.unref?.()
+  }
+}
@@ -0,0 +1,281 @@
+import { v4 as uuidv4 } from 'uuid'
+import { createSupabaseAdmin } from './supabase/server.js'
+import { sendGuestMessage } from './messages.js'
+import { messageLog } from './messageLog.js'
+import { currentRequestId, traceBackground } from './tracing.js'
+
+// Send queue: one lane per Evolution instance, drained by a background worker with up to
+// SEND_QUEUE_CONCURRENCY sends in flight. Pacing (SEND_RATE_PER_INSTANCE, applied to queued
+// sends only) and retries happen in evolutionAPI.sendMessage.
+//
+// Every job is recorded in `send_jobs` before the route answers 202; the worker writes its
+// counters and heartbeat_at every SEND_JOB_SYNC_MS and the results when the job ends, so the
+// status endpoint works from any server process. The worker itself runs in the process that
+// accepted the job, which therefore has to be a long-running Node server. A job is not resumed
+// after a restart or deploy (resending could deliver invites twice): once its heartbeat is older
+// than SEND_JOB_STALE_MS it is marked failed, and the `messages` log shows which guests got
+// the message. Finished jobs stay in memory for SEND_JOB_RETENTION_MS.
+const SEND_QUEUE_CONCURRENCY = Math.max(1, Number(process.env.SEND_QUEUE_CONCURRENCY ?? 4))
+const SEND_JOB_RETENTION_MS = Number(process.env.SEND_JOB_RETENTION_MS ?? 60 * 60 * 1000)
+const SEND_JOB_SYNC_MS = Number(process.env.SEND_JOB_SYNC_MS ?? 2000)
+const SEND_JOB_STALE_MS = Number(process.env.SEND_JOB_STALE_MS ?? 5 * 60 * 1000)
+
+const INTERRUPTED_ERROR = 'Interrupted: the server process running this job stopped before it finished'
+
+const jobs = new Map()
+const lanes = new Map()
+const activeJobs = new Set()
+let syncTimer = null
+let sweepTimer = null
+
+function lane(instanceId) {
+  let current = lanes.get(instanceId)
+  if (!current) {
+    current = {
+      pending: [],
+      running: false
+    }
+    lanes.set(instanceId, current)
+  }
+  return current
+}
+
+function jobRow(job) {
+  return {
+    id: job.id,
+    org_id: job.orgId,
+    event_id: job.eventId,
+    template_id: job.templateId,
+    instance_id: job.instanceId,
+    status: job.status,
+    request_id: job.requestId,
+    total: job.total,
+    sent: job.sent,
+    failed: job.failed,
+    created_at: job.createdAt,
+    started_at: job.startedAt,
+    first_sent_at: job.firstSentAt,
+    finished_at: job.finishedAt,
+    heartbeat_at: new Date().toISOString(),
+    ...(job.finishedAt ? { results: job.results } : {})
+  }
+}
+
+function rowJob(row) {
+  return {
+    id: row.id,
+    orgId: row.org_id,
+    eventId: row.event_id,
+    templateId: row.template_id,
+    instanceId: row.instance_id,
+    status: row.status,
+    requestId: row.request_id,
+    total: row.total,
+    sent: row.sent,
+    failed: row.failed,
+    createdAt: row.created_at,
+    startedAt: row.started_at,
+    firstSentAt: row.first_sent_at,
+    finishedAt: row.finished_at,
+    ...(row.error ? { error: row.error } : {}),
+    results: row.results || []
+  }
+}
+
+// Writes are chained per job and read the job when they run, so a late progress write can
+// never overwrite the final state
+function saveJob(job) {
+  job.saving = job.saving.then(async () => {
+    const { error } = await createSupabaseAdmin()
+      .from('send_jobs')
+      .update(jobRow(job))
+      .eq('id', job.id)
+    if (error) console.error('Send job update error:', error)
+  })
+  return job.saving
+}
+
+// The message log is flushed with every progress write, so a crash loses at most the log rows
+// of the last sync interval
+async function syncJobs() {
+  await messageLog.flush()
+  await Promise.all([...activeJobs].map(job => saveJob(job)))
+  if (!activeJobs.size) {
+    clearInterval(syncTimer)
+    syncTimer = null
+  }
+}
+
+function startSync() {
+  if (syncTimer) return
+  syncTimer = setInterval(() => {
+    traceBackground('sendQueue.sync', { jobs: activeJobs.size }, syncJobs)
+      .catch(error => console.error('Send job sync error:', error))
+  }, SEND_JOB_SYNC_MS)
+  syncTimer.unref?.()
+}
+
+// Jobs left queued/running by a process that went away; this process heartbeats its own jobs
+// every SEND_JOB_SYNC_MS, so they are never stale here
+async function failInterruptedJobs() {
+  const now = new Date().toISOString()
+  const { data, error } = await createSupabaseAdmin()
+    .from('send_jobs')
+    .update({ status: 'failed', error: INTERRUPTED_ERROR, finished_at: now })
+    .in('status', ['queued', 'running'])
+    .lt('heartbeat_at', new Date(Date.now() - SEND_JOB_STALE_MS).toISOString())
+    .select('id')
+
+  if (error) {
+    console.error('Send job sweep error:', error)
+  } else if (data?.length) {
+    console.warn(`Marked ${data.length} interrupted send job(s) as failed`)
+  }
+}
+
+// Runs on first use of the queue in this process and then every SEND_JOB_STALE_MS
+function startSweeper() {
+  if (sweepTimer) return
+  const sweep = () => traceBackground('sendQueue.sweep', {}, failInterruptedJobs)
+    .catch(error => console.error('Send job sweep error:', error))
+  sweepTimer = setInterval(sweep, SEND_JOB_STALE_MS)
+  sweepTimer.unref?.()
+  sweep()
+}
+
+async function finishJob(job) {
+  job.status = 'completed'
+  job.finishedAt = new Date().toISOString()
+  activeJobs.delete(job)
+  await saveJob(job)
+  setTimeout(() => jobs.delete(job.id), SEND_JOB_RETENTION_MS).unref?.()
+}
+
+async function runTask(task) {
+  const { job } = task
+  if (!job.startedAt) {
+    job.startedAt = new Date().toISOString()
+    job.status = 'running'
+  }
+
+  const result = await traceBackground('sendQueue.task', { jobId: job.id, requestId: job.requestId }, () =>
+    sendGuestMessage(task.send)
+  )
+  job.results.push(result)
+  if (result.status === 'sent') {
+    job.sent++
+    job.firstSentAt = job.firstSentAt || new Date().toISOString()
+  } else {
+    job.failed++
+  }
+
+  if (job.sent + job.failed === job.total) {
+    // A completed job has its log rows written
+    await messageLog.flush()
+    await finishJob(job)
+  }
+}
+
+async function drain(current) {
+  current.running = true
+  const inFlight = new Set()
+
+  try {
+    do {
+      while (current.pending.length) {
+        const task = current.pending.shift()
+        const promise = runTask(task)
+          .catch(error => console.error('Send queue task error:', error))
+          .finally(() => inFlight.delete(promise))
+        inFlight.add(promise)
+        if (inFlight.size >= SEND_QUEUE_CONCURRENCY) await Promise.race(inFlight)
+      }
+      await Promise.all(inFlight)
+    } while (current.pending.length)
+  } finally {
+    current.running = false
+  }
+}
+
+function publicView(job, { includeResults = false } = {}) {
+  const { orgId, results, saving, ...view } = job
+  const processed = job.sent + job.failed
+  return {
+    ...view,
+    processed,
+    progress: job.total ? Math.round((processed / job.total) * 100) : 100,
+    ...(includeResults ? { results } : {})
+  }
+}
+
+// Records the job and queues one task per guest; the lane's worker does the sending. Throws
+// when the job cannot be recorded, so nothing is sent for a job the caller never got back.
+export async function enqueueSendJob({ orgId, event, template, compiledTemplate, eventVariables, guests, instance }) {
+  startSweeper()
+
+  const job = {
+    id: uuidv4(),
+    orgId,
+    eventId: event.id,
+    templateId: template.id,
+    instanceId: instance.instance_id,
+    status: 'queued',
+    requestId: currentRequestId(),
+    total: guests.length,
+    sent: 0,
+    failed: 0,
+    createdAt: new Date().toISOString(),
+    startedAt: null,
+    firstSentAt: null,
+    finishedAt: null,
+    results: [],
+    saving: Promise.resolve()
+  }
+
+  const { error } = await createSupabaseAdmin().from('send_jobs').insert(jobRow(job))
+  if (error) throw error
+
+  jobs.set(job.id, job)
+  if (!guests.length) {
+    await finishJob(job)
+    return publicView(job)
+  }
+  activeJobs.add(job)
+  startSync()
+
+  const current = lane(instance.instance_id)
+  for (const guest of guests) {
+    current.pending.push({
+      job,
+      send: { orgId, eventId: event.id, template, compiledTemplate, eventVariables, guest, instance, paced: true }
+    })
+  }
+
+  if (!current.running) {
+    drain(current).catch(error => console.error('Send queue worker error:', error))
+  }
+
+  return publicView(job)
+}
+
+// Jobs running here are read from memory, any other job from send_jobs
+export async function getSendJob(jobId, orgId, options) {
+  startSweeper()
+
+  const job = jobs.get(jobId)
+  if (job) return job.orgId === orgId ? publicView(job, options) : null
+
+  const { data, error } = await createSupabaseAdmin()
+    .from('send_jobs')
+    .select('*')
+    .eq('id', jobId)
+    .eq('org_id', orgId)
+    .maybeSingle()
+
+  if (error) {
+    // Includes ids that are not uuids
+    console.error('Send job lookup error:', error)
+    return null
+  }
+  return data ? publicView(rowJob(data), options) : null
+}
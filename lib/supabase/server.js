@@ -1,6 +1,14 @@
 import { createServerClient } from '@supabase/ssr'
 import { createClient } from '@supabase/supabase-js'
 import { cookies } from 'next/headers'
+import diagnosticsChannel from 'node:diagnostics_channel'
+import { registerMetricsSource } from '../metrics.js'
+import { tracedFetch } from '../tracing.js'
+
+// One span per PostgREST/Auth call, named after the table, RPC or auth endpoint
+const supabaseFetch = tracedFetch('supabase', url =>
+  url.pathname.replace(/^\/(rest|auth|storage)\/v1\//, (_, service) => service === 'rest' ? '' : `${service}/`)
+)
 
 export function createSupabaseServer() {
   const cookieStore = cookies()
@@ -9,6 +17,7 @@ export function createSupabaseServer() {
     process.env.NEXT_PUBLIC_SUPABASE_URL,
     process.env.NEXT_PUBLIC_SUPABASE_ANON_KEY,
     {
+      global: { fetch: supabaseFetch },
       cookies: {
         getAll() {
           return cookieStore.getAll()
@@ -27,10 +36,71 @@ export function createSupabaseServer() {
   )
 }
 
-// Service role client for admin operations (server-side only)
+// Service role client for admin operations (server-side only).
+// One client per process: it holds no user session, and reusing it lets fetch keep its
+// pooled keep-alive connections to Supabase instead of starting over on every call.
+let adminClient = null
+
+const adminStats = {
+  calls: 0,
+  clientsCreated: 0
+}
+
+// Requests and new TCP/TLS connections to the Supabase origin, from undici's diagnostics
+// channels (the HTTP client behind Node's fetch). They cover every client in the process (the
+// admin client, the per-request cookie client and any other createClient), so they show how
+// well the process as a whole reuses connections, not the admin client alone.
+const originStats = {
+  supabaseOriginRequests: 0,
+  supabaseOriginConnectionsOpened: 0
+}
+
+const supabaseOrigin = (() => {
+  try {
+    return new URL(process.env.NEXT_PUBLIC_SUPABASE_URL).origin
+  } catch {
+    return null
+  }
+})()
+
+diagnosticsChannel.subscribe('undici:request:create', ({ request }) => {
+  if (request?.origin === supabaseOrigin) originStats.supabaseOriginRequests++
+})
+diagnosticsChannel.subscribe('undici:client:connected', ({ connectParams }) => {
+  if (connectParams && `${connectParams.protocol}//${connectParams.host}` === supabaseOrigin) {
+    originStats.supabaseOriginConnectionsOpened++
+  }
+})
+
 export function createSupabaseAdmin() {
-  return createClient(
-    process.env.NEXT_PUBLIC_SUPABASE_URL,
-    process.env.SUPABASE_SERVICE_ROLE_KEY
-  )
-}
\ No newline at end of file
+  adminStats.calls++
+  if (!adminClient) {
+    adminStats.clientsCreated++
+    adminClient = createClient(
+      process.env.NEXT_PUBLIC_SUPABASE_URL,
+      process.env.SUPABASE_SERVICE_ROLE_KEY,
+      {
+        auth: {
+          persistSession: false,
+          autoRefreshToken: false,
+          detectSessionInUrl: false
+        },
+        global: { fetch: supabaseFetch }
+      }
+    )
+  }
+  return adminClient
+}
+
+// calls/clientsCreated are the admin client's; the supabaseOrigin* counters are process-wide
+export function getSupabaseConnectionStats() {
+  const { supabaseOriginRequests: requests, supabaseOriginConnectionsOpened: connections } = originStats
+  return {
+    ...adminStats,
+    ...originStats,
+    supabaseOriginRequestsPerConnection: connections ? requests / connections : requests,
+    supabaseOriginConnectionReuseRatio: requests ? Math.max(0, 1 - connections / requests) : 0
+  }
+}
+
+registerMetricsSource('supabase', getSupabaseConnectionStats)
@@ -0,0 +1,163 @@
+import { AsyncLocalStorage } from 'node:async_hooks'
+import { randomBytes } from 'node:crypto'
+import { appendFile } from 'node:fs/promises'
+import { registerMetricsSource } from './metrics.js'
+
+// Span-based request tracing. Every API request runs inside a trace whose id is returned as
+// X-Request-Id; Supabase and Evolution HTTP calls (and a few named steps) become child spans.
+// Spans are only recorded when an exporter is configured:
+//   TRACE_FILE=/path/spans.jsonl        one JSON span per line
+//   TRACE_COLLECTOR_URL=http://...      batches POSTed as { spans: [...] }
+const TRACE_FILE = process.env.TRACE_FILE || null
+const TRACE_COLLECTOR_URL = process.env.TRACE_COLLECTOR_URL || null
+const TRACE_FLUSH_MS = Number(process.env.TRACE_FLUSH_MS ?? 1000)
+const TRACE_BUFFER_MAX = Number(process.env.TRACE_BUFFER_MAX ?? 10000)
+const REQUEST_ID_PATTERN = /^[A-Za-z0-9._-]{8,64}$/
+
+// Captured before anything can wrap it, so exporting spans never creates spans
+const rawFetch = globalThis.fetch
+
+const storage = new AsyncLocalStorage()
+const buffer = []
+let flushTimer = null
+
+const stats = {
+  traces: 0,
+  spans: 0,
+  dropped: 0,
+  exported: 0,
+  exportErrors: 0
+}
+
+registerMetricsSource('tracing', () => ({
+  ...stats,
+  buffered: buffer.length,
+  exporting: tracingEnabled()
+}))
+
+export function tracingEnabled() {
+  return !!(TRACE_FILE || TRACE_COLLECTOR_URL)
+}
+
+function newId(bytes) {
+  return randomBytes(bytes).toString('hex')
+}
+
+function createSpan(traceId, parentId, name, attributes) {
+  return {
+    traceId,
+    spanId: newId(8),
+    parentId,
+    name,
+    startedAt: Date.now(),
+    start: performance.now(),
+    durationMs: 0,
+    attributes: { ...attributes },
+    error: null
+  }
+}
+
+function finishSpan(span) {
+  span.durationMs = performance.now() - span.start
+  if (!tracingEnabled()) return
+
+  stats.spans++
+  if (buffer.length >= TRACE_BUFFER_MAX) {
+    stats.dropped++
+    return
+  }
+  const { start, ...exported } = span
+  buffer.push(exported)
+  scheduleFlush()
+}
+
+async function runSpan(store, span, fn) {
+  try {
+    return await storage.run(store, () => fn(span))
+  } catch (error) {
+    span.error = error?.message || String(error)
+    throw error
+  } finally {
+    finishSpan(span)
+  }
+}
+
+export function currentRequestId() {
+  return storage.getStore()?.traceId || null
+}
+
+// Starts a new trace (ignoring any trace already active); an incoming id is reused when valid
+export function runWithTrace(name, attributes, fn, { traceId } = {}) {
+  const id = traceId && REQUEST_ID_PATTERN.test(traceId) ? traceId : newId(16)
+  const span = createSpan(id, null, name, attributes)
+  stats.traces++
+  return runSpan({ traceId: id, span }, span, fn)
+}
+
+// Background work (queue drains, inbox flushes) gets its own trace instead of inheriting
+// the request that happened to schedule it; `cause` links back to that request.
+export function traceBackground(name, attributes, fn) {
+  const cause = currentRequestId()
+  return runWithTrace(name, cause ? { ...attributes, cause } : attributes, fn)
+}
+
+// Child span of the active span; runs `fn` untraced when there is no active trace
+export function withSpan(name, attributes, fn) {
+  const store = storage.getStore()
+  if (!store || !tracingEnabled()) return fn(null)
+
+  const span = createSpan(store.traceId, store.span.spanId, name, attributes)
+  return runSpan({ traceId: store.traceId, span }, span, fn)
+}
+
+function describeRequest(input, init) {
+  const url = new URL(typeof input === 'string' ? input : input.url ?? String(input))
+  const method = (init?.method || input?.method || 'GET').toUpperCase()
+  return { url, method }
+}
+
+// fetch wrapper that records one span per outbound HTTP call; `describe(url, method)` names it
+export function tracedFetch(component, describe = url => url.pathname) {
+  return (input, init) => {
+    if (!storage.getStore() || !tracingEnabled()) return rawFetch(input, init)
+
+    const { url, method } = describeRequest(input, init)
+    return withSpan(`${component} ${method} ${describe(url, method)}`, { host: url.host }, async span => {
+      const response = await rawFetch(input, init)
+      if (span) span.attributes.status = response.status
+      return response
+    })
+  }
+}
+
+function scheduleFlush() {
+  if (flushTimer) return
+  flushTimer = setTimeout(() => {
+    flushTimer = null
+    flushSpans().catch(error => console.error('Trace export error:', error))
+  }, TRACE_FLUSH_MS)
+  flushTimer.unref?.()
+}
+
+export async function flushSpans() {
+  if (!buffer.length) return
+  const spans = buffer.splice(0, buffer.length)
+
+  try {
+    if (TRACE_FILE) {
+      await appendFile(TRACE_FILE, spans.map(span => JSON.stringify(span)).join('\n') + '\n')
+    }
+    if (TRACE_COLLECTOR_URL) {
+      const response = await rawFetch(TRACE_COLLECTOR_URL, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ spans })
+      })
+      if (!response.ok) throw new Error(`Collector responded ${response.status}`)
+    }
+    stats.exported += spans.length
+  } catch (error) {
+    stats.exportErrors++
+    throw error
+  }
+}
@@ -0,0 +1,183 @@
+import { appendFile } from 'node:fs/promises'
+import { registerMetricsSource } from './metrics.js'
+
+// Records the API request mix as compact JSONL for replay_benchmark.py, when
+// TRAFFIC_RECORD_FILE is set. One line per request:
+//   { t, u, m, p, q, b | x + c, s, ids }
+// t = ms since recording started, u = session alias ("u1", ...; the first line of a session
+// is { session, org }), m/p/q = method, path below /api and query, b = JSON body or x/c = raw
+// body + content type, s = status, ids = identifiers in the response (e.g. "event.id") that
+// later requests may refer to. Auth bodies and webhook secrets are never written; long-lived
+// streams are skipped. Bodies are read from a clone up to TRAFFIC_RECORD_BODY_MAX bytes and
+// streamed uploads (guest import) are not read at all, so recording never buffers a large
+// request; those entries carry `omitted` (the body size, when known) instead.
+const TRAFFIC_RECORD_FILE = process.env.TRAFFIC_RECORD_FILE || null
+const TRAFFIC_RECORD_BODY_MAX = Number(process.env.TRAFFIC_RECORD_BODY_MAX ?? 256 * 1024)
+const TRAFFIC_FLUSH_MS = Number(process.env.TRAFFIC_FLUSH_MS ?? 500)
+const UNRECORDED_ROUTES = new Set(['GET /metrics', 'GET /events/:id/rsvps/stream'])
+const UNCAPTURED_BODY_ROUTES = new Set(['POST /guests/import'])
+const REDACTED_QUERY = new Set(['secret', 'token'])
+const ID_KEYS = new Set(['id', 'rsvp_token'])
+
+const startedAt = Date.now()
+const sessions = new Map()
+const buffer = []
+let flushTimer = null
+
+const stats = {
+  recorded: 0,
+  skipped: 0,
+  bodiesOmitted: 0,
+  bytes: 0,
+  errors: 0
+}
+
+registerMetricsSource('trafficRecorder', () => ({ ...stats, enabled: trafficRecordingEnabled(), sessions: sessions.size }))
+
+export function trafficRecordingEnabled() {
+  return !!TRAFFIC_RECORD_FILE
+}
+
+// Reads at most `limit` bytes of the body and cancels the rest; resolves to { text } or
+// { omitted } with the number of bytes seen
+async function readLimited(stream, limit) {
+  const reader = stream.getReader()
+  const chunks = []
+  let size = 0
+
+  for (;;) {
+    const { value, done } = await reader.read()
+    if (done) break
+    size += value.byteLength
+    if (size > limit) {
+      // Cancelling one branch of a cloned body settles only once the handler's branch is done,
+      // so it is not awaited
+      reader.cancel().catch(() => {})
+      return { omitted: size }
+    }
+    chunks.push(value)
+  }
+  return { text: Buffer.concat(chunks).toString('utf8') }
+}
+
+// Must run before the handler consumes the body; resolves to { text }, { omitted } or null
+export function captureRequestBody(request, routeKey) {
+  if (!trafficRecordingEnabled() || request.method === 'GET' || request.method === 'HEAD') return null
+  if (!request.body || UNRECORDED_ROUTES.has(routeKey)) return null
+
+  const length = Number(request.headers.get('content-length'))
+  if (UNCAPTURED_BODY_ROUTES.has(routeKey) || length > TRAFFIC_RECORD_BODY_MAX) {
+    return Promise.resolve({ omitted: Number.isFinite(length) && length > 0 ? length : true })
+  }
+  return readLimited(request.clone().body, TRAFFIC_RECORD_BODY_MAX).catch(() => null)
+}
+
+function redactedQuery(searchParams) {
+  const query = new URLSearchParams(searchParams)
+  for (const key of REDACTED_QUERY) {
+    if (query.has(key)) query.set(key, '{redacted}')
+  }
+  return query.toString()
+}
+
+// "event.id" -> value for the id-like fields of the top two levels of a JSON response
+function collectIds(value, prefix = '', depth = 0, ids = {}) {
+  if (!value || typeof value !== 'object' || Array.isArray(value) || depth > 1) return ids
+  for (const [key, field] of Object.entries(value)) {
+    if (ID_KEYS.has(key) && typeof field === 'string') ids[`${prefix}${key}`] = field
+    else if (field && typeof field === 'object') collectIds(field, `${prefix}${key}.`, depth + 1, ids)
+  }
+  return ids
+}
+
+async function responseIds(response) {
+  if (!(response.headers.get('content-type') || '').includes('application/json')) return undefined
+  try {
+    const ids = collectIds(await response.clone().json())
+    return Object.keys(ids).length ? ids : undefined
+  } catch {
+    return undefined
+  }
+}
+
+async function sessionAlias(userId, resolveOrgId) {
+  if (!userId) return undefined
+  let alias = sessions.get(userId)
+  if (!alias) {
+    alias = `u${sessions.size + 1}`
+    sessions.set(userId, alias)
+    buffer.push({ session: alias, org: await resolveOrgId().catch(() => null) })
+  }
+  return alias
+}
+
+export async function recordTraffic({ request, route, routeKey, receivedAt, response, body, userId, resolveOrgId }) {
+  if (!trafficRecordingEnabled()) return
+  if (UNRECORDED_ROUTES.has(routeKey)) {
+    stats.skipped++
+    return
+  }
+
+  try {
+    const entry = {
+      t: receivedAt - startedAt,
+      u: await sessionAlias(userId, resolveOrgId),
+      m: request.method,
+      p: route
+    }
+    const query = redactedQuery(request.nextUrl.searchParams)
+    if (query) entry.q = query
+
+    const captured = body ? await body : null
+    const text = captured?.text
+    if (captured && route.startsWith('/auth/')) {
+      stats.bodiesOmitted++
+    } else if (captured?.omitted) {
+      entry.omitted = captured.omitted
+      stats.bodiesOmitted++
+    } else if (text) {
+      const contentType = request.headers.get('content-type') || ''
+      if (contentType.includes('application/json')) {
+        try {
+          entry.b = JSON.parse(text)
+        } catch {
+          entry.x = text
+          entry.c = contentType
+        }
+      } else {
+        entry.x = text
+        entry.c = contentType
+      }
+    }
+
+    entry.s = response.status
+    entry.ids = await responseIds(response)
+    buffer.push(entry)
+    stats.recorded++
+    scheduleFlush()
+  } catch (error) {
+    stats.errors++
+    console.error('Traffic recording error:', error)
+  }
+}
+
+function scheduleFlush() {
+  if (flushTimer) return
+  flushTimer = setTimeout(() => {
+    flushTimer = null
+    flushTraffic().catch(error => console.error('Traffic recording flush error:', error))
+  }, TRAFFIC_FLUSH_MS)
+  flushTimer.unref?.()
+}
+
+export async function flushTraffic() {
+  if (!buffer.length) return
+  const text = buffer.splice(0, buffer.length).map(entry => JSON.stringify(entry)).join('\n') + '\n'
+  try {
+    await appendFile(TRAFFIC_RECORD_FILE, text)
+    stats.bytes += Buffer.byteLength(text)
+  } catch (error) {
+    stats.errors++
+    throw error
+  }
+}
@@ -0,0 +1,165 @@
+// Streaming guest import helpers (CSV / JSONL)
+
+const HEADER_ALIASES = {
+  name: 'name',
+  nome: 'name',
+  phone: 'phone_e164',
+  phone_e164: 'phone_e164',
+  phonee164: 'phone_e164',
+  telefone: 'phone_e164',
+  whatsapp: 'phone_e164',
+  email: 'email',
+  'e-mail': 'email',
+  tag: 'tag',
+  grupo: 'tag'
+}
+
+export function detectImportFormat(contentType, formatParam) {
+  const hint = String(formatParam || contentType || '').toLowerCase()
+  if (hint.includes('csv')) return 'csv'
+  if (hint.includes('jsonl') || hint.includes('ndjson') || hint.includes('json')) return 'jsonl'
+  return null
+}
+
+// Yields text lines from a ReadableStream<Uint8Array> without buffering the whole body
+export async function* readLines(stream) {
+  const reader = stream.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+
+  try {
+    while (true) {
+      const { value, done } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+
+      let newline
+      while ((newline = buffer.indexOf('\n')) !== -1) {
+        yield buffer.slice(0, newline).replace(/\r$/, '')
+        buffer = buffer.slice(newline + 1)
+      }
+    }
+    buffer += decoder.decode()
+    if (buffer) yield buffer.replace(/\r$/, '')
+  } finally {
+    reader.releaseLock()
+  }
+}
+
+// Splits one CSV record; returns null while a quoted field is still open
+function splitCsvRecord(record, delimiter) {
+  const fields = []
+  let field = ''
+  let quoted = false
+
+  for (let i = 0; i < record.length; i++) {
+    const ch = record[i]
+    if (quoted) {
+      if (ch === '"' && record[i + 1] === '"') {
+        field += '"'
+        i++
+      } else if (ch === '"') {
+        quoted = false
+      } else {
+        field += ch
+      }
+    } else if (ch === '"') {
+      quoted = true
+    } else if (ch === delimiter) {
+      fields.push(field)
+      field = ''
+    } else {
+      field += ch
+    }
+  }
+
+  if (quoted) return null
+  fields.push(field)
+  return fields
+}
+
+export function normalizeGuestRow(raw) {
+  const pick = (key) => {
+    const value = raw?.[key]
+    return value === undefined || value === null ? '' : String(value).trim()
+  }
+
+  const name = pick('name')
+  if (!name) return { error: 'Name is required' }
+
+  const phone = pick('phone_e164').replace(/[^\d+]/g, '')
+  return {
+    guest: {
+      name,
+      phone_e164: phone || null,
+      email: pick('email') || null,
+      tag: pick('tag') || null
+    }
+  }
+}
+
+// Yields { row, guest } or { row, error } for every data row in the stream
+export async function* parseGuestRows(stream, format) {
+  let row = 0
+
+  if (format === 'jsonl') {
+    for await (const line of readLines(stream)) {
+      if (!line.trim()) continue
+      row++
+      let raw
+      try {
+        raw = JSON.parse(line)
+      } catch {
+        yield { row, error: 'Invalid JSON' }
+        continue
+      }
+      const mapped = {}
+      for (const [key, value] of Object.entries(raw || {})) {
+        const column = HEADER_ALIASES[key.toLowerCase()]
+        if (column) mapped[column] = value
+      }
+      yield { row, ...normalizeGuestRow(mapped) }
+    }
+    return
+  }
+
+  let columns = null
+  let delimiter = ','
+  let pending = ''
+
+  for await (const line of readLines(stream)) {
+    const record = pending ? `${pending}\n${line}` : line
+    if (!columns) {
+      if (!record.trim()) continue
+      delimiter = record.split(';').length > record.split(',').length ? ';' : ','
+    }
+
+    const fields = splitCsvRecord(record, delimiter)
+    if (fields === null) {
+      pending = record
+      continue
+    }
+    pending = ''
+
+    if (!columns) {
+      columns = fields.map(f => HEADER_ALIASES[f.trim().toLowerCase()] || null)
+      if (!columns.includes('name')) {
+        throw new Error('CSV header must include a name column')
+      }
+      continue
+    }
+
+    if (!record.trim()) continue
+    row++
+    const raw = {}
+    columns.forEach((column, i) => {
+      if (column) raw[column] = fields[i]
+    })
+    yield { row, ...normalizeGuestRow(raw) }
+  }
+
+  if (pending) {
+    row++
+    yield { row, error: 'Unterminated quoted field' }
+  }
+}
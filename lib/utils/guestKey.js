@@ -0,0 +1,24 @@
+// Normalized guest names (guests.name_key): accents folded, lower case, anything other than
+// letters and digits (of any script) collapsed to one space. Used for de-duplicating confirms
+// and for the check-in prefix search. Must match public.guest_name_key() in
+// supabase/migrations/20261018170000_guest_name_key.sql (tests/guestKey.test.mjs).
+
+const ACCENTED = 'ÁÀÂÃÄÅáàâãäåÉÈÊËéèêëÍÌÎÏíìîïÓÒÔÕÖóòôõöÚÙÛÜúùûüÇçÑñÝýÿ'
+const PLAIN = 'AAAAAAaaaaaaEEEEeeeeIIIIiiiiOOOOOoooooUUUUuuuuCcNnYyy'
+const FOLD = new Map([...ACCENTED].map((ch, i) => [ch, PLAIN[i]]))
+
+export function guestNameKey(name) {
+  const folded = [...String(name ?? '')].map(ch => FOLD.get(ch) ?? ch).join('')
+  return folded.toLowerCase().replace(/[^\p{L}\p{N}]+/gu, ' ').trim() || null
+}
+
+// Distinct names by key, first spelling wins; blank names are dropped
+export function uniqueGuestNames(names) {
+  const seen = new Map()
+  for (const raw of names) {
+    const name = String(raw ?? '').trim()
+    const key = guestNameKey(name)
+    if (key && !seen.has(key)) seen.set(key, name)
+  }
+  return [...seen].map(([key, name]) => ({ key, name }))
+}
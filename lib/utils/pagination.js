@@ -0,0 +1,77 @@
+// Cursor pagination and field projection helpers for list endpoints
+
+export const DEFAULT_PAGE_SIZE = 50
+export const MAX_PAGE_SIZE = 200
+
+// Returns null when the caller did not ask for pagination (legacy "return everything" mode)
+export function parseLimit(searchParams) {
+  const raw = searchParams.get('limit')
+  if (raw === null && !searchParams.get('cursor')) return null
+  const n = Number.parseInt(raw ?? DEFAULT_PAGE_SIZE, 10)
+  if (!Number.isFinite(n) || n <= 0) return DEFAULT_PAGE_SIZE
+  return Math.min(n, MAX_PAGE_SIZE)
+}
+
+// Opaque cursor: base64url(JSON) of the last row's sort key
+export function encodeCursor(values) {
+  return Buffer.from(JSON.stringify(values)).toString('base64url')
+}
+
+const UUID_RE = /^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$/i
+
+export function isUuid(value) {
+  return typeof value === 'string' && UUID_RE.test(value)
+}
+
+// Cursor values end up inside PostgREST filter strings, so each one must match its kind
+const CURSOR_CHECKS = {
+  timestamp: value => typeof value === 'string' &&
+    /^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d{1,6})?(Z|[+-]\d{2}:?\d{2})?$/.test(value) &&
+    !Number.isNaN(Date.parse(value)),
+  uuid: isUuid
+}
+
+export class InvalidCursorError extends Error {
+  constructor() {
+    super('Invalid cursor')
+    this.name = 'InvalidCursorError'
+  }
+}
+
+// `kinds` describes the sort key, e.g. ['timestamp', 'uuid']. Returns null without a cursor
+// and throws InvalidCursorError (answered with 400) for anything that does not match.
+export function decodeCursor(cursor, kinds) {
+  if (!cursor) return null
+  let values
+  try {
+    values = JSON.parse(Buffer.from(cursor, 'base64url').toString('utf8'))
+  } catch {
+    throw new InvalidCursorError()
+  }
+  const valid = Array.isArray(values) &&
+    values.length === kinds.length &&
+    kinds.every((kind, i) => CURSOR_CHECKS[kind](values[i]))
+  if (!valid) throw new InvalidCursorError()
+  return values
+}
+
+// Intersects ?fields=a,b,c with an allow-list; `required` columns are always kept
+export function parseFields(searchParams, allowed, required = []) {
+  const raw = searchParams.get('fields')
+  if (!raw) return null
+  const requested = raw.split(',').map(f => f.trim()).filter(f => allowed.includes(f))
+  return [...new Set([...required, ...requested])]
+}
+
+export function wantsCounts(searchParams) {
+  return ['1', 'true', 'yes'].includes(String(searchParams.get('counts') || '').toLowerCase())
+}
+
+// Slices the extra look-ahead row off a page and computes the next cursor
+export function pageResult(rows, limit, cursorValues) {
+  if (limit === null || rows.length <= limit) {
+    return { items: rows, nextCursor: null }
+  }
+  const items = rows.slice(0, limit)
+  return { items, nextCursor: encodeCursor(cursorValues(items[items.length - 1])) }
+}
@@ -0,0 +1,104 @@
+// Parsing of inbound WhatsApp RSVP replies: what the guest answered and which guest phones
+// the sender JID may correspond to
+
+export const MAX_COMPANIONS = 20
+
+// Lowercase without accents; punctuation is kept for the bare "não" check
+function foldText(text) {
+  return String(text || '')
+    .normalize('NFD')
+    .replace(/[\u0300-\u036f]/g, '')
+    .toLowerCase()
+    .trim()
+}
+
+function normalizeText(folded) {
+  return folded
+    .replace(/[!?.,;:]+/g, ' ')
+    .replace(/\s+/g, ' ')
+    .trim()
+}
+
+// Replies that leave the answer open are not classified, whatever else they say
+const HEDGE_PATTERNS = [
+  /\bnao sei\b/,
+  /\bnao tenho certeza\b/,
+  /\btalvez\b/,
+  /\bvou ver\b/,
+  /\bvou tentar\b/,
+  /\b(te|lhe|vos) aviso\b/,
+  /\baviso depois\b/
+]
+// A bare "não" is the whole reply or is followed by punctuation or an emoji; "no" is also
+// Portuguese for "on the" ("No sábado estarei lá")
+const BARE_DECLINE = /^(nao|n|no|nope)(?:$|\s*[!.,;:…]|\s*\p{Extended_Pictographic})/u
+const DECLINE_PATTERNS = [
+  /\bnao (vou|irei|poderei|posso|consigo|vamos|iremos)\b/,
+  /\binfelizmente\b/,
+  /\bcan'?t\b|\bwon'?t\b/,
+  /👎/
+]
+const CONFIRM_PATTERNS = [
+  /^(sim|s|yes|y|confirmo|confirmado|confirmada|vou|irei|estarei|iremos|vamos|ok|okay|claro|presente)\b/,
+  /\bcom certeza\b/,
+  /\b(vou|vamos|irei|iremos|estarei|estaremos) sim\b/,
+  /\b(estarei|estaremos) (la|presente|presentes)\b/,
+  /\bconfirm/,
+  /👍|✅/
+]
+
+// Number of companions: "2", "+2", "vou +2", "mais 2", "vou com 3"
+const COMPANION_PATTERNS = [
+  /^\+?(\d{1,2})$/,
+  /(?:^|\s)(?:com|mais|\+)\s*(\d{1,2})\b/
+]
+// Size of the whole party, the guest included: "somos 4 (comigo)", "vamos em 3"
+const PARTY_PATTERN = /\b(?:somos|seremos|vamos em|iremos em)\s+(\d{1,2})\b/
+
+function companionCount(normalized) {
+  const party = normalized.match(PARTY_PATTERN)
+  if (party) return Math.max(Number(party[1]) - 1, 0)
+
+  for (const re of COMPANION_PATTERNS) {
+    const count = normalized.match(re)
+    if (count) return Number(count[1])
+  }
+  return undefined
+}
+
+// Classifies a guest reply: { status: 'confirmed' | 'declined', companions? } or null
+export function classifyReply(text) {
+  const folded = foldText(text)
+  const normalized = normalizeText(folded)
+  if (!normalized) return null
+  if (HEDGE_PATTERNS.some(re => re.test(normalized))) return null
+
+  const declines = BARE_DECLINE.test(folded) || DECLINE_PATTERNS.some(re => re.test(normalized))
+  const confirms = CONFIRM_PATTERNS.some(re => re.test(normalized))
+  // A reply that reads both ways is left for the host
+  if (declines && confirms) return null
+  if (declines) return { status: 'declined' }
+
+  const companions = companionCount(normalized)
+  if (companions !== undefined) {
+    return { status: 'confirmed', companions: Math.min(companions, MAX_COMPANIONS) }
+  }
+
+  if (confirms) return { status: 'confirmed' }
+
+  return null
+}
+
+// WhatsApp JIDs for Brazilian mobiles may drop the 9th digit; try both forms
+export function phoneCandidates(remoteJid) {
+  const digits = String(remoteJid || '').split('@')[0].replace(/\D/g, '')
+  if (!digits) return []
+
+  const candidates = [`+${digits}`]
+  if (digits.startsWith('55') && digits.length === 12) {
+    candidates.push(`+${digits.slice(0, 4)}9${digits.slice(4)}`)
+  } else if (digits.startsWith('55') && digits.length === 13 && digits[4] === '9') {
+    candidates.push(`+${digits.slice(0, 4)}${digits.slice(5)}`)
+  }
+  return candidates
+}
@@ -1,31 +1,73 @@
+import { TTLCache } from '../cache.js'
+
 // Template variable replacement utilities
-export function renderTemplate(template, variables) {
-  let rendered = template
-  
-  // Replace template variables like {{variable_name}}
-  Object.entries(variables).forEach(([key, value]) => {
-    const regex = new RegExp(`{{\\s*${key}\\s*}}`, 'g')
-    rendered = rendered.replace(regex, value || '')
-  })
-  
+// Templates are parsed once into literal/variable parts and rendered with a single pass,
+// instead of building one RegExp per variable on every call.
+const PLACEHOLDER = /{{\s*([^}]+?)\s*}}/g
+
+// Compiled message_templates rows, keyed by id + updated_at so edits get recompiled
+const compiledTemplates = new TTLCache({
+  max: Number(process.env.TEMPLATE_CACHE_MAX ?? 500),
+  ttlMs: Number(process.env.TEMPLATE_CACHE_TTL_MS ?? 60 * 60 * 1000)
+})
+
+export function compileTemplate(template) {
+  const text = String(template ?? '')
+  const parts = []
+  let last = 0
+
+  for (const match of text.matchAll(PLACEHOLDER)) {
+    if (match.index > last) parts.push(text.slice(last, match.index))
+    parts.push({ name: match[1].trim(), raw: match[0] })
+    last = match.index + match[0].length
+  }
+  if (last < text.length) parts.push(text.slice(last))
+
+  return parts
+}
+
+// Unknown placeholders are left untouched, like the original per-variable replace
+export function renderCompiled(compiled, variables) {
+  let rendered = ''
+  for (const part of compiled) {
+    if (typeof part === 'string') {
+      rendered += part
+    } else if (Object.prototype.hasOwnProperty.call(variables, part.name)) {
+      rendered += variables[part.name] || ''
+    } else {
+      rendered += part.raw
+    }
+  }
   return rendered
 }
 
-export function getTemplateVariables(template) {
-  const regex = /{{\\s*([^}]+)\\s*}}/g
-  const variables = []
-  let match
-  
-  while ((match = regex.exec(template)) !== null) {
-    variables.push(match[1].trim())
+export function getCompiledTemplate(template) {
+  const version = template.updated_at ?? template.created_at ?? ''
+  const key = `${template.id}:${version}:${template.body_text?.length ?? 0}`
+
+  let compiled = compiledTemplates.get(key)
+  if (!compiled) {
+    compiled = compiledTemplates.set(key, compileTemplate(template.body_text))
   }
-  
+  return compiled
+}
+
+export function renderTemplate(template, variables) {
+  return renderCompiled(compileTemplate(template), variables)
+}
+
+export function getTemplateVariables(template) {
+  const variables = compileTemplate(template)
+    .filter(part => typeof part !== 'string')
+    .map(part => part.name)
+
   return [...new Set(variables)] // Remove duplicates
 }
 
-export function getEventVariables(event, guest = null) {
+// Variables that are the same for every guest of an event; compute once per send
+export function getEventLevelVariables(event) {
   const baseUrl = process.env.NEXT_PUBLIC_BASE_URL || ''; // defina no .env, ex: https://app.seudominio.com
-  const variables = {
+  return {
     event_title: event.title,
     event_description: event.description || '',
     location: event.location || '',
@@ -35,12 +77,22 @@ export function getEventVariables(event, guest = null) {
       ? `${baseUrl}/public/rsvp/${event.rsvp_token}`
       : ''
   };
+}
+
+export function getGuestVariables(guest) {
+  return {
+    name: guest.name,
+    email: guest.email || '',
+    phone: guest.phone_e164 || '',
+    tag: guest.tag || ''
+  };
+}
+
+export function getEventVariables(event, guest = null) {
+  const variables = getEventLevelVariables(event);
 
   if (guest) {
-    variables.name = guest.name;
-    variables.email = guest.email || '';
-    variables.phone = guest.phone_e164 || '';
-    variables.tag = guest.tag || '';
+    Object.assign(variables, getGuestVariables(guest));
   }
 
   return variables;
@@ -0,0 +1,317 @@
+import { createHash } from 'node:crypto'
+import { createSupabaseAdmin } from './supabase/server.js'
+import { TTLCache, invalidateOrg } from './cache.js'
+import { enqueueInboundMessages } from './inboundRsvp.js'
+import { registerMetricsSource } from './metrics.js'
+import { traceBackground } from './tracing.js'
+
+// Evolution webhook inbox: every delivery gets a stable key and is written to webhook_inbox
+// before the webhook is acknowledged; retries are dropped (in memory for recent keys, durably
+// through the primary key). Bursts of connection.update are coalesced to the newest state per
+// org and the pending set is applied in batches, after which rows get processed_at. Rows left
+// unprocessed by a crash or restart are picked up again by a recovery pass (on first use and
+// every WEBHOOK_INBOX_RECOVER_MS), which also deletes processed rows older than
+// WEBHOOK_INBOX_RETENTION_MS.
+const INBOX_FLUSH_MS = Number(process.env.WEBHOOK_INBOX_FLUSH_MS ?? 100)
+const INBOX_BATCH_SIZE = Number(process.env.WEBHOOK_INBOX_BATCH_SIZE ?? 500)
+const INBOX_RECOVER_MS = Number(process.env.WEBHOOK_INBOX_RECOVER_MS ?? 60 * 1000)
+const INBOX_RETENTION_MS = Number(process.env.WEBHOOK_INBOX_RETENTION_MS ?? 7 * 24 * 60 * 60 * 1000)
+
+const recentDeliveries = new TTLCache({
+  max: Number(process.env.WEBHOOK_DEDUPE_MAX ?? 50000),
+  ttlMs: Number(process.env.WEBHOOK_DEDUPE_TTL_MS ?? 10 * 60 * 1000)
+})
+
+// org id -> event time of the connection.update last written to evolution_instances
+const appliedConnectionAt = new TTLCache({ max: 10000, ttlMs: 24 * 60 * 60 * 1000 })
+
+const pendingDeliveries = []
+const pendingConnections = new Map()
+// Ids written or recovered by this process and not yet marked processed
+const queuedIds = new Set()
+let flushing = false
+let flushTimer = null
+let recoverTimer = null
+
+const stats = {
+  received: 0,
+  duplicates: 0,
+  durableDuplicates: 0,
+  coalesced: 0,
+  stale: 0,
+  batches: 0,
+  inboxWrites: 0,
+  instanceUpdates: 0,
+  messagesForwarded: 0,
+  recovered: 0,
+  expired: 0,
+  errors: 0
+}
+
+registerMetricsSource('webhookInbox', () => ({
+  ...stats,
+  pending: pendingDeliveries.length,
+  pendingConnections: pendingConnections.size
+}))
+
+function eventTime(body) {
+  const parsed = Date.parse(body.date_time || body.data?.date_time || '')
+  return Number.isFinite(parsed) ? parsed : Date.now()
+}
+
+function digest(value) {
+  return createHash('sha1').update(JSON.stringify(value ?? null)).digest('hex')
+}
+
+function messageList(data) {
+  return Array.isArray(data) ? data : Array.isArray(data?.messages) ? data.messages : [data]
+}
+
+// One inbox entry per logical delivery: each message of a messages.upsert, or the whole event.
+// A connection.update without date_time is keyed by its arrival, so a state that repeats
+// (open, close, open) is not taken for a retry.
+function splitDelivery(orgId, body, receivedAt) {
+  const at = eventTime(body)
+
+  if (body.event === 'messages.upsert') {
+    return messageList(body.data).map(message => ({
+      id: `${orgId}:message:${message?.key?.id || digest(message)}`,
+      orgId,
+      event: body.event,
+      at,
+      payload: message
+    }))
+  }
+
+  let key = digest(body)
+  if (body.event === 'connection.update') {
+    key = body.date_time
+      ? `${body.date_time}:${body.data?.state || ''}:${body.data?.qrcode?.base64 ? digest(body.data.qrcode.base64) : ''}`
+      : `received:${receivedAt}:${key}`
+  }
+
+  return [{ id: `${orgId}:${body.event}:${key}`, orgId, event: body.event, at, payload: body.data ?? null }]
+}
+
+function scheduleFlush() {
+  if (flushTimer) return
+  flushTimer = setTimeout(() => {
+    flushTimer = null
+    traceBackground('webhookInbox.flush', { pending: pendingDeliveries.length }, flush)
+      .catch(error => console.error('Webhook inbox flush error:', error))
+  }, INBOX_FLUSH_MS)
+  flushTimer.unref?.()
+}
+
+// Called by the webhook route: the new deliveries are in webhook_inbox when this resolves, so
+// the route acknowledges only what is stored. Throws when the inbox write fails, letting
+// Evolution retry the delivery.
+export async function acceptWebhook(orgId, body) {
+  startRecovery()
+
+  const fresh = []
+  let duplicates = 0
+
+  for (const delivery of splitDelivery(orgId, body, Date.now())) {
+    stats.received++
+    if (recentDeliveries.get(delivery.id)) {
+      stats.duplicates++
+      duplicates++
+      continue
+    }
+    fresh.push(delivery)
+  }
+
+  const inserted = fresh.length ? await persistDeliveries(createSupabaseAdmin(), fresh) : []
+  duplicates += fresh.length - inserted.length
+
+  for (const delivery of fresh) recentDeliveries.set(delivery.id, true)
+  queueDeliveries(inserted)
+  return { accepted: inserted.length, duplicates }
+}
+
+// Rows not returned by the insert were already in the inbox (a retry seen by another process
+// or before a restart)
+async function persistDeliveries(supabase, deliveries) {
+  const { data, error } = await supabase
+    .from('webhook_inbox')
+    .upsert(deliveries.map(delivery => ({
+      id: delivery.id,
+      org_id: delivery.orgId,
+      event: delivery.event,
+      event_at: new Date(delivery.at).toISOString(),
+      payload: delivery.payload
+    })), { onConflict: 'id', ignoreDuplicates: true })
+    .select('id')
+
+  stats.inboxWrites++
+  if (error) {
+    stats.errors++
+    throw new Error(`Webhook inbox write failed: ${error.message}`)
+  }
+
+  const inserted = new Set((data || []).map(row => row.id))
+  stats.durableDuplicates += deliveries.length - inserted.size
+  return deliveries.filter(delivery => inserted.has(delivery.id))
+}
+
+function queueDeliveries(deliveries) {
+  for (const delivery of deliveries) {
+    if (queuedIds.has(delivery.id)) continue
+    queuedIds.add(delivery.id)
+    pendingDeliveries.push(delivery)
+  }
+  if (pendingDeliveries.length) scheduleFlush()
+}
+
+// Unprocessed rows older than one recovery interval were left behind by a process that stopped
+// (or failed to apply them); the interval keeps rows another process just accepted out of it.
+// Applying a delivery twice is harmless: RSVP updates set absolute values and connection
+// updates older than the last applied one are skipped.
+async function recoverUnprocessed(supabase) {
+  const { data, error } = await supabase
+    .from('webhook_inbox')
+    .select('id, org_id, event, event_at, payload')
+    .is('processed_at', null)
+    .lt('received_at', new Date(Date.now() - INBOX_RECOVER_MS).toISOString())
+    .order('received_at', { ascending: true })
+    .limit(INBOX_BATCH_SIZE)
+
+  if (error) {
+    stats.errors++
+    console.error('Webhook inbox recovery error:', error)
+    return
+  }
+
+  const rows = (data || []).filter(row => !queuedIds.has(row.id))
+  stats.recovered += rows.length
+  queueDeliveries(rows.map(row => ({
+    id: row.id,
+    orgId: row.org_id,
+    event: row.event,
+    at: Date.parse(row.event_at),
+    payload: row.payload
+  })))
+}
+
+async function expireProcessed(supabase) {
+  const { data, error } = await supabase
+    .from('webhook_inbox')
+    .delete()
+    .not('processed_at', 'is', null)
+    .lt('received_at', new Date(Date.now() - INBOX_RETENTION_MS).toISOString())
+    .select('id')
+
+  if (error) {
+    stats.errors++
+    console.error('Webhook inbox cleanup error:', error)
+    return
+  }
+  stats.expired += data?.length || 0
+}
+
+function startRecovery() {
+  if (recoverTimer) return
+  const run = () => traceBackground('webhookInbox.recover', {}, async () => {
+    const supabase = createSupabaseAdmin()
+    await recoverUnprocessed(supabase)
+    await expireProcessed(supabase)
+  }).catch(error => console.error('Webhook inbox recovery error:', error))
+
+  recoverTimer = setInterval(run, INBOX_RECOVER_MS)
+  recoverTimer.unref?.()
+  run()
+}
+
+function collectConnection(delivery) {
+  const previous = pendingConnections.get(delivery.orgId)
+  const applied = appliedConnectionAt.get(delivery.orgId)
+
+  if ((applied !== undefined && applied > delivery.at) || (previous && previous.at > delivery.at)) {
+    stats.stale++
+    return
+  }
+  if (previous) stats.coalesced++
+  pendingConnections.set(delivery.orgId, delivery)
+}
+
+// Returns the orgs whose instance could not be updated
+async function applyConnections(supabase) {
+  const latest = [...pendingConnections.values()]
+  pendingConnections.clear()
+  const failedOrgs = new Set()
+
+  await Promise.all(latest.map(async delivery => {
+    const { error } = await supabase
+      .from('evolution_instances')
+      .update({
+        status: delivery.payload?.state,
+        qr_code: delivery.payload?.qrcode?.base64,
+        updated_at: new Date().toISOString()
+      })
+      .eq('org_id', delivery.orgId)
+
+    stats.instanceUpdates++
+    if (error) {
+      stats.errors++
+      console.error('Instance status update error:', error)
+      failedOrgs.add(delivery.orgId)
+      return
+    }
+    appliedConnectionAt.set(delivery.orgId, delivery.at)
+    invalidateOrg(delivery.orgId)
+  }))
+  return failedOrgs
+}
+
+async function markProcessed(supabase, deliveries) {
+  if (!deliveries.length) return
+  const { error } = await supabase
+    .from('webhook_inbox')
+    .update({ processed_at: new Date().toISOString() })
+    .in('id', deliveries.map(delivery => delivery.id))
+
+  stats.inboxWrites++
+  if (error) console.error('Webhook inbox update error:', error)
+}
+
+async function flush() {
+  if (flushing) return
+  flushing = true
+  const supabase = createSupabaseAdmin()
+
+  try {
+    while (pendingDeliveries.length) {
+      const batch = pendingDeliveries.splice(0, INBOX_BATCH_SIZE)
+      stats.batches++
+
+      const messagesByOrg = new Map()
+
+      for (const delivery of batch) {
+        if (delivery.event === 'connection.update') {
+          collectConnection(delivery)
+        } else if (delivery.event === 'messages.upsert') {
+          if (!messagesByOrg.has(delivery.orgId)) messagesByOrg.set(delivery.orgId, [])
+          messagesByOrg.get(delivery.orgId).push(delivery.payload)
+        }
+      }
+
+      const applied = [...messagesByOrg].map(([orgId, messages]) => {
+        stats.messagesForwarded += messages.length
+        return enqueueInboundMessages(orgId, messages).applied.then(ok => ok || orgId)
+      })
+
+      // Deliveries of an org whose updates failed stay unprocessed for the recovery pass
+      const failedOrgs = await applyConnections(supabase)
+      for (const result of await Promise.all(applied)) {
+        if (result !== true) failedOrgs.add(result)
+      }
+
+      await markProcessed(supabase, batch.filter(delivery => !failedOrgs.has(delivery.orgId)))
+      for (const delivery of batch) queuedIds.delete(delivery.id)
+    }
+  } finally {
+    flushing = false
+    if (pendingDeliveries.length) scheduleFlush()
+  }
+}
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Record/replay benchmark for the event management API
+Replays a request mix recorded by the server (TRAFFIC_RECORD_FILE, see lib/trafficRecorder.js)
+at a chosen speed, remapping the ids created during the replay, and compares p95 latency and
+throughput against a stored baseline so performance regressions fail the run.
+
+Record, e.g. while running backend_test.py or real clients:
+    TRAFFIC_RECORD_FILE=/tmp/traffic.jsonl yarn dev
+Replay against a local server (ideally backed by the Supabase/Evolution stand-ins):
+    python replay_benchmark.py /tmp/traffic.jsonl --speed 10 --save-baseline baseline.json
+    python replay_benchmark.py /tmp/traffic.jsonl --speed 10 --baseline baseline.json --max-regression 0.15
+"""
+
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from backend_test import (
+    DEFAULT_BASE_URL,
+    DEFAULT_WEBHOOK_SECRET,
+    InstrumentedSession,
+    LatencyRecorder,
+    register_and_login,
+    route_template,
+)
+
+UUID_RE = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', re.IGNORECASE)
+
+# Sessions are recreated for the replay, so the recorded auth calls are not sent again
+SKIPPED_PATHS = ('/auth/register', '/auth/login', '/auth/logout')
+
+# Routes with fewer samples than this are reported but not gated
+MIN_GATED_SAMPLES = 20
+
+
+class TrafficTrace:
+    """A recorded JSONL trace: session lines ({session, org}) and request lines in time order"""
+
+    def __init__(self, path):
+        self.path = path
+        self.sessions = {}
+        self.records = []
+        with open(path, encoding='utf-8') as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                if 'session' in entry:
+                    self.sessions[entry['session']] = entry.get('org')
+                elif entry.get('p') not in SKIPPED_PATHS and 'omitted' not in entry:
+                    self.records.append(entry)
+        self.records.sort(key=lambda entry: entry['t'])
+
+        # Recorded id -> index of the request whose response produced it
+        self.producers = {}
+        for index, entry in enumerate(self.records):
+            for value in (entry.get('ids') or {}).values():
+                self.producers.setdefault(value, index)
+
+    def duration(self):
+        return (self.records[-1]['t'] - self.records[0]['t']) / 1000.0 if self.records else 0.0
+
+    def dependencies(self, index):
+        """Earlier requests whose response ids this request refers to"""
+        entry = self.records[index]
+        text = json.dumps([entry.get('p'), entry.get('q'), entry.get('b'), entry.get('x')])
+        return {self.producers[value] for value in UUID_RE.findall(text)
+                if self.producers.get(value, index) < index}
+
+
+class IdMap:
+    """Recorded id -> id created by the replay, applied to paths, queries and bodies"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.mapping = {}
+
+    def add(self, recorded, replayed):
+        if recorded and replayed and recorded != replayed:
+            with self.lock:
+                self.mapping[recorded] = replayed
+
+    def apply(self, text):
+        if not text:
+            return text
+        with self.lock:
+            mapping = dict(self.mapping)
+        return UUID_RE.sub(lambda match: mapping.get(match.group(0), match.group(0)), text)
+
+
+def response_ids(body, prefix=''):
+    """Same "event.id" -> value extraction as lib/trafficRecorder.js (top two levels)"""
+    ids = {}
+    if not isinstance(body, dict) or prefix.count('.') > 1:
+        return ids
+    for key, value in body.items():
+        if key in ('id', 'rsvp_token') and isinstance(value, str):
+            ids[f"{prefix}{key}"] = value
+        elif isinstance(value, dict):
+            ids.update(response_ids(value, f"{prefix}{key}."))
+    return ids
+
+
+class TrafficReplayer:
+    """Replays a TrafficTrace at `speed`x (0 = as fast as the workers allow)"""
+
+    def __init__(self, trace, base_url=DEFAULT_BASE_URL, speed=1.0, concurrency=32,
+                 webhook_secret=DEFAULT_WEBHOOK_SECRET, dependency_timeout=30.0):
+        self.trace = trace
+        self.base_url = base_url.rstrip('/')
+        self.speed = float(speed)
+        self.concurrency = max(1, int(concurrency))
+        self.webhook_secret = webhook_secret
+        self.dependency_timeout = float(dependency_timeout)
+        self.recorder = LatencyRecorder()
+        self.ids = IdMap()
+        self.sessions = {}
+        self.public_session = InstrumentedSession(self.recorder, self.base_url)
+        self.done = [threading.Event() for _ in trace.records]
+        self.lock = threading.Lock()
+        self.status_mismatches = {}
+        self.transport_errors = 0
+        self.schedule_lag_max = 0.0
+
+    def setup_sessions(self):
+        """One fresh user + org per recorded session; the recorded org ids are remapped"""
+        for alias, recorded_org in sorted(self.trace.sessions.items()):
+            session = InstrumentedSession(LatencyRecorder(), self.base_url)
+            if not register_and_login(session, self.base_url, f"Replay {alias}"):
+                return False
+            response = session.get(f"{self.base_url}/me")
+            if response.status_code == 200:
+                self.ids.add(recorded_org, (response.json().get('organization') or {}).get('id'))
+            session.recorder = self.recorder
+            self.sessions[alias] = session
+        return True
+
+    def _prepare(self, entry):
+        path = self.ids.apply(entry['p'])
+        query = self.ids.apply(entry.get('q') or '')
+        query = query.replace('secret=%7Bredacted%7D', f"secret={self.webhook_secret}")
+        url = f"{self.base_url}{path}" + (f"?{query}" if query else '')
+
+        kwargs = {'timeout': 300}
+        if 'b' in entry:
+            kwargs['data'] = self.ids.apply(json.dumps(entry['b'])).encode('utf-8')
+        elif 'x' in entry:
+            kwargs['data'] = self.ids.apply(entry['x']).encode('utf-8')
+            kwargs['headers'] = {'Content-Type': entry.get('c') or 'text/plain'}
+        return url, kwargs
+
+    def _send(self, index):
+        entry = self.trace.records[index]
+        try:
+            for dependency in self.trace.dependencies(index):
+                self.done[dependency].wait(self.dependency_timeout)
+
+            session = self.sessions.get(entry.get('u'), self.public_session)
+            url, kwargs = self._prepare(entry)
+            try:
+                response = session.request(entry['m'], url, **kwargs)
+            except Exception:
+                with self.lock:
+                    self.transport_errors += 1
+                return
+
+            if response.status_code != entry.get('s'):
+                key = f"{entry['m']} {route_template(url, self.base_url)}"
+                with self.lock:
+                    self.status_mismatches[key] = self.status_mismatches.get(key, 0) + 1
+            if entry.get('ids'):
+                try:
+                    replayed = response_ids(response.json())
+                except ValueError:
+                    replayed = {}
+                for key, recorded in entry['ids'].items():
+                    self.ids.add(recorded, replayed.get(key))
+        finally:
+            self.done[index].set()
+
+    def run(self):
+        records = self.trace.records
+        if not records:
+            return None
+
+        origin = records[0]['t']
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for index, entry in enumerate(records):
+                if self.speed > 0:
+                    due = started + (entry['t'] - origin) / 1000.0 / self.speed
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        self.schedule_lag_max = max(self.schedule_lag_max, -delay)
+                pool.submit(self._send, index)
+        elapsed = time.perf_counter() - started
+        return self.summary(elapsed)
+
+    def summary(self, elapsed):
+        routes = {}
+        overall = None
+        for route, histogram in self.recorder.histograms.items():
+            routes[route] = {
+                "count": histogram.total,
+                "errors": self.recorder.errors.get(route, 0),
+                "p50_ms": histogram.percentile(50) / 1000,
+                "p95_ms": histogram.percentile(95) / 1000,
+                "p99_ms": histogram.percentile(99) / 1000,
+            }
+            if overall is None:
+                overall = type(histogram)()
+            overall.merge(histogram)
+
+        total = self.recorder.total_requests()
+        return {
+            "trace": self.trace.path,
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "speed": self.speed,
+            "requests": total,
+            "elapsed": elapsed,
+            "throughput": total / elapsed if elapsed > 0 else 0.0,
+            "p95_ms": overall.percentile(95) / 1000 if overall else 0.0,
+            "errors": sum(route["errors"] for route in routes.values()) + self.transport_errors,
+            "status_mismatches": self.status_mismatches,
+            "schedule_lag_max_ms": self.schedule_lag_max * 1000,
+            "routes": routes,
+        }
+
+
+def compare_to_baseline(result, baseline, max_regression=0.2, max_throughput_drop=None):
+    """List of human-readable regressions of `result` against `baseline` (empty = pass)"""
+    max_throughput_drop = max_regression if max_throughput_drop is None else max_throughput_drop
+    regressions = []
+
+    if baseline.get("speed") != result["speed"]:
+        regressions.append(f"speed {result['speed']:g}x differs from the baseline's {baseline.get('speed')}x")
+
+    def check_p95(label, current, reference):
+        if reference and current > reference * (1 + max_regression):
+            regressions.append(f"{label} p95 {current:.1f}ms vs baseline {reference:.1f}ms "
+                               f"(+{(current / reference - 1) * 100:.0f}%)")
+
+    check_p95("overall", result["p95_ms"], baseline.get("p95_ms"))
+    for route, stats in result["routes"].items():
+        reference = baseline.get("routes", {}).get(route)
+        if reference and min(stats["count"], reference["count"]) >= MIN_GATED_SAMPLES:
+            check_p95(route, stats["p95_ms"], reference["p95_ms"])
+
+    reference = baseline.get("throughput")
+    if reference and result["throughput"] < reference * (1 - max_throughput_drop):
+        regressions.append(f"throughput {result['throughput']:.2f} req/s vs baseline {reference:.2f} req/s "
+                           f"(-{(1 - result['throughput'] / reference) * 100:.0f}%)")
+    return regressions
+
+
+def parse_speed(value):
+    return 0.0 if value in ("max", "0") else float(value.rstrip('x'))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("trace", help="JSONL trace written by the server with TRAFFIC_RECORD_FILE")
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL, help="API base URL")
+    parser.add_argument("--speed", type=parse_speed, default=1.0,
+                        help="replay speed: 1, 10, 10x ... or max (no pacing)")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight at most")
+    parser.add_argument("--webhook-secret", default=DEFAULT_WEBHOOK_SECRET,
+                        help="EVOLUTION_WEBHOOK_SECRET of the server (recorded secrets are redacted)")
+    parser.add_argument("--baseline", default=None, metavar="PATH",
+                        help="compare against this baseline and exit 1 on regression")
+    parser.add_argument("--save-baseline", default=None, metavar="PATH",
+                        help="write this run's results as the new baseline")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="allowed p95 latency growth, as a fraction (0.2 = +20%%)")
+    parser.add_argument("--max-throughput-drop", type=float, default=None,
+                        help="allowed throughput drop, as a fraction (defaults to --max-regression)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    trace = TrafficTrace(args.trace)
+
+    print("🚀 Starting Traffic Replay Benchmark")
+    print(f"📍 Base URL: {args.base_url}")
+    print(f"📼 {len(trace.records)} requests from {len(trace.sessions)} sessions over "
+          f"{trace.duration():.1f}s, replayed at {'max' if not args.speed else f'{args.speed:g}x'} speed")
+    print("=" * 60)
+
+    replayer = TrafficReplayer(trace, args.base_url, speed=args.speed, concurrency=args.concurrency,
+                               webhook_secret=args.webhook_secret)
+    if not replayer.setup_sessions():
+        return 1
+    result = replayer.run()
+    if not result:
+        print("❌ Trace has no replayable requests")
+        return 1
+
+    print("\n" + "=" * 60)
+    print("📊 TRAFFIC REPLAY SUMMARY")
+    print("=" * 60)
+    print(f"   {result['requests']} requests in {result['elapsed']:.2f}s ({result['throughput']:.2f} req/s), "
+          f"p95 {result['p95_ms']:.1f}ms, {result['errors']} errors")
+    print(f"   Max schedule lag: {result['schedule_lag_max_ms']:.1f}ms")
+    if result['status_mismatches']:
+        print(f"⚠️  Status differs from the recording: {result['status_mismatches']}")
+    replayer.recorder.print_report()
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as handle:
+            json.dump(result, handle, indent=2)
+        print(f"\n💾 Baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+        regressions = compare_to_baseline(result, baseline, args.max_regression, args.max_throughput_drop)
+        if regressions:
+            print(f"\n❌ Performance regression against {args.baseline}:")
+            for regression in regressions:
+                print(f"   - {regression}")
+            return 1
+        print(f"\n✅ Within {args.max_regression * 100:.0f}% of baseline {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Minimal asyncio HTTP/1.1 server shared by the local API stand-ins
+Only what the Next.js route handlers need: keep-alive, Content-Length and chunked bodies, JSON replies
+"""
+
+import asyncio
+import json
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+# Returned by a handler to close the connection without answering (simulates a hung upstream)
+DROP_CONNECTION = object()
+
+MAX_HEADER_LINES = 100
+
+
+class HTTPRequest:
+    def __init__(self, method, target, headers, body):
+        parts = urlsplit(target)
+        self.method = method.upper()
+        self.target = target
+        self.path = unquote(parts.path) or '/'
+        self.raw_query = parts.query
+        self.query = parse_qs(parts.query, keep_blank_values=True)
+        self.headers = headers
+        self.body = body
+
+    def header(self, name, default=None):
+        return self.headers.get(name.lower(), default)
+
+    def query_value(self, name, default=None):
+        values = self.query.get(name)
+        return values[-1] if values else default
+
+    def json(self, default=None):
+        if not self.body:
+            return default
+        try:
+            return json.loads(self.body.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return default
+
+
+class HTTPResponse:
+    def __init__(self, status=200, body=b'', headers=None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+
+def json_response(status, payload, headers=None):
+    body = b'' if payload is None else json.dumps(payload, default=str).encode('utf-8')
+    merged = {'Content-Type': 'application/json'}
+    merged.update(headers or {})
+    return HTTPResponse(status, body, merged)
+
+
+class AsyncHTTPServer:
+    """Subclasses implement `async handle(request)` returning an HTTPResponse or DROP_CONNECTION"""
+
+    server_name = 'standin'
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.host = host
+        self.port = port
+        self.server = None
+
+    async def handle(self, request):
+        raise NotImplementedError
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, target, _version = request_line.decode('latin-1').rstrip('\r\n').split(' ', 2)
+        except ValueError:
+            return None
+
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b';')[0].strip() or b'0', 16)
+                if size == 0:
+                    await reader.readline()
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            body = b''.join(chunks)
+        else:
+            length = int(headers.get('content-length') or 0)
+            body = await reader.readexactly(length) if length else b''
+
+        return HTTPRequest(method, target, headers, body)
+
+    async def _serve_connection(self, reader, writer):
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+
+                try:
+                    response = await self.handle(request)
+                except Exception as e:
+                    response = json_response(500, {'error': f'{self.server_name} error: {e}'})
+
+                if response is DROP_CONNECTION:
+                    break
+
+                keep_alive = request.header('connection', '').lower() != 'close'
+                reason = HTTPStatus(response.status).phrase if response.status in HTTPStatus._value2member_map_ else ''
+                head = [f'HTTP/1.1 {response.status} {reason}']
+                headers = dict(response.headers)
+                headers.setdefault('Content-Length', str(len(response.body)))
+                headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+                head.extend(f'{name}: {value}' for name, value in headers.items())
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+                if request.method != 'HEAD':
+                    writer.write(response.body)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
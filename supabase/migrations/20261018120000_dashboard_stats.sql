@@ -0,0 +1,39 @@
+-- Dashboard counters computed in the database in a single round trip,
+-- instead of shipping every events/messages row to the route handler.
+
+create index if not exists events_org_id_status_idx on public.events (org_id, status);
+create index if not exists guests_org_id_idx on public.guests (org_id);
+create index if not exists messages_org_id_status_idx on public.messages (org_id, status);
+create index if not exists rsvps_event_id_status_idx on public.rsvps (event_id, status);
+
+create or replace function public.get_dashboard_stats(p_org_id uuid)
+returns json
+language sql
+stable
+security invoker
+as $$
+  select json_build_object(
+    'total_events', (select count(*) from public.events where org_id = p_org_id),
+    'active_events', (
+      select count(*) from public.events
+      where org_id = p_org_id and status in ('active', 'ativo')
+    ),
+    'total_guests', (select count(*) from public.guests where org_id = p_org_id),
+    'messages_sent', (
+      select count(*) from public.messages
+      where org_id = p_org_id and status = 'sent'
+    ),
+    'total_rsvps', (
+      select count(*) from public.rsvps r
+      join public.events e on e.id = r.event_id
+      where e.org_id = p_org_id
+    ),
+    'responded_rsvps', (
+      select count(*) from public.rsvps r
+      join public.events e on e.id = r.event_id
+      where e.org_id = p_org_id and r.status <> 'pending'
+    )
+  );
+$$;
+
+grant execute on function public.get_dashboard_stats(uuid) to authenticated, service_role;
@@ -0,0 +1,8 @@
+-- Inbound WhatsApp RSVP replies: senders are matched to guests by (org_id, phone_e164)
+-- and the reply details are stored on the rsvp row.
+
+create index if not exists guests_org_id_phone_e164_idx on public.guests (org_id, phone_e164);
+create index if not exists rsvps_guest_id_idx on public.rsvps (guest_id);
+
+alter table public.rsvps add column if not exists companions_count integer;
+alter table public.rsvps add column if not exists responded_at timestamptz;
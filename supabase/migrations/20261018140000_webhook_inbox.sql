@@ -0,0 +1,19 @@
+-- Durable inbox for Evolution webhooks: the primary key is the delivery key built by
+-- lib/webhookInbox.js, so retried deliveries are ignored on insert.
+
+create table if not exists public.webhook_inbox (
+  id text primary key,
+  org_id uuid,
+  event text not null,
+  event_at timestamptz not null,
+  payload jsonb,
+  received_at timestamptz not null default now(),
+  processed_at timestamptz
+);
+
+create index if not exists webhook_inbox_unprocessed_idx
+  on public.webhook_inbox (received_at)
+  where processed_at is null;
+
+-- Written only by the server with the service role key
+alter table public.webhook_inbox enable row level security;
@@ -0,0 +1,24 @@
+-- Per-status RSVP counts of one event in a single round trip, used as the starting tally of
+-- the RSVP stream (GET /api/events/{id}/rsvps/stream). Served by rsvps_event_id_status_idx.
+
+create or replace function public.get_event_rsvp_counts(p_event_id uuid)
+returns json
+language sql
+stable
+security invoker
+as $$
+  select json_build_object(
+    'counts', coalesce((
+      select json_object_agg(status, total)
+      from (
+        select status, count(*) as total
+        from public.rsvps
+        where event_id = p_event_id
+        group by status
+      ) by_status
+    ), '{}'::json),
+    'total', (select count(*) from public.rsvps where event_id = p_event_id)
+  );
+$$;
+
+grant execute on function public.get_event_rsvp_counts(uuid) to authenticated, service_role;
@@ -0,0 +1,54 @@
+-- POST /api/events creates the event, its gifts and its wedding roles in one call. The
+-- function body is a single transaction: a failing gift or role insert rolls the event back
+-- instead of leaving a half-created event behind. Returns the whole aggregate.
+
+create index if not exists gifts_event_id_idx on public.gifts (event_id);
+create index if not exists wedding_roles_event_id_idx on public.wedding_roles (event_id);
+
+create or replace function public.create_event_with_children(
+  p_event jsonb,
+  p_gifts jsonb default '[]'::jsonb,
+  p_roles jsonb default '[]'::jsonb
+)
+returns json
+language plpgsql
+security invoker
+as $$
+declare
+  v_input public.events := jsonb_populate_record(null::public.events, p_event);
+  v_event public.events;
+  v_gifts json;
+  v_roles json;
+begin
+  insert into public.events (
+    org_id, title, description, location, template_kind, starts_at, created_by, status,
+    rsvp_token, guests_planned, billing_status, billing_tier, allow_companion
+  )
+  values (
+    v_input.org_id, v_input.title, v_input.description, v_input.location, v_input.template_kind,
+    v_input.starts_at, v_input.created_by, v_input.status, v_input.rsvp_token,
+    v_input.guests_planned, v_input.billing_status, v_input.billing_tier, v_input.allow_companion
+  )
+  returning * into v_event;
+
+  with inserted as (
+    insert into public.gifts (org_id, event_id, title, link, price_cents)
+    select v_event.org_id, v_event.id, g.title, g.link, g.price_cents
+    from jsonb_populate_recordset(null::public.gifts, coalesce(p_gifts, '[]'::jsonb)) g
+    returning *
+  )
+  select coalesce(json_agg(inserted), '[]'::json) into v_gifts from inserted;
+
+  with inserted as (
+    insert into public.wedding_roles (org_id, event_id, role, name)
+    select v_event.org_id, v_event.id, r.role, r.name
+    from jsonb_populate_recordset(null::public.wedding_roles, coalesce(p_roles, '[]'::jsonb)) r
+    returning *
+  )
+  select coalesce(json_agg(inserted), '[]'::json) into v_roles from inserted;
+
+  return json_build_object('event', to_json(v_event), 'gifts', v_gifts, 'wedding_roles', v_roles);
+end;
+$$;
+
+grant execute on function public.create_event_with_children(jsonb, jsonb, jsonb) to authenticated, service_role;
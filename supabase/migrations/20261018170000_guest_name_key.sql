@@ -0,0 +1,58 @@
+-- Guest de-duplication and check-in search. guests.name_key is the normalized name (accents
+-- folded, lower case, anything but letters and digits of any script collapsed to one space);
+-- keep guest_name_key() in sync with lib/utils/guestKey.js. The text_pattern_ops index serves
+-- the prefix search of GET /api/events/{id}/guests/search.
+--
+-- lower() and [:alnum:] follow the database's ctype, and a C/POSIX ctype treats every
+-- non-ASCII letter as punctuation, so the keys would no longer match the ones the API
+-- computes. The migration stops there instead (tests/guestKey.test.mjs checks the JS side
+-- against the same names).
+--
+-- Host-managed guests (POST /api/guests, imports) may share names and phones; only the guests
+-- created by POST /api/public/rsvp/confirm (created_via = 'public_confirm') are unique, per
+-- event for a main guest and per main guest for a companion, which keeps that route
+-- idempotent when it is retried or raced.
+
+create or replace function public.guest_name_key(p_name text)
+returns text
+language sql
+immutable
+parallel safe
+as $$
+  select nullif(btrim(regexp_replace(
+    lower(translate(
+      coalesce(p_name, ''),
+      'ÁÀÂÃÄÅáàâãäåÉÈÊËéèêëÍÌÎÏíìîïÓÒÔÕÖóòôõöÚÙÛÜúùûüÇçÑñÝýÿ',
+      'AAAAAAaaaaaaEEEEeeeeIIIIiiiiOOOOOoooooUUUUuuuuCcNnYyy'
+    )),
+    '[^[:alnum:]]+', ' ', 'g'
+  )), '');
+$$;
+
+do $$
+begin
+  if public.guest_name_key('Иван Петров') is distinct from 'иван петров'
+    or public.guest_name_key('Łukasz Żółć') is distinct from 'łukasz żołć'
+    or public.guest_name_key('张伟') is distinct from '张伟'
+  then
+    raise exception 'guest_name_key() needs a UTF-8 ctype (such as C.UTF-8), this database has %',
+      (select datctype from pg_database where datname = current_database());
+  end if;
+end
+$$;
+
+alter table public.guests
+  add column if not exists name_key text generated always as (public.guest_name_key(name)) stored,
+  add column if not exists created_via text;
+
+create index if not exists guests_event_id_name_key_idx
+  on public.guests (event_id, name_key text_pattern_ops);
+
+create unique index if not exists guests_confirm_event_id_name_key_key
+  on public.guests (event_id, name_key)
+  where created_via = 'public_confirm' and companion_of is null;
+create unique index if not exists guests_confirm_companion_of_name_key_key
+  on public.guests (companion_of, name_key)
+  where created_via = 'public_confirm' and companion_of is not null;
+
+grant execute on function public.guest_name_key(text) to authenticated, service_role;
@@ -0,0 +1,34 @@
+-- Send jobs accepted by POST /api/messages/send with { "async": true } in the body or
+-- ?mode=async (lib/sendQueue.js; ?async=true is ignored and sends synchronously). The row is
+-- written before the 202, progress and heartbeat_at while the worker sends, and results when
+-- the job ends. Jobs whose worker stopped heartbeating are marked failed, not resumed.
+
+create table if not exists public.send_jobs (
+  id uuid primary key,
+  org_id uuid not null,
+  event_id uuid not null,
+  template_id uuid,
+  instance_id text,
+  status text not null default 'queued' check (status in ('queued', 'running', 'completed', 'failed')),
+  request_id text,
+  total integer not null default 0,
+  sent integer not null default 0,
+  failed integer not null default 0,
+  results jsonb,
+  error text,
+  created_at timestamptz not null default now(),
+  started_at timestamptz,
+  first_sent_at timestamptz,
+  finished_at timestamptz,
+  heartbeat_at timestamptz not null default now()
+);
+
+create index if not exists send_jobs_org_id_created_at_idx
+  on public.send_jobs (org_id, created_at desc);
+
+create index if not exists send_jobs_unfinished_idx
+  on public.send_jobs (heartbeat_at)
+  where status in ('queued', 'running');
+
+-- Written only by the server with the service role key
+alter table public.send_jobs enable row level security;
@@ -0,0 +1,6 @@
+-- Processed webhook_inbox rows are deleted once they are older than WEBHOOK_INBOX_RETENTION_MS
+-- (lib/webhookInbox.js); this index serves that cleanup.
+
+create index if not exists webhook_inbox_processed_received_at_idx
+  on public.webhook_inbox (received_at)
+  where processed_at is not null;
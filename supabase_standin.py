@@ -0,0 +1,1105 @@
+#!/usr/bin/env python3
+"""
+Local Supabase stand-in (Auth + PostgREST subset) for offline performance testing
+Implements what the route handlers use: password sign-in, session user lookup, admin user
+creation and sign-out; PostgREST selects with filters (eq/neq/gt/gte/lt/lte/like/ilike/in/is,
+or/and), ordering, limits, exact counts, single-object responses and embedded resources
+(one-to-many, many-to-one, aliases, `rel(count)`); inserts, upserts, updates, deletes and
+the RPCs defined in supabase/migrations. The generated guests.name_key column and the partial
+unique indexes behind guest de-duplication behave as in Postgres. Tables live in SQLite (in
+memory or --db FILE) with the migrations' indexes, so data sets of millions of rows stay fast
+to query. Every query can be slowed down per operation to mimic a remote database. RLS is not
+enforced.
+
+Point the app at it with:
+    NEXT_PUBLIC_SUPABASE_URL=http://127.0.0.1:54321 NEXT_PUBLIC_SUPABASE_ANON_KEY=standin \\
+    SUPABASE_SERVICE_ROLE_KEY=standin yarn dev
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import random
+import re
+import secrets
+import sqlite3
+import time
+import uuid
+from datetime import datetime, timezone
+
+from evolution_standin import LatencyDistribution
+from standin_http import AsyncHTTPServer, HTTPResponse, json_response
+
+# Column types: uuid/text/timestamptz are TEXT, int/bool INTEGER, jsonb serialized TEXT
+SCHEMA = {
+    'organizations': {'id': 'uuid', 'name': 'text', 'owner_id': 'uuid', 'created_at': 'timestamptz'},
+    'org_members': {'id': 'uuid', 'org_id': 'uuid', 'user_id': 'uuid', 'role': 'text', 'created_at': 'timestamptz'},
+    'users_profile': {'id': 'uuid', 'full_name': 'text', 'org_id': 'uuid', 'created_at': 'timestamptz'},
+    'evolution_instances': {
+        'id': 'uuid', 'org_id': 'uuid', 'instance_id': 'text', 'status': 'text', 'qr_code': 'text',
+        'webhook_url': 'text', 'created_at': 'timestamptz', 'updated_at': 'timestamptz',
+    },
+    'events': {
+        'id': 'uuid', 'org_id': 'uuid', 'title': 'text', 'description': 'text', 'location': 'text',
+        'template_kind': 'text', 'starts_at': 'timestamptz', 'ends_at': 'timestamptz', 'created_by': 'uuid',
+        'status': 'text', 'rsvp_token': 'text', 'guests_planned': 'int', 'billing_status': 'text',
+        'billing_tier': 'text', 'allow_companion': 'bool', 'stripe_session_id': 'text', 'confirm_page': 'jsonb',
+        'maps_url': 'text', 'created_at': 'timestamptz',
+    },
+    'guests': {
+        'id': 'uuid', 'org_id': 'uuid', 'event_id': 'uuid', 'name': 'text', 'email': 'text',
+        'phone_e164': 'text', 'tag': 'text', 'companion_of': 'uuid', 'created_at': 'timestamptz',
+        'created_via': 'text', 'name_key': 'text',
+    },
+    'rsvps': {
+        'id': 'uuid', 'event_id': 'uuid', 'guest_id': 'uuid', 'status': 'text', 'companions_count': 'int',
+        'responded_at': 'timestamptz', 'created_at': 'timestamptz',
+    },
+    'messages': {
+        'id': 'uuid', 'org_id': 'uuid', 'event_id': 'uuid', 'guest_id': 'uuid', 'status': 'text',
+        'payload': 'jsonb', 'created_at': 'timestamptz',
+    },
+    'message_templates': {
+        'id': 'uuid', 'org_id': 'uuid', 'name': 'text', 'body_text': 'text', 'channel': 'text',
+        'created_at': 'timestamptz', 'updated_at': 'timestamptz',
+    },
+    'gifts': {
+        'id': 'uuid', 'org_id': 'uuid', 'event_id': 'uuid', 'title': 'text', 'link': 'text',
+        'price_cents': 'int', 'created_at': 'timestamptz',
+    },
+    'wedding_roles': {
+        'id': 'uuid', 'org_id': 'uuid', 'event_id': 'uuid', 'role': 'text', 'name': 'text',
+        'created_at': 'timestamptz',
+    },
+    'webhook_inbox': {
+        'id': 'text', 'org_id': 'uuid', 'event': 'text', 'event_at': 'timestamptz', 'payload': 'jsonb',
+        'received_at': 'timestamptz', 'processed_at': 'timestamptz',
+    },
+    'send_jobs': {
+        'id': 'uuid', 'org_id': 'uuid', 'event_id': 'uuid', 'template_id': 'uuid', 'instance_id': 'text',
+        'status': 'text', 'request_id': 'text', 'total': 'int', 'sent': 'int', 'failed': 'int',
+        'results': 'jsonb', 'error': 'text', 'created_at': 'timestamptz', 'started_at': 'timestamptz',
+        'first_sent_at': 'timestamptz', 'finished_at': 'timestamptz', 'heartbeat_at': 'timestamptz',
+    },
+}
+
+COLUMN_DEFAULTS = {
+    ('rsvps', 'status'): 'pending',
+    ('events', 'allow_companion'): False,
+    ('events', 'guests_planned'): 0,
+    ('send_jobs', 'status'): 'queued',
+}
+TIMESTAMP_DEFAULTS = ('created_at', 'updated_at', 'received_at')
+
+# Generated columns: (table, column) -> (source column, function)
+ACCENTED = 'ÁÀÂÃÄÅáàâãäåÉÈÊËéèêëÍÌÎÏíìîïÓÒÔÕÖóòôõöÚÙÛÜúùûüÇçÑñÝýÿ'
+PLAIN = 'AAAAAAaaaaaaEEEEeeeeIIIIiiiiOOOOOoooooUUUUuuuuCcNnYyy'
+NAME_KEY_FOLD = str.maketrans(ACCENTED, PLAIN)
+
+
+def guest_name_key(name):
+    """public.guest_name_key(): accents folded, lower case, anything but letters and digits collapsed"""
+    return re.sub(r'[\W_]+', ' ', str(name or '').translate(NAME_KEY_FOLD).lower()).strip() or None
+
+
+GENERATED_COLUMNS = {
+    ('guests', 'name_key'): ('name', guest_name_key),
+}
+
+# Seeded guests are "<first> <last> <index>" so prefix searches have realistic fan-out
+SEED_FIRST_NAMES = ('Ana', 'Antônio', 'Beatriz', 'Bruno', 'Camila', 'Carlos', 'Débora', 'Eduardo', 'Fernanda',
+                    'Gabriel', 'Helena', 'Igor', 'Joana', 'João', 'Júlia', 'Lucas', 'Luíza', 'Marcos', 'Maria',
+                    'Mariana', 'Natália', 'Otávio', 'Paula', 'Pedro', 'Rafael', 'Sofia', 'Tiago', 'Vitória')
+SEED_LAST_NAMES = ('Almeida', 'Araújo', 'Barbosa', 'Cardoso', 'Costa', 'Dias', 'Ferreira', 'Gomes', 'Lima',
+                   'Martins', 'Oliveira', 'Pereira', 'Ribeiro', 'Rocha', 'Santos', 'Silva', 'Souza', 'Teixeira')
+
+# (table, column, referenced table): drives embedded resources
+FOREIGN_KEYS = [
+    ('org_members', 'org_id', 'organizations'),
+    ('users_profile', 'org_id', 'organizations'),
+    ('evolution_instances', 'org_id', 'organizations'),
+    ('events', 'org_id', 'organizations'),
+    ('guests', 'event_id', 'events'),
+    ('rsvps', 'event_id', 'events'),
+    ('rsvps', 'guest_id', 'guests'),
+    ('messages', 'event_id', 'events'),
+    ('messages', 'guest_id', 'guests'),
+    ('message_templates', 'org_id', 'organizations'),
+    ('gifts', 'event_id', 'events'),
+    ('wedding_roles', 'event_id', 'events'),
+]
+
+# Indexes from supabase/migrations plus the foreign keys; (name, table, columns, unique, where)
+INDEXES = [
+    ('org_members_user_id_idx', 'org_members', ('user_id',), False, None),
+    ('org_members_org_id_idx', 'org_members', ('org_id',), False, None),
+    ('evolution_instances_org_id_idx', 'evolution_instances', ('org_id',), False, None),
+    ('events_org_id_status_idx', 'events', ('org_id', 'status'), False, None),
+    ('events_org_id_created_at_idx', 'events', ('org_id', 'created_at'), False, None),
+    ('events_rsvp_token_idx', 'events', ('rsvp_token',), False, None),
+    ('guests_org_id_idx', 'guests', ('org_id',), False, None),
+    ('guests_event_id_idx', 'guests', ('event_id',), False, None),
+    ('guests_org_id_phone_e164_idx', 'guests', ('org_id', 'phone_e164'), False, None),
+    ('guests_confirm_event_id_name_key_key', 'guests', ('event_id', 'name_key'), True,
+     "created_via = 'public_confirm' and companion_of is null"),
+    ('guests_confirm_companion_of_name_key_key', 'guests', ('companion_of', 'name_key'), True,
+     "created_via = 'public_confirm' and companion_of is not null"),
+    ('guests_event_id_name_key_idx', 'guests', ('event_id', 'name_key'), False, None),
+    ('rsvps_event_id_status_idx', 'rsvps', ('event_id', 'status'), False, None),
+    ('rsvps_guest_id_idx', 'rsvps', ('guest_id',), False, None),
+    ('messages_org_id_status_idx', 'messages', ('org_id', 'status'), False, None),
+    ('messages_event_id_idx', 'messages', ('event_id',), False, None),
+    ('message_templates_org_id_idx', 'message_templates', ('org_id',), False, None),
+    ('gifts_event_id_idx', 'gifts', ('event_id',), False, None),
+    ('wedding_roles_event_id_idx', 'wedding_roles', ('event_id',), False, None),
+    ('webhook_inbox_unprocessed_idx', 'webhook_inbox', ('received_at',), False, 'processed_at is null'),
+    ('webhook_inbox_processed_received_at_idx', 'webhook_inbox', ('received_at',), False,
+     'processed_at is not null'),
+    ('send_jobs_org_id_created_at_idx', 'send_jobs', ('org_id', 'created_at'), False, None),
+    ('send_jobs_unfinished_idx', 'send_jobs', ('heartbeat_at',), False, "status in ('queued', 'running')"),
+]
+
+RESERVED_PARAMS = {'select', 'order', 'limit', 'offset', 'on_conflict', 'columns', 'or', 'and'}
+OPERATIONS = ('select', 'insert', 'update', 'delete', 'rpc', 'auth')
+OBJECT_MEDIA_TYPE = 'application/vnd.pgrst.object+json'
+SQL_OPERATORS = {'eq': '=', 'neq': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+IN_CHUNK = 900
+
+
+class PostgrestError(Exception):
+    def __init__(self, status, code, message, details=None, hint=None):
+        super().__init__(message)
+        self.status = status
+        self.payload = {'code': code, 'message': message, 'details': details, 'hint': hint}
+
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec='microseconds')
+
+
+def canonical_timestamp(value):
+    """Timestamps are stored in one ISO format so text comparisons order them correctly"""
+    if value is None or value == '':
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        raise PostgrestError(400, '22007', f'invalid input syntax for type timestamp with time zone: "{value}"')
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat(timespec='microseconds')
+
+
+def to_db(kind, value):
+    if value is None:
+        return None
+    if kind == 'jsonb':
+        return json.dumps(value)
+    if kind == 'bool':
+        if isinstance(value, str):
+            return 1 if value.lower() in ('true', 't', '1') else 0
+        return 1 if value else 0
+    if kind == 'int':
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise PostgrestError(400, '22P02', f'invalid input syntax for type integer: "{value}"')
+    if kind == 'timestamptz':
+        return canonical_timestamp(value)
+    return str(value)
+
+
+def from_db(kind, value):
+    if value is None:
+        return None
+    if kind == 'jsonb':
+        return json.loads(value)
+    if kind == 'bool':
+        return bool(value)
+    return value
+
+
+def quoted(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def split_top_level(text, separator=','):
+    """Split on `separator` outside parentheses and double quotes"""
+    parts, depth, in_quotes, current = [], 0, False, []
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if char == '\\' and in_quotes and index + 1 < len(text):
+            current.append(text[index:index + 2])
+            index += 2
+            continue
+        if char == '"':
+            in_quotes = not in_quotes
+        elif not in_quotes and char == '(':
+            depth += 1
+        elif not in_quotes and char == ')':
+            depth -= 1
+        if char == separator and depth == 0 and not in_quotes:
+            parts.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+        index += 1
+    if current or parts:
+        parts.append(''.join(current))
+    return parts
+
+
+def unquote_value(value):
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return value
+
+
+def strip_select_whitespace(text):
+    out, in_quotes = [], False
+    for char in text:
+        if char == '"':
+            in_quotes = not in_quotes
+        if in_quotes or not char.isspace():
+            out.append(char)
+    return ''.join(out)
+
+
+class SelectSpec:
+    """Parsed ?select=: plain columns (alias, column) and embeds (alias, relation, inner, SelectSpec)"""
+
+    EMBED_RE = re.compile(r'^(?:(?P<alias>[\w]+):)?(?P<rel>[\w]+)(?P<hints>(?:![\w]+)*)\((?P<inner>.*)\)$', re.S)
+
+    def __init__(self, text):
+        self.star = False
+        self.columns = []
+        self.embeds = []
+        self.count_only = False
+        text = strip_select_whitespace(text or '*')
+        if text == 'count':
+            self.count_only = True
+            return
+        for item in split_top_level(text):
+            if not item:
+                continue
+            match = self.EMBED_RE.match(item)
+            if match:
+                hints = [h for h in match.group('hints').split('!') if h]
+                self.embeds.append((match.group('alias') or match.group('rel'), match.group('rel'),
+                                    'inner' in hints, SelectSpec(match.group('inner'))))
+            elif item == '*':
+                self.star = True
+            else:
+                alias, _, column = item.rpartition(':') if ':' in item.replace('::', '') else ('', '', item)
+                column = column.split('::')[0]
+                self.columns.append((alias or column, column))
+
+
+class Filter:
+    """A compiled WHERE fragment with its parameters"""
+
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+
+
+def compile_condition(table, column, expression):
+    columns = SCHEMA[table]
+    if column not in columns:
+        raise PostgrestError(400, '42703', f'column {table}.{column} does not exist')
+    kind = columns[column]
+
+    negate = expression.startswith('not.')
+    if negate:
+        expression = expression[4:]
+    operator, _, raw = expression.partition('.')
+    target = quoted(column)
+
+    if operator in SQL_OPERATORS:
+        sql, params = f'{target} {SQL_OPERATORS[operator]} ?', [to_db(kind, unquote_value(raw))]
+    elif operator in ('like', 'ilike'):
+        pattern = unquote_value(raw).replace('*', '%')
+        sql = f'{target} LIKE ?' if operator == 'like' else f'LOWER({target}) LIKE LOWER(?)'
+        params = [pattern]
+    elif operator == 'in':
+        inner = raw[1:-1] if raw.startswith('(') and raw.endswith(')') else raw
+        values = [to_db(kind, unquote_value(v)) for v in split_top_level(inner) if v != '']
+        sql = f"{target} IN ({', '.join('?' for _ in values)})" if values else '0'
+        params = values
+    elif operator == 'is':
+        literal = raw.lower()
+        if literal == 'null':
+            sql, params = f'{target} IS NULL', []
+        elif literal in ('true', 'false'):
+            sql, params = f'{target} = ?', [1 if literal == 'true' else 0]
+        else:
+            raise PostgrestError(400, 'PGRST100', f'invalid is value "{raw}"')
+    else:
+        raise PostgrestError(400, 'PGRST100', f'unsupported operator "{operator}"')
+
+    return Filter(f'NOT ({sql})' if negate else sql, params)
+
+
+def compile_logic(table, operator, text, negate=False):
+    """or=(a.eq.1,and(b.gt.2,c.is.null)) style groups"""
+    inner = text[1:-1] if text.startswith('(') and text.endswith(')') else text
+    parts = []
+    for item in split_top_level(inner):
+        nested = re.match(r'^(not\.)?(and|or)(\(.*\))$', item, re.S)
+        if nested:
+            parts.append(compile_logic(table, nested.group(2), nested.group(3), bool(nested.group(1))))
+        else:
+            column, _, expression = item.partition('.')
+            parts.append(compile_condition(table, column, expression))
+    joiner = ' AND ' if operator == 'and' else ' OR '
+    sql = '(' + joiner.join(f'({p.sql})' for p in parts) + ')' if parts else '1'
+    params = [param for p in parts for param in p.params]
+    return Filter(f'NOT {sql}' if negate else sql, params)
+
+
+def compile_where(table, query):
+    filters = []
+    for name, values in query.items():
+        for value in values:
+            if name in ('or', 'and'):
+                filters.append(compile_logic(table, name, value))
+            elif name == 'not.or' or name == 'not.and':
+                filters.append(compile_logic(table, name[4:], value, negate=True))
+            elif name not in RESERVED_PARAMS:
+                filters.append(compile_condition(table, name, value))
+    if not filters:
+        return '', []
+    return ' WHERE ' + ' AND '.join(f'({f.sql})' for f in filters), [p for f in filters for p in f.params]
+
+
+def compile_order(table, text):
+    terms = []
+    for term in (text or '').split(','):
+        if not term:
+            continue
+        column, *modifiers = term.split('.')
+        if column not in SCHEMA[table]:
+            raise PostgrestError(400, '42703', f'column {table}.{column} does not exist')
+        direction = 'DESC' if 'desc' in modifiers else 'ASC'
+        nulls = ' NULLS FIRST' if 'nullsfirst' in modifiers else ' NULLS LAST' if 'nullslast' in modifiers else ''
+        terms.append(f'{quoted(column)} {direction}{nulls}')
+    return ' ORDER BY ' + ', '.join(terms) if terms else ''
+
+
+def parse_prefer(header):
+    prefer = {}
+    for item in (header or '').split(','):
+        key, _, value = item.strip().partition('=')
+        if key:
+            prefer[key] = value
+    return prefer
+
+
+def b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def b64url_decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+class SupabaseDatabase:
+    """SQLite-backed tables with PostgREST semantics"""
+
+    def __init__(self, path=':memory:'):
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode = WAL' if path != ':memory:' else 'PRAGMA journal_mode = MEMORY')
+        self.conn.execute('PRAGMA synchronous = OFF')
+        self.conn.execute('PRAGMA case_sensitive_like = ON')
+        self.create_schema()
+
+    def create_schema(self):
+        sqlite_types = {'int': 'INTEGER', 'bool': 'INTEGER'}
+        for table, columns in SCHEMA.items():
+            definitions = [f"{quoted(name)} {sqlite_types.get(kind, 'TEXT')}{' PRIMARY KEY' if name == 'id' else ''}"
+                           for name, kind in columns.items()]
+            self.conn.execute(f'CREATE TABLE IF NOT EXISTS {quoted(table)} ({", ".join(definitions)})')
+        for name, table, columns, unique, where in INDEXES:
+            self.conn.execute(
+                f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {quoted(name)} ON {quoted(table)} "
+                f"({', '.join(quoted(c) for c in columns)}){f' WHERE {where}' if where else ''}"
+            )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS auth_users (id TEXT PRIMARY KEY, email TEXT UNIQUE, '
+            'password_hash TEXT, user_metadata TEXT, created_at TEXT)'
+        )
+
+    def _table(self, table):
+        if table not in SCHEMA:
+            raise PostgrestError(404, '42P01', f'relation "public.{table}" does not exist')
+        return SCHEMA[table]
+
+    def _decode(self, table, cursor):
+        names = [d[0] for d in cursor.description]
+        kinds = [SCHEMA[table].get(name, 'text') for name in names]
+        return [{name: from_db(kind, value) for name, kind, value in zip(names, kinds, row)} for row in cursor]
+
+    def _rows_where_in(self, table, column, values):
+        values = list(values)
+        rows = []
+        for start in range(0, len(values), IN_CHUNK):
+            chunk = values[start:start + IN_CHUNK]
+            cursor = self.conn.execute(
+                f"SELECT * FROM {quoted(table)} WHERE {quoted(column)} IN ({', '.join('?' for _ in chunk)}) "
+                f"ORDER BY rowid", chunk)
+            rows.extend(self._decode(table, cursor))
+        return rows
+
+    def _relation(self, table, relation):
+        """('many_to_one', local column) or ('one_to_many', foreign column)"""
+        self._table(relation)
+        for source, column, target in FOREIGN_KEYS:
+            if source == table and target == relation:
+                return 'many_to_one', column
+        for source, column, target in FOREIGN_KEYS:
+            if source == relation and target == table:
+                return 'one_to_many', column
+        raise PostgrestError(400, 'PGRST200',
+                             f"Could not find a relationship between '{table}' and '{relation}' in the schema cache")
+
+    def shape(self, table, rows, spec):
+        """Project rows to the select spec, resolving embedded resources batch-wise"""
+        if spec.count_only:
+            return [{'count': len(rows)}]
+
+        columns = self._table(table)
+        for _, column in spec.columns:
+            if column not in columns:
+                raise PostgrestError(400, '42703', f'column {table}.{column} does not exist')
+
+        shaped = [{} for _ in rows]
+        for out, row in zip(shaped, rows):
+            if spec.star or (not spec.columns and not spec.embeds):
+                out.update(row)
+            for alias, column in spec.columns:
+                out[alias] = row.get(column)
+
+        keep = [True] * len(rows)
+        for alias, relation, inner, child_spec in spec.embeds:
+            kind, column = self._relation(table, relation)
+            if kind == 'many_to_one':
+                keys = {row[column] for row in rows if row.get(column) is not None}
+                children = self._rows_where_in(relation, 'id', keys)
+                shaped_children = dict(zip((c['id'] for c in children), self.shape(relation, children, child_spec)))
+                for index, row in enumerate(rows):
+                    value = shaped_children.get(row.get(column))
+                    shaped[index][alias] = value
+                    if inner and value is None:
+                        keep[index] = False
+            else:
+                keys = {row['id'] for row in rows}
+                grouped = {}
+                if child_spec.count_only:
+                    for start in range(0, len(keys), IN_CHUNK):
+                        chunk = list(keys)[start:start + IN_CHUNK]
+                        cursor = self.conn.execute(
+                            f"SELECT {quoted(column)}, COUNT(*) FROM {quoted(relation)} "
+                            f"WHERE {quoted(column)} IN ({', '.join('?' for _ in chunk)}) GROUP BY {quoted(column)}",
+                            chunk)
+                        for key, count in cursor:
+                            grouped[key] = [{'count': count}]
+                    for index, row in enumerate(rows):
+                        shaped[index][alias] = grouped.get(row['id'], [{'count': 0}])
+                    continue
+
+                children = self._rows_where_in(relation, column, keys)
+                for child, shaped_child in zip(children, self.shape(relation, children, child_spec)):
+                    grouped.setdefault(child[column], []).append(shaped_child)
+                for index, row in enumerate(rows):
+                    shaped[index][alias] = grouped.get(row['id'], [])
+                    if inner and not shaped[index][alias]:
+                        keep[index] = False
+
+        return [out for out, kept in zip(shaped, keep) if kept]
+
+    def select(self, table, query, spec, count=False, head=False):
+        self._table(table)
+        where, params = compile_where(table, query)
+        order = compile_order(table, (query.get('order') or [''])[-1])
+        limit = (query.get('limit') or [None])[-1]
+        offset = (query.get('offset') or [None])[-1]
+
+        total = None
+        if count:
+            total = self.conn.execute(f'SELECT COUNT(*) FROM {quoted(table)}{where}', params).fetchone()[0]
+        if head:
+            return [], total
+
+        sql = f'SELECT * FROM {quoted(table)}{where}{order}'
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+            if offset is not None:
+                sql += f' OFFSET {int(offset)}'
+        elif offset is not None:
+            sql += f' LIMIT -1 OFFSET {int(offset)}'
+        rows = self._decode(table, self.conn.execute(sql, params))
+        return self.shape(table, rows, spec), total
+
+    def _prepare_row(self, table, row):
+        columns = self._table(table)
+        for name in row:
+            if name not in columns:
+                raise PostgrestError(400, 'PGRST204',
+                                     f"Could not find the '{name}' column of '{table}' in the schema cache")
+        self._reject_generated(table, row)
+        prepared = dict(row)
+        for (generated_table, name), (source, function) in GENERATED_COLUMNS.items():
+            if generated_table == table:
+                prepared[name] = function(prepared.get(source))
+        if columns.get('id') == 'uuid' and prepared.get('id') is None:
+            prepared['id'] = str(uuid.uuid4())
+        for name in TIMESTAMP_DEFAULTS:
+            if name in columns and prepared.get(name) is None:
+                prepared[name] = now_iso()
+        for (default_table, name), value in COLUMN_DEFAULTS.items():
+            if default_table == table and name not in prepared:
+                prepared[name] = value
+        return prepared
+
+    @staticmethod
+    def _reject_generated(table, row):
+        for name in row:
+            if (table, name) in GENERATED_COLUMNS:
+                raise PostgrestError(400, '428C9', f'cannot insert a non-DEFAULT value into column "{name}"',
+                                     details=f'Column "{name}" is a generated column.')
+
+    def insert(self, table, rows, on_conflict=None, resolution=None):
+        """Insert (or upsert) rows in one statement each; returns the stored rows"""
+        columns = self._table(table)
+        inserted = []
+        for row in rows:
+            prepared = self._prepare_row(table, row)
+            names = list(prepared)
+            sql = (f"INSERT INTO {quoted(table)} ({', '.join(quoted(n) for n in names)}) "
+                   f"VALUES ({', '.join('?' for _ in names)})")
+            if resolution:
+                target = ', '.join(quoted(c.strip()) for c in (on_conflict or 'id').split(','))
+                if resolution == 'ignore-duplicates':
+                    sql += f' ON CONFLICT ({target}) DO NOTHING'
+                else:
+                    updates = ', '.join(f'{quoted(n)} = excluded.{quoted(n)}' for n in names if n != 'id')
+                    sql += f' ON CONFLICT ({target}) DO UPDATE SET {updates}' if updates else f' ON CONFLICT ({target}) DO NOTHING'
+            sql += ' RETURNING *'
+            try:
+                cursor = self.conn.execute(sql, [to_db(columns[n], prepared[n]) for n in names])
+            except sqlite3.IntegrityError as e:
+                raise self._integrity_error(table, e)
+            inserted.extend(self._decode(table, cursor))
+        return inserted
+
+    def update(self, table, query, changes):
+        columns = self._table(table)
+        for name in changes:
+            if name not in columns:
+                raise PostgrestError(400, 'PGRST204',
+                                     f"Could not find the '{name}' column of '{table}' in the schema cache")
+        if not changes:
+            return []
+        self._reject_generated(table, changes)
+        changes = dict(changes)
+        for (generated_table, name), (source, function) in GENERATED_COLUMNS.items():
+            if generated_table == table and source in changes:
+                changes[name] = function(changes[source])
+        where, params = compile_where(table, query)
+        assignments = ', '.join(f'{quoted(name)} = ?' for name in changes)
+        values = [to_db(columns[name], value) for name, value in changes.items()]
+        try:
+            cursor = self.conn.execute(f'UPDATE {quoted(table)} SET {assignments}{where} RETURNING *', values + params)
+        except sqlite3.IntegrityError as e:
+            raise self._integrity_error(table, e)
+        return self._decode(table, cursor)
+
+    def delete(self, table, query):
+        self._table(table)
+        where, params = compile_where(table, query)
+        return self._decode(table, self.conn.execute(f'DELETE FROM {quoted(table)}{where} RETURNING *', params))
+
+    def _integrity_error(self, table, error):
+        message = str(error)
+        if 'UNIQUE' in message or 'PRIMARY KEY' in message:
+            return PostgrestError(409, '23505', f'duplicate key value violates unique constraint on "{table}"',
+                                  details=message)
+        if 'NOT NULL' in message:
+            return PostgrestError(400, '23502', f'null value violates not-null constraint ({message})')
+        return PostgrestError(400, '23514', message)
+
+    def transaction(self):
+        return Transaction(self.conn)
+
+    # RPCs from supabase/migrations
+
+    def rpc_get_dashboard_stats(self, args):
+        org_id = args.get('p_org_id')
+
+        def scalar(sql, *params):
+            return self.conn.execute(sql, params).fetchone()[0]
+
+        return {
+            'total_events': scalar('SELECT COUNT(*) FROM events WHERE org_id = ?', org_id),
+            'active_events': scalar("SELECT COUNT(*) FROM events WHERE org_id = ? AND status IN ('active', 'ativo')",
+                                    org_id),
+            'total_guests': scalar('SELECT COUNT(*) FROM guests WHERE org_id = ?', org_id),
+            'messages_sent': scalar("SELECT COUNT(*) FROM messages WHERE org_id = ? AND status = 'sent'", org_id),
+            'total_rsvps': scalar('SELECT COUNT(*) FROM rsvps r JOIN events e ON e.id = r.event_id '
+                                  'WHERE e.org_id = ?', org_id),
+            'responded_rsvps': scalar("SELECT COUNT(*) FROM rsvps r JOIN events e ON e.id = r.event_id "
+                                      "WHERE e.org_id = ? AND r.status <> 'pending'", org_id),
+        }
+
+    def rpc_get_event_rsvp_counts(self, args):
+        event_id = args.get('p_event_id')
+        counts = dict(self.conn.execute('SELECT status, COUNT(*) FROM rsvps WHERE event_id = ? GROUP BY status',
+                                        (event_id,)).fetchall())
+        return {'counts': counts, 'total': sum(counts.values())}
+
+    def rpc_create_event_with_children(self, args):
+        event_fields = ('org_id', 'title', 'description', 'location', 'template_kind', 'starts_at', 'created_by',
+                        'status', 'rsvp_token', 'guests_planned', 'billing_status', 'billing_tier',
+                        'allow_companion')
+        source = args.get('p_event') or {}
+        with self.transaction():
+            [event] = self.insert('events', [{k: source.get(k) for k in event_fields}])
+            gifts = self.insert('gifts', [{
+                'org_id': event['org_id'], 'event_id': event['id'], 'title': gift.get('title'),
+                'link': gift.get('link'), 'price_cents': gift.get('price_cents'),
+            } for gift in args.get('p_gifts') or []])
+            roles = self.insert('wedding_roles', [{
+                'org_id': event['org_id'], 'event_id': event['id'], 'role': role.get('role'),
+                'name': role.get('name'),
+            } for role in args.get('p_roles') or []])
+        return {'event': event, 'gifts': gifts, 'wedding_roles': roles}
+
+    def call(self, function, args):
+        handler = getattr(self, f'rpc_{function}', None)
+        if handler is None:
+            raise PostgrestError(404, 'PGRST202', f'Could not find the function public.{function} in the schema cache')
+        return handler(args or {})
+
+
+class Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN')
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+class SupabaseStandin(AsyncHTTPServer):
+    server_name = 'supabase-standin'
+
+    def __init__(self, host='127.0.0.1', port=54321, db_path=':memory:', latency=None, jwt_secret=None,
+                 token_ttl=3600):
+        super().__init__(host, port)
+        self.db = SupabaseDatabase(db_path)
+        default = latency or LatencyDistribution()
+        self.latency = {op: default for op in OPERATIONS}
+        self.jwt_secret = (jwt_secret or 'supabase-standin-secret').encode('utf-8')
+        self.token_ttl = int(token_ttl)
+        self.refresh_tokens = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.started_at = time.monotonic()
+        self.stats = {op: {'calls': 0, 'errors': 0, 'rows': 0, 'db_ms': 0.0, 'injected_ms': 0.0}
+                      for op in OPERATIONS}
+        self.tables = {}
+
+    async def _delay(self, operation):
+        seconds = self.latency[operation].sample()
+        self.stats[operation]['injected_ms'] += seconds * 1000
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+
+    def _record(self, operation, table, rows, started, error=False):
+        stats = self.stats[operation]
+        stats['calls'] += 1
+        stats['rows'] += rows
+        stats['db_ms'] += (time.perf_counter() - started) * 1000
+        if error:
+            stats['errors'] += 1
+        if table:
+            per_table = self.tables.setdefault(table, {})
+            per_table[operation] = per_table.get(operation, 0) + 1
+
+    async def handle(self, request):
+        path = request.path.rstrip('/') or '/'
+        parts = path.strip('/').split('/')
+
+        if parts[0] == '__standin':
+            return self._control(request, parts[1:])
+        if parts[:2] == ['auth', 'v1']:
+            await self._delay('auth')
+            return self._auth(request, parts[2:])
+        if parts[:2] == ['rest', 'v1'] and len(parts) >= 3:
+            return await self._rest(request, parts[2:])
+        return json_response(404, {'error': f'Route {path} not found'})
+
+    # PostgREST
+
+    async def _rest(self, request, parts):
+        method = request.method
+        if parts[0] == 'rpc' and len(parts) == 2:
+            operation, table = 'rpc', parts[1]
+        else:
+            operation = {'GET': 'select', 'HEAD': 'select', 'POST': 'insert', 'PATCH': 'update',
+                         'DELETE': 'delete'}.get(method)
+            table = parts[0]
+        if operation is None:
+            return json_response(405, {'message': f'{method} not supported'})
+
+        await self._delay(operation)
+        started = time.perf_counter()
+        prefer = parse_prefer(request.header('prefer'))
+        query = request.query
+        spec = SelectSpec((query.get('select') or ['*'])[-1])
+        headers = {}
+
+        try:
+            if operation == 'rpc':
+                result = self.db.call(table, request.json({}) or {})
+                self._record(operation, None, 1, started)
+                self.tables.setdefault(f'rpc/{table}', {})
+                self.tables[f'rpc/{table}']['rpc'] = self.tables[f'rpc/{table}'].get('rpc', 0) + 1
+                return json_response(200, result)
+
+            if operation == 'select':
+                rows, total = self.db.select(table, query, spec, count=prefer.get('count') == 'exact',
+                                             head=method == 'HEAD')
+                status = 200
+            elif operation == 'insert':
+                body = request.json(None)
+                rows_in = body if isinstance(body, list) else [body or {}]
+                resolution = prefer.get('resolution')
+                with self.db.transaction():
+                    stored = self.db.insert(table, rows_in, (query.get('on_conflict') or [None])[-1], resolution)
+                rows, total, status = self.db.shape(table, stored, spec), len(stored), 201
+            elif operation == 'update':
+                with self.db.transaction():
+                    stored = self.db.update(table, query, request.json({}) or {})
+                rows, total, status = self.db.shape(table, stored, spec), len(stored), 200
+            else:
+                with self.db.transaction():
+                    stored = self.db.delete(table, query)
+                rows, total, status = self.db.shape(table, stored, spec), len(stored), 200
+        except PostgrestError as e:
+            self._record(operation, table, 0, started, error=True)
+            return json_response(e.status, e.payload)
+
+        self._record(operation, table, len(rows), started)
+
+        if total is not None or operation == 'select':
+            first = 0 if rows else '*'
+            range_part = f'{first}-{len(rows) - 1}' if rows else '*'
+            headers['Content-Range'] = f"{range_part}/{total if total is not None else '*'}"
+
+        wants_object = OBJECT_MEDIA_TYPE in (request.header('accept') or '')
+        if operation != 'select' and prefer.get('return') != 'representation':
+            return HTTPResponse(204 if operation != 'insert' else 201, b'', headers)
+        if method == 'HEAD':
+            return HTTPResponse(status, b'', headers)
+        if wants_object:
+            if len(rows) != 1:
+                return json_response(406, {
+                    'code': 'PGRST116',
+                    'message': 'JSON object requested, multiple (or no) rows returned',
+                    'details': f'The result contains {len(rows)} rows',
+                    'hint': None,
+                }, headers)
+            return json_response(status, rows[0], headers)
+        return json_response(status, rows, headers)
+
+    # Auth (GoTrue subset)
+
+    def _user_json(self, row):
+        return {
+            'id': row['id'],
+            'aud': 'authenticated',
+            'role': 'authenticated',
+            'email': row['email'],
+            'email_confirmed_at': row['created_at'],
+            'phone': '',
+            'confirmed_at': row['created_at'],
+            'last_sign_in_at': now_iso(),
+            'app_metadata': {'provider': 'email', 'providers': ['email']},
+            'user_metadata': json.loads(row['user_metadata'] or '{}'),
+            'identities': [],
+            'created_at': row['created_at'],
+            'updated_at': row['created_at'],
+        }
+
+    def _auth_user(self, column, value):
+        cursor = self.db.conn.execute(
+            f'SELECT id, email, password_hash, user_metadata, created_at FROM auth_users WHERE {column} = ?', (value,))
+        row = cursor.fetchone()
+        return dict(zip(('id', 'email', 'password_hash', 'user_metadata', 'created_at'), row)) if row else None
+
+    @staticmethod
+    def _password_hash(password):
+        return hashlib.sha256(str(password).encode('utf-8')).hexdigest()
+
+    def create_user(self, email, password, user_metadata=None):
+        user_id = str(uuid.uuid4())
+        self.db.conn.execute('INSERT INTO auth_users VALUES (?, ?, ?, ?, ?)', (
+            user_id, email.lower(), self._password_hash(password), json.dumps(user_metadata or {}), now_iso()))
+        return self._auth_user('id', user_id)
+
+    def _jwt(self, user):
+        issued = int(time.time())
+        header = b64url(json.dumps({'alg': 'HS256', 'typ': 'JWT'}).encode())
+        payload = b64url(json.dumps({
+            'sub': user['id'], 'email': user['email'], 'role': 'authenticated', 'aud': 'authenticated',
+            'iat': issued, 'exp': issued + self.token_ttl, 'session_id': str(uuid.uuid4()),
+        }).encode())
+        signature = b64url(hmac.new(self.jwt_secret, f'{header}.{payload}'.encode(), hashlib.sha256).digest())
+        return f'{header}.{payload}.{signature}'
+
+    def _verify_jwt(self, token):
+        try:
+            header, payload, signature = token.split('.')
+            expected = b64url(hmac.new(self.jwt_secret, f'{header}.{payload}'.encode(), hashlib.sha256).digest())
+            if not hmac.compare_digest(signature, expected):
+                return None
+            claims = json.loads(b64url_decode(payload))
+        except (ValueError, json.JSONDecodeError):
+            return None
+        return claims if claims.get('exp', 0) > time.time() else None
+
+    def _session(self, user):
+        refresh_token = secrets.token_urlsafe(24)
+        self.refresh_tokens[refresh_token] = user['id']
+        return {
+            'access_token': self._jwt(user),
+            'token_type': 'bearer',
+            'expires_in': self.token_ttl,
+            'expires_at': int(time.time()) + self.token_ttl,
+            'refresh_token': refresh_token,
+            'user': self._user_json(user),
+        }
+
+    @staticmethod
+    def _auth_error(status, error_code, message):
+        return json_response(status, {'code': status, 'error_code': error_code, 'msg': message,
+                                      'error': error_code, 'error_description': message})
+
+    def _auth(self, request, parts):
+        started = time.perf_counter()
+        endpoint = '/'.join(parts)
+        response = self._auth_endpoint(request, endpoint)
+        self._record('auth', None, 1, started, error=response.status >= 400)
+        return response
+
+    def _auth_endpoint(self, request, endpoint):
+        if endpoint == 'token' and request.method == 'POST':
+            body = request.json({}) or {}
+            grant = request.query_value('grant_type')
+            if grant == 'password':
+                user = self._auth_user('email', str(body.get('email', '')).lower())
+                if not user or user['password_hash'] != self._password_hash(body.get('password', '')):
+                    return self._auth_error(400, 'invalid_credentials', 'Invalid login credentials')
+                return json_response(200, self._session(user))
+            if grant == 'refresh_token':
+                user_id = self.refresh_tokens.pop(body.get('refresh_token'), None)
+                user = self._auth_user('id', user_id) if user_id else None
+                if not user:
+                    return self._auth_error(400, 'refresh_token_not_found', 'Invalid Refresh Token')
+                return json_response(200, self._session(user))
+            return self._auth_error(400, 'unsupported_grant_type', f'Unsupported grant type {grant}')
+
+        if endpoint == 'user' and request.method == 'GET':
+            bearer = (request.header('authorization') or '').removeprefix('Bearer ').strip()
+            claims = self._verify_jwt(bearer)
+            user = self._auth_user('id', claims['sub']) if claims else None
+            if not user:
+                return self._auth_error(401, 'bad_jwt', 'invalid JWT: unable to parse or verify signature')
+            return json_response(200, self._user_json(user))
+
+        if endpoint == 'logout' and request.method == 'POST':
+            return HTTPResponse(204, b'', {})
+
+        if endpoint == 'admin/users' and request.method == 'POST':
+            body = request.json({}) or {}
+            email = str(body.get('email', '')).lower()
+            if not email or not body.get('password'):
+                return self._auth_error(422, 'validation_failed', 'Email and password are required')
+            if self._auth_user('email', email):
+                return self._auth_error(422, 'email_exists', 'A user with this email address has already been registered')
+            return json_response(200, self._user_json(self.create_user(email, body['password'],
+                                                                     body.get('user_metadata'))))
+
+        return self._auth_error(404, 'not_found', f'Auth endpoint {endpoint} not found')
+
+    # Deterministic data sets
+
+    def seed(self, events=10, guests_per_event=100, seed=1, email=None, password='TestPassword123!',
+             confirmed_ratio=0.3):
+        """One user + org owning `events` events of `guests_per_event` guests (with RSVPs)"""
+        rng = random.Random(seed)
+
+        def rid():
+            return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+        email = (email or f'seed_{seed}@example.com').lower()
+        user = self._auth_user('email', email) or self.create_user(email, password, {'full_name': 'Seed User'})
+        org_id = rid()
+        created = now_iso()
+        conn = self.db.conn
+        event_ids, tokens = [], []
+
+        with self.db.transaction():
+            conn.execute('INSERT INTO organizations VALUES (?, ?, ?, ?)', (org_id, f'Seed Org {seed}', user['id'], created))
+            conn.execute('INSERT INTO org_members VALUES (?, ?, ?, ?, ?)', (rid(), org_id, user['id'], 'owner', created))
+            conn.execute('INSERT OR REPLACE INTO users_profile VALUES (?, ?, ?, ?)',
+                         (user['id'], 'Seed User', org_id, created))
+            conn.execute('INSERT INTO evolution_instances VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                         (rid(), org_id, f'org-{org_id}', 'open', None, None, created, created))
+
+            for event_index in range(events):
+                event_id, token = rid(), rid()
+                event_ids.append(event_id)
+                tokens.append(token)
+                conn.execute(
+                    f"INSERT INTO events ({', '.join(quoted(c) for c in SCHEMA['events'])}) "
+                    f"VALUES ({', '.join('?' for _ in SCHEMA['events'])})",
+                    (event_id, org_id, f'Seed Event {event_index:05d}', 'Seeded event', 'Seed Hall', 'wedding',
+                     canonical_timestamp('2030-01-01T18:00:00Z'), None, user['id'], 'ativo', token,
+                     guests_per_event, 'free', 'free', 1, None, None, None,
+                     canonical_timestamp('2026-01-01T00:00:00Z')))
+
+                guests, rsvps = [], []
+                for guest_index in range(guests_per_event):
+                    guest_id = rid()
+                    name = f'{rng.choice(SEED_FIRST_NAMES)} {rng.choice(SEED_LAST_NAMES)} {guest_index:06d}'
+                    guests.append((guest_id, org_id, event_id, name, None, f'+5511{900000000 + guest_index}',
+                                   'seed', None, created, None, guest_name_key(name)))
+                    status = 'confirmed' if rng.random() < confirmed_ratio else 'pending'
+                    rsvps.append((rid(), event_id, guest_id, status, None, None, created))
+                conn.executemany(f"INSERT INTO guests VALUES ({', '.join('?' for _ in SCHEMA['guests'])})", guests)
+                conn.executemany(f"INSERT INTO rsvps VALUES ({', '.join('?' for _ in SCHEMA['rsvps'])})", rsvps)
+
+        return {'email': email, 'password': password, 'user_id': user['id'], 'org_id': org_id,
+                'events': len(event_ids), 'guests': events * guests_per_event,
+                'event_ids': event_ids[:20], 'rsvp_tokens': tokens[:20]}
+
+    # Control routes
+
+    def _control(self, request, parts):
+        """GET /__standin/stats, GET|POST /__standin/config, POST /__standin/reset, POST /__standin/seed"""
+        action = parts[0] if parts else ''
+
+        if action == 'stats' and request.method == 'GET':
+            elapsed = time.monotonic() - self.started_at
+            counts = {table: self.db.conn.execute(f'SELECT COUNT(*) FROM {quoted(table)}').fetchone()[0]
+                      for table in SCHEMA}
+            queries = sum(op['calls'] for name, op in self.stats.items() if name != 'auth')
+            return json_response(200, {
+                'elapsed_seconds': elapsed,
+                'queries': queries,
+                'queries_per_second': queries / elapsed if elapsed > 0 else 0.0,
+                'operations': self.stats,
+                'tables': self.tables,
+                'rows': counts,
+            })
+
+        if action == 'config' and request.method == 'GET':
+            return json_response(200, self._config())
+
+        if action == 'config' and request.method == 'POST':
+            body = request.json({}) or {}
+            try:
+                for operation, spec in (body.get('latency') or {}).items():
+                    targets = OPERATIONS if operation == 'default' else (operation,)
+                    for target in targets:
+                        if target not in self.latency:
+                            raise ValueError(f"Unknown operation '{target}'")
+                        self.latency[target] = LatencyDistribution.parse(spec)
+            except (TypeError, ValueError) as e:
+                return json_response(400, {'error': str(e)})
+            return json_response(200, self._config())
+
+        if action == 'reset' and request.method == 'POST':
+            self.reset_stats()
+            return json_response(200, {'reset': True})
+
+        if action == 'seed' and request.method == 'POST':
+            body = request.json({}) or {}
+            started = time.perf_counter()
+            try:
+                result = self.seed(
+                    events=int(body.get('events', 10)),
+                    guests_per_event=int(body.get('guests_per_event', 100)),
+                    seed=int(body.get('seed', 1)),
+                    email=body.get('email'),
+                    password=body.get('password', 'TestPassword123!'),
+                    confirmed_ratio=float(body.get('confirmed_ratio', 0.3)),
+                )
+            except (TypeError, ValueError) as e:
+                return json_response(400, {'error': str(e)})
+            result['seconds'] = time.perf_counter() - started
+            return json_response(200, result)
+
+        return json_response(404, {'error': 'Unknown stand-in control route'})
+
+    def _config(self):
+        return {'latency': {op: str(distribution) for op, distribution in self.latency.items()}}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Local Supabase (Auth + PostgREST subset) stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--db", default=":memory:", help="SQLite file to keep data between runs (default: in memory)")
+    parser.add_argument("--latency", default="fixed:0",
+                        help="latency added to every query, e.g. lognormal:1.5,0.4 or uniform:2,10")
+    parser.add_argument("--query-latency", action="append", default=[], metavar="OP=SPEC",
+                        help=f"latency for one operation ({', '.join(OPERATIONS)}), repeatable")
+    parser.add_argument("--jwt-secret", default=None, help="secret used to sign access tokens")
+    parser.add_argument("--seed-events", type=int, default=0, help="seed this many events at startup")
+    parser.add_argument("--seed-guests", type=int, default=100, help="guests (with RSVPs) per seeded event")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the data set and latency")
+    parser.add_argument("--seed-email", default=None, help="login of the seeded user")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    random.seed(args.seed)
+
+    server = SupabaseStandin(args.host, args.port, args.db, LatencyDistribution.parse(args.latency),
+                             jwt_secret=args.jwt_secret)
+    for item in args.query_latency:
+        operation, _, spec = item.partition('=')
+        if operation not in server.latency:
+            raise SystemExit(f"Unknown operation '{operation}' in --query-latency")
+        server.latency[operation] = LatencyDistribution.parse(spec)
+
+    if args.seed_events:
+        started = time.perf_counter()
+        seeded = server.seed(args.seed_events, args.seed_guests, args.seed, args.seed_email)
+        print(f"🌱 Seeded {seeded['events']} events × {args.seed_guests} guests in "
+              f"{time.perf_counter() - started:.1f}s — login {seeded['email']} / {seeded['password']}")
+
+    await server.start()
+    print(f"🟢 Supabase stand-in listening on http://{server.host}:{server.port}")
+    print(f"   Latency: {server._config()['latency']}")
+    await server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
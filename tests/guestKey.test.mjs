@@ -0,0 +1,58 @@
+import { test } from 'node:test'
+import assert from 'node:assert/strict'
+import { execFileSync } from 'node:child_process'
+import { readFileSync } from 'node:fs'
+import { guestNameKey, uniqueGuestNames } from '../lib/utils/guestKey.js'
+
+// Name -> public.guest_name_key(name) on a Postgres database with a UTF-8 ctype (C.UTF-8)
+const SQL_KEYS = [
+  ['Ana Maria', 'ana maria'],
+  ['  JOSÉ   da Silva ', 'jose da silva'],
+  ['Conceição', 'conceicao'],
+  ['Иван Петров', 'иван петров'],
+  ['Łukasz Żółć', 'łukasz żołć'],
+  ['Müller-Lüdenscheidt', 'muller ludenscheidt'],
+  ['张伟', '张伟'],
+  ["O'Connor", 'o connor'],
+  ['João_Paulo', 'joao paulo'],
+  ['Søren Ærø', 'søren ærø'],
+  ['Ñandú 2', 'nandu 2'],
+  ['محمد علي', 'محمد علي'],
+  ['Zoë', 'zoe'],
+  ['Straße', 'straße'],
+  ['Ελένη', 'ελένη'],
+  ['Nguyễn Văn A', 'nguyễn văn a'],
+  ['!!!', null],
+  [' ', null]
+]
+
+test('guestNameKey matches the SQL keys', () => {
+  for (const [name, key] of SQL_KEYS) assert.equal(guestNameKey(name), key, name)
+  assert.equal(guestNameKey(null), null)
+})
+
+// The names the migration checks its ctype with must key the same way in JS
+test('guestNameKey matches the keys the migration asserts', () => {
+  const sql = readFileSync(new URL('../supabase/migrations/20261018170000_guest_name_key.sql', import.meta.url), 'utf8')
+  const checks = [...sql.matchAll(/guest_name_key\('([^']*)'\) is distinct from '([^']*)'/g)]
+  assert.ok(checks.length >= 3)
+  for (const [, name, key] of checks) assert.equal(guestNameKey(name), key, name)
+})
+
+// Set DATABASE_URL (with the migrations applied) to check the list against the function itself
+test('the SQL keys come from public.guest_name_key()', { skip: !process.env.DATABASE_URL && 'DATABASE_URL not set' }, () => {
+  const names = JSON.stringify(SQL_KEYS.map(([name]) => name)).replace(/'/g, "''")
+  const output = execFileSync('psql', [process.env.DATABASE_URL, '-At', '-v', 'ON_ERROR_STOP=1', '-c',
+    `select coalesce(public.guest_name_key(n), '<null>') from jsonb_array_elements_text('${names}'::jsonb) ` +
+    'with ordinality as t(n, i) order by i'
+  ], { encoding: 'utf8' })
+  assert.deepEqual(output.trimEnd().split('\n'), SQL_KEYS.map(([, key]) => key ?? '<null>'))
+})
+
+test('uniqueGuestNames keeps the first spelling per key', () => {
+  assert.deepEqual(uniqueGuestNames(['Иван', ' иван ', 'José', 'jose', '', null, 'Ana']), [
+    { key: 'иван', name: 'Иван' },
+    { key: 'jose', name: 'José' },
+    { key: 'ana', name: 'Ana' }
+  ])
+})
@@ -0,0 +1,85 @@
+import { test } from 'node:test'
+import assert from 'node:assert/strict'
+import {
+  parseLimit,
+  encodeCursor,
+  decodeCursor,
+  parseFields,
+  wantsCounts,
+  pageResult,
+  InvalidCursorError,
+  isUuid,
+  DEFAULT_PAGE_SIZE,
+  MAX_PAGE_SIZE
+} from '../lib/utils/pagination.js'
+
+const ID = '0d5bbb93-3994-4fab-ad08-2fa77a4e4512'
+const CREATED_AT = '2026-10-18T15:12:00.123456+00:00'
+const params = query => new URLSearchParams(query)
+const rawCursor = value => Buffer.from(typeof value === 'string' ? value : JSON.stringify(value)).toString('base64url')
+
+test('parseLimit keeps the unpaginated mode and clamps sizes', () => {
+  assert.equal(parseLimit(params('')), null)
+  assert.equal(parseLimit(params('cursor=abc')), DEFAULT_PAGE_SIZE)
+  assert.equal(parseLimit(params('limit=10')), 10)
+  assert.equal(parseLimit(params('limit=0')), DEFAULT_PAGE_SIZE)
+  assert.equal(parseLimit(params('limit=abc')), DEFAULT_PAGE_SIZE)
+  assert.equal(parseLimit(params('limit=100000')), MAX_PAGE_SIZE)
+})
+
+test('cursors round-trip through encodeCursor/decodeCursor', () => {
+  assert.deepEqual(decodeCursor(encodeCursor([CREATED_AT, ID]), ['timestamp', 'uuid']), [CREATED_AT, ID])
+  assert.deepEqual(decodeCursor(encodeCursor(['2026-10-18T15:12:00Z', ID]), ['timestamp', 'uuid']),
+    ['2026-10-18T15:12:00Z', ID])
+  assert.deepEqual(decodeCursor(encodeCursor([ID]), ['uuid']), [ID])
+})
+
+test('decodeCursor returns null without a cursor', () => {
+  assert.equal(decodeCursor(null, ['uuid']), null)
+  assert.equal(decodeCursor('', ['uuid']), null)
+})
+
+test('decodeCursor rejects values that could alter the PostgREST filter', () => {
+  const invalid = [
+    rawCursor('not json'),
+    rawCursor({ id: ID }),
+    rawCursor([CREATED_AT]),
+    rawCursor([CREATED_AT, ID, 'extra']),
+    rawCursor([`${CREATED_AT}",id.gt.0`, ID]),
+    rawCursor([CREATED_AT, `${ID},org_id.neq.x`]),
+    rawCursor(['2026-13-45T99:99:99Z', ID]),
+    rawCursor([1700000000, ID]),
+    rawCursor([CREATED_AT, null])
+  ]
+  for (const cursor of invalid) {
+    assert.throws(() => decodeCursor(cursor, ['timestamp', 'uuid']), InvalidCursorError, cursor)
+  }
+})
+
+test('isUuid accepts only canonical uuids', () => {
+  assert.equal(isUuid(ID), true)
+  assert.equal(isUuid(ID.toUpperCase()), true)
+  for (const value of [undefined, null, '', 'not-a-uuid', `${ID}x`, ID.replace(/-/g, '')]) {
+    assert.equal(isUuid(value), false, String(value))
+  }
+})
+
+test('parseFields intersects with the allow-list and keeps required columns', () => {
+  assert.equal(parseFields(params(''), ['id', 'name']), null)
+  assert.deepEqual(parseFields(params('fields=name, secret ,name'), ['id', 'name'], ['id']), ['id', 'name'])
+})
+
+test('wantsCounts accepts the usual truthy spellings', () => {
+  for (const value of ['1', 'true', 'TRUE', 'yes']) assert.equal(wantsCounts(params(`counts=${value}`)), true)
+  for (const value of ['', '0', 'false', 'no']) assert.equal(wantsCounts(params(`counts=${value}`)), false)
+})
+
+test('pageResult trims the look-ahead row and encodes the last kept row', () => {
+  const rows = [{ id: 'a' }, { id: 'b' }, { id: 'c' }]
+  assert.deepEqual(pageResult(rows, null, r => [r.id]), { items: rows, nextCursor: null })
+  assert.deepEqual(pageResult(rows, 3, r => [r.id]), { items: rows, nextCursor: null })
+
+  const { items, nextCursor } = pageResult(rows, 2, r => [r.id])
+  assert.deepEqual(items, rows.slice(0, 2))
+  assert.deepEqual(JSON.parse(Buffer.from(nextCursor, 'base64url').toString('utf8')), ['b'])
+})
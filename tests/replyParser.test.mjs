@@ -0,0 +1,64 @@
+import { test } from 'node:test'
+import assert from 'node:assert/strict'
+import { classifyReply, phoneCandidates, MAX_COMPANIONS } from '../lib/utils/replyParser.js'
+
+test('classifyReply recognizes confirmations', () => {
+  for (const text of ['Sim', 'sim!', 'Confirmo', 'Vou sim', 'com certeza', 'Estarei lá', 'ok', '👍', '✅ confirmado']) {
+    assert.deepEqual(classifyReply(text), { status: 'confirmed' }, text)
+  }
+})
+
+test('classifyReply reads "no" as "on the" unless it stands alone', () => {
+  for (const text of ['No sábado estarei lá!', 'No dia 12 com certeza', 'Nós vamos sim']) {
+    assert.deepEqual(classifyReply(text), { status: 'confirmed' }, text)
+  }
+  for (const text of ['no', 'N', 'Não!', 'não, obrigado', 'Nao 😢', 'nope.']) {
+    assert.deepEqual(classifyReply(text), { status: 'declined' }, text)
+  }
+})
+
+test('classifyReply leaves hedges and mixed answers unclassified', () => {
+  for (const text of ['Não sei ainda', 'Vou ver e te aviso', 'Talvez', 'sim, mas te aviso amanhã', 'Sim, infelizmente não', 'não sei se vou com 2']) {
+    assert.equal(classifyReply(text), null, text)
+  }
+})
+
+test('classifyReply recognizes declines', () => {
+  for (const text of ['Não', 'nao vou poder', 'Infelizmente não', "can't make it", 'não vou com 2', '👎']) {
+    assert.deepEqual(classifyReply(text), { status: 'declined' }, text)
+  }
+})
+
+test('classifyReply reads the number of companions', () => {
+  assert.deepEqual(classifyReply('2'), { status: 'confirmed', companions: 2 })
+  assert.deepEqual(classifyReply('+2'), { status: 'confirmed', companions: 2 })
+  assert.deepEqual(classifyReply('vou +2'), { status: 'confirmed', companions: 2 })
+  assert.deepEqual(classifyReply('Sim, mais 1'), { status: 'confirmed', companions: 1 })
+  assert.deepEqual(classifyReply('vou com 3'), { status: 'confirmed', companions: 3 })
+  assert.deepEqual(classifyReply('99'), { status: 'confirmed', companions: MAX_COMPANIONS })
+})
+
+test('classifyReply counts a party size without the guest', () => {
+  assert.deepEqual(classifyReply('Somos 4 (comigo)'), { status: 'confirmed', companions: 3 })
+  assert.deepEqual(classifyReply('vamos em 2'), { status: 'confirmed', companions: 1 })
+  assert.deepEqual(classifyReply('somos 1'), { status: 'confirmed', companions: 0 })
+})
+
+test('classifyReply ignores unrelated messages', () => {
+  for (const text of ['', null, 'Qual o endereço?', 'bom dia', 'comigo']) {
+    assert.equal(classifyReply(text), null, String(text))
+  }
+})
+
+test('phoneCandidates adds the other form of Brazilian mobiles', () => {
+  assert.deepEqual(phoneCandidates('551199998888@s.whatsapp.net'), ['+551199998888', '+5511999998888'])
+  assert.deepEqual(phoneCandidates('5511999998888@s.whatsapp.net'), ['+5511999998888', '+551199998888'])
+  assert.deepEqual(phoneCandidates('5511899998888@s.whatsapp.net'), ['+5511899998888'])
+  assert.deepEqual(phoneCandidates('14155550123@s.whatsapp.net'), ['+14155550123'])
+})
+
+test('phoneCandidates returns nothing without digits', () => {
+  assert.deepEqual(phoneCandidates(''), [])
+  assert.deepEqual(phoneCandidates(undefined), [])
+  assert.deepEqual(phoneCandidates('status@broadcast'), [])
+})
@@ -0,0 +1,91 @@
+import { test } from 'node:test'
+import assert from 'node:assert/strict'
+import { Router, serverTimingHeader } from '../lib/router.js'
+
+const handler = name => () => name
+
+function buildRouter() {
+  return new Router()
+    .get('/events', handler('listEvents'))
+    .post('/events', handler('createEvent'))
+    .get('/events/:id', handler('getEvent'))
+    .get('/events/:id/guests', handler('listEventGuests'))
+    .get('/events/:id/guests/search', handler('searchEventGuests'))
+    .get('/public/rsvp/:token', handler('getPublicRsvp'), { public: true })
+    .post('/public/rsvp/confirm', handler('confirmPublicRsvp'), { public: true })
+}
+
+test('match finds static routes by method', () => {
+  const router = buildRouter()
+  assert.equal(router.match('GET', '/events').route.handler(), 'listEvents')
+  assert.equal(router.match('POST', '/events').route.handler(), 'createEvent')
+  assert.equal(router.match('GET', '/events/').route.key, 'GET /events')
+})
+
+test('match extracts parameters', () => {
+  const router = buildRouter()
+  const match = router.match('GET', '/events/e1/guests')
+  assert.equal(match.route.key, 'GET /events/:id/guests')
+  assert.deepEqual(match.params, { id: 'e1' })
+  assert.deepEqual(router.match('GET', '/events/e2').params, { id: 'e2' })
+})
+
+test('static segments win and fall back to parameters for other methods', () => {
+  const router = buildRouter()
+  assert.equal(router.match('POST', '/public/rsvp/confirm').route.key, 'POST /public/rsvp/confirm')
+
+  const token = router.match('GET', '/public/rsvp/confirm')
+  assert.equal(token.route.key, 'GET /public/rsvp/:token')
+  assert.deepEqual(token.params, { token: 'confirm' })
+
+  assert.equal(router.match('GET', '/events/e1/guests/search').route.key, 'GET /events/:id/guests/search')
+})
+
+test('unknown paths and method mismatches do not match', () => {
+  const router = buildRouter()
+  assert.equal(router.match('GET', '/nope'), null)
+  assert.equal(router.match('GET', '/events/e1/unknown'), null)
+  assert.equal(router.match('DELETE', '/events/e1'), null)
+})
+
+test('allowedMethods tells 405 from 404', () => {
+  const router = buildRouter()
+  assert.deepEqual(router.allowedMethods('/nope'), [])
+  assert.deepEqual(router.allowedMethods('/events/e1/unknown'), [])
+  assert.deepEqual(router.allowedMethods('/events/e1'), ['GET'])
+  assert.deepEqual(router.allowedMethods('/events').sort(), ['GET', 'POST'])
+  assert.deepEqual(router.allowedMethods('/public/rsvp/confirm').sort(), ['GET', 'POST'])
+})
+
+test('routes carry the public flag', () => {
+  const router = buildRouter()
+  assert.equal(router.match('GET', '/public/rsvp/abc').route.public, true)
+  assert.equal(router.match('POST', '/public/rsvp/confirm').route.public, true)
+  assert.equal(router.match('GET', '/events').route.public, false)
+})
+
+test('duplicate routes and conflicting parameter names are rejected', () => {
+  const router = buildRouter()
+  assert.throws(() => router.get('/events', handler('again')), /Duplicate route GET \/events/)
+  assert.throws(() => router.get('/events/:eventId/gifts', handler('gifts')), /Conflicting parameter names/)
+})
+
+test('record aggregates timings and serverTimingHeader formats them', () => {
+  const router = buildRouter()
+  const seen = []
+  router.onTiming((key, timings, status) => seen.push([key, status]))
+  router.record('GET /events', { dispatch: 1, auth: 2, handler: 3 }, 200)
+  router.record('GET /events', { dispatch: 1, auth: 2, handler: 7 }, 500)
+
+  const summary = router.timingSummary()['GET /events']
+  assert.equal(summary.count, 2)
+  assert.equal(summary.errors, 1)
+  assert.equal(summary.avgHandlerMs, 5)
+  assert.equal(summary.maxMs, 10)
+  assert.deepEqual(seen, [['GET /events', 200], ['GET /events', 500]])
+
+  assert.equal(
+    serverTimingHeader({ dispatch: 0.5, auth: 1, handler: 2 }, 'GET /events'),
+    'dispatch;dur=0.500, auth;dur=1.000, handler;dur=2.000;desc="GET /events"'
+  )
+})
@@ -0,0 +1,41 @@
+import { test } from 'node:test'
+import assert from 'node:assert/strict'
+
+process.env.TRAFFIC_RECORD_FILE = '/dev/null'
+process.env.TRAFFIC_RECORD_BODY_MAX = '1024'
+const { captureRequestBody } = await import('../lib/trafficRecorder.js')
+
+const post = (body, headers = {}) => new Request('http://localhost/api/x', { method: 'POST', body, headers, duplex: 'half' })
+
+function streamOf(chunks) {
+  return new ReadableStream({
+    pull(controller) {
+      if (chunks.length) controller.enqueue(new TextEncoder().encode(chunks.shift()))
+      else controller.close()
+    }
+  })
+}
+
+test('small bodies are captured and stay readable by the handler', async () => {
+  const request = post('{"name":"Ana"}', { 'content-type': 'application/json' })
+  assert.deepEqual(await captureRequestBody(request, 'POST /guests'), { text: '{"name":"Ana"}' })
+  assert.equal(await request.text(), '{"name":"Ana"}')
+})
+
+test('bodies over the limit are cut off while reading', async () => {
+  const chunks = Array.from({ length: 8 }, () => 'x'.repeat(512))
+  const request = post(streamOf(chunks))
+  const captured = await captureRequestBody(request, 'POST /guests')
+  assert.ok(captured.omitted > 1024)
+  assert.equal((await request.text()).length, 8 * 512)
+})
+
+test('a declared length over the limit is not read', async () => {
+  const request = post('x'.repeat(2048), { 'content-length': '2048' })
+  assert.deepEqual(await captureRequestBody(request, 'POST /guests'), { omitted: 2048 })
+})
+
+test('streamed imports, reads and unrecorded routes are skipped', async () => {
+  assert.deepEqual(await captureRequestBody(post(streamOf(['name\nAna\n'])), 'POST /guests/import'), { omitted: true })
+  assert.equal(captureRequestBody(new Request('http://localhost/api/events'), 'GET /events'), null)
+})